@@ -1,6 +1,10 @@
 import logging
+from datetime import datetime, timezone
+from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
 from kink import inject
+from threading import Event, Lock, Thread
+from typing import Optional
 
 from config.app import Settings
 
@@ -10,9 +14,13 @@ logger = logging.getLogger(__name__)
 @inject
 class GCPAuth:
     """
-    Handles Google Cloud Platform authentication using service account credentials.
+    Handles Google Cloud Platform authentication using service account credentials. The credentials
+    are loaded once, shared by all GCP clients and refreshed in the background ahead of the expiry
+    of their access token.
     """
 
+    SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
     def __init__(self, settings: Settings):
         """
         Initializes the GCPAuth class with the provided settings.
@@ -20,6 +28,10 @@ class GCPAuth:
         :param settings: Settings object containing GCP configuration.
         """
         self.settings = settings
+        self._lock = Lock()
+        self._credentials: Optional[Credentials] = None
+        self._stopped = Event()
+        self._refresher: Optional[Thread] = None
         logger.info("Initializing GCP service account authentication credentials")
 
     def has_service_account(self) -> bool:
@@ -34,11 +46,22 @@ class GCPAuth:
     @property
     def credentials(self) -> Credentials:
         """
-        Retrieves the GCP service account credentials.
+        Retrieves the shared GCP service account credentials, loading them on first access. The
+        credentials are scoped upfront, so that the clients use them as they are instead of
+        deriving copies which would refresh their tokens on their own.
 
         :return: Credentials object for the service account.
         """
-        return Credentials.from_service_account_file(self.settings.gcp.vertex.service_account_path)
+        with self._lock:
+            if self._credentials is None:
+                logger.debug("Loading GCP service account credentials")
+                self._credentials = Credentials.from_service_account_file(
+                    self.settings.gcp.vertex.service_account_path,
+                    scopes=self.SCOPES
+                )
+                self._refresher = Thread(target=self._refresh_periodically, name="gcp-auth-refresh", daemon=True)
+                self._refresher.start()
+            return self._credentials
 
     @property
     def service_account_file(self) -> str:
@@ -48,3 +71,37 @@ class GCPAuth:
         :return: Path to the service account file as a string.
         """
         return self.settings.gcp.vertex.service_account_path
+
+    def close(self) -> None:
+        """
+        Stops refreshing the credentials in the background.
+        """
+        self._stopped.set()
+
+    def _refresh_periodically(self) -> None:
+        """
+        Refreshes the credentials until stopped, each time shortly before their access token expires.
+        """
+        while not self._stopped.is_set():
+            self._stopped.wait(self._refresh())
+
+    def _refresh(self) -> float:
+        """
+        Refreshes the access token of the credentials.
+
+        :return: The number of seconds to wait before the next refresh.
+        """
+        refresh_settings = self.settings.gcp.vertex.credentials_refresh
+        try:
+            self._credentials.refresh(Request())
+        except Exception as e:
+            logger.warning(f"Failed to refresh GCP credentials, retrying in {refresh_settings.retry_delay}s: {e}")
+            return refresh_settings.retry_delay
+
+        if self._credentials.expiry is None:
+            return refresh_settings.retry_delay
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        remaining = (self._credentials.expiry - now).total_seconds()
+        logger.debug(f"Refreshed GCP credentials expiring in {int(remaining)}s")
+        return max(refresh_settings.retry_delay, remaining - refresh_settings.margin)
@@ -0,0 +1,216 @@
+import itertools
+import json
+import logging
+import numpy as np
+import time
+from collections import OrderedDict
+from kink import inject
+from pydantic import BaseModel, Field
+from threading import RLock
+from typing import Any, Dict, List, Optional, Set
+
+from agent.knowledge_base.service import VectorDB
+from agent.knowledge_base.version import KnowledgeBaseVersion
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class CachedAnswer(BaseModel):
+    """
+    Model representing an answer served from the answer cache.
+    """
+    answer: str = Field(description="The cached answer")
+    sources: List[str] = Field(description="The sources of the cached answer")
+    similarity: float = Field(description="The similarity of the question to the cached question")
+
+
+class AnswerCacheStats(BaseModel):
+    """
+    Model representing the statistics of the answer cache.
+    """
+    size: int = Field(description="The number of cached answers")
+    hits: int = Field(description="The number of questions answered from the cache")
+    misses: int = Field(description="The number of questions not found in the cache")
+    invalidations: int = Field(
+        description="The number of times the cache has been cleared for a changed knowledge base"
+    )
+
+
+class AnswerCacheEntry:
+    """
+    An answer along with the normalized embedding of its standalone question.
+    """
+
+    def __init__(self, scope: str, embedding: np.ndarray, answer: str, sources: List[str]):
+        self.scope = scope
+        self.embedding = embedding
+        self.answer = answer
+        self.sources = sources
+        self.created_at = time.monotonic()
+
+
+@inject
+class AnswerCache:
+    """
+    Semantic cache of the answers matching standalone questions by the cosine similarity of their
+    embeddings. Every answer is scoped by the permission filter it has been generated with, so that
+    no answer is ever served to a user who is not permitted to see its sources. The cache is cleared
+    whenever the version of the knowledge base changes.
+    """
+
+    def __init__(self, settings: Settings, vector_db: VectorDB, kb_version: KnowledgeBaseVersion):
+        """
+        Initializes the AnswerCache with the provided settings.
+
+        :param settings: Application settings.
+        :param vector_db: The vector database providing the embeddings.
+        :param kb_version: The version of the knowledge base.
+        """
+        self.settings = settings.gcp.vertex.answer_cache
+        self.vector_db = vector_db
+        self.kb_version = kb_version
+        self._lock = RLock()
+        self._ids = itertools.count()
+        self._entries: OrderedDict[int, AnswerCacheEntry] = OrderedDict()
+        self._scopes: Dict[str, Set[int]] = {}
+        self._version: Optional[str] = None
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Returns whether the cache is enabled.
+        """
+        return self.settings.enabled
+
+    @staticmethod
+    def scope(db_filter: Dict[str, Any]) -> str:
+        """
+        Builds the scope of the answers generated with a permission filter.
+
+        :param db_filter: The permission filter of the vector DB.
+        :return: The scope as a string.
+        """
+        return json.dumps(db_filter, sort_keys=True)
+
+    async def lookup(self, question: str, db_filter: Dict[str, Any]) -> Optional[CachedAnswer]:
+        """
+        Looks up the answer of the most similar cached question within the scope of the filter.
+
+        :param question: The standalone question.
+        :param db_filter: The permission filter of the vector DB.
+        :return: The CachedAnswer if a similar enough question has been cached, None otherwise.
+        """
+        await self._check_version()
+        embedding = await self._embed(question)
+        scope = self.scope(db_filter)
+        with self._lock:
+            self._expire()
+            threshold = time.monotonic() - self.settings.ttl
+            for entry_id in [i for i in self._scopes.get(scope, ()) if self._entries[i].created_at <= threshold]:
+                self._remove(entry_id)
+            ids = list(self._scopes.get(scope, ()))
+            if not ids:
+                self._misses += 1
+                return None
+
+            similarities = np.stack([self._entries[i].embedding for i in ids]) @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.settings.similarity_threshold:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._entries.move_to_end(ids[best])
+            entry = self._entries[ids[best]]
+            return CachedAnswer(answer=entry.answer, sources=entry.sources, similarity=float(similarities[best]))
+
+    async def store(self, question: str, db_filter: Dict[str, Any], answer: str, sources: List[str]) -> None:
+        """
+        Caches the answer of a standalone question within the scope of the filter.
+
+        :param question: The standalone question.
+        :param db_filter: The permission filter of the vector DB.
+        :param answer: The generated answer.
+        :param sources: The sources of the answer.
+        """
+        embedding = await self._embed(question)
+        entry = AnswerCacheEntry(self.scope(db_filter), embedding, answer, sources)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._scopes.setdefault(entry.scope, set()).add(entry_id)
+            while len(self._entries) > self.settings.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """
+        Removes all cached answers.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def stats(self) -> AnswerCacheStats:
+        """
+        Returns the statistics of the cache.
+
+        :return: An AnswerCacheStats model.
+        """
+        with self._lock:
+            return AnswerCacheStats(
+                size=len(self._entries),
+                hits=self._hits,
+                misses=self._misses,
+                invalidations=self._invalidations
+            )
+
+    async def _embed(self, question: str) -> np.ndarray:
+        """
+        Embeds a question and normalizes the embedding, so that dot products are cosine similarities.
+
+        :param question: The question.
+        :return: The normalized embedding.
+        """
+        embedding = np.asarray(await self.vector_db.embedding.aembed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    async def _check_version(self) -> None:
+        """
+        Clears the cache if the version of the knowledge base has changed.
+        """
+        version = await self.kb_version.current()
+        with self._lock:
+            if self._version is not None and version != self._version:
+                logger.info("Clearing answer cache for the changed knowledge base")
+                self.clear()
+                self._invalidations += 1
+            self._version = version
+
+    def _expire(self) -> None:
+        """
+        Removes the least recently used answers which have been cached longer than the TTL. Expired
+        answers which have been used more recently are removed once their scope is looked up.
+        """
+        threshold = time.monotonic() - self.settings.ttl
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if entry.created_at > threshold:
+                break
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int) -> None:
+        """
+        Removes a cached answer.
+
+        :param entry_id: The ID of the cached answer.
+        """
+        entry = self._entries.pop(entry_id)
+        ids = self._scopes[entry.scope]
+        ids.discard(entry_id)
+        if not ids:
+            del self._scopes[entry.scope]
@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from kink import inject
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel, Field
+from threading import RLock
+from typing import List, Optional
+
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class CondenseStats(BaseModel):
+    """
+    Model representing the statistics of the question condensation.
+    """
+    condensed: int = Field(description="The number of questions condensed by the LLM")
+    skipped: int = Field(description="The number of follow-up questions considered self-contained")
+    cached: int = Field(description="The number of questions whose condensation has been served from the cache")
+    latency_saved: float = Field(
+        description="The estimated time in seconds saved by skipped and cached condensations "
+                    "based on the average latency of the LLM"
+    )
+
+
+@inject
+class QuestionCondenser:
+    """
+    Decides whether a follow-up question needs to be condensed with the chat history by the LLM and
+    caches the condensations per history tail and question. A question is considered self-contained
+    if it is long enough and does not contain any word referring to the preceding conversation.
+    """
+
+    def __init__(self, settings: Settings):
+        """
+        Initializes the QuestionCondenser with the provided settings.
+
+        :param settings: Application settings.
+        """
+        self.settings = settings.gcp.vertex.condense
+        words = "|".join(re.escape(word) for word in self.settings.reference_words)
+        self._references = re.compile(rf"\b(?:{words})\b", re.IGNORECASE) if words else None
+        self._lock = RLock()
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._condensed = 0
+        self._skipped = 0
+        self._cached = 0
+        self._latency = 0.0
+
+    def is_self_contained(self, question: str, chat_history: List[BaseMessage]) -> bool:
+        """
+        Checks if a question can be understood without the chat history.
+
+        :param question: The question.
+        :param chat_history: The messages of the chat history.
+        :return: True if the question does not need to be condensed, False otherwise.
+        """
+        if not chat_history:
+            return True
+        if not self.settings.skip_self_contained:
+            return False
+        if len(question.split()) < self.settings.min_words:
+            return False
+        return self._references is None or not self._references.search(question)
+
+    def key(self, question: str, chat_history: List[BaseMessage]) -> str:
+        """
+        Builds the cache key of a condensation from the question and the tail of the chat history.
+
+        :param question: The question.
+        :param chat_history: The messages of the chat history.
+        :return: The cache key.
+        """
+        tail = chat_history[-self.settings.history_tail:] if self.settings.history_tail > 0 else []
+        parts = [f"{message.type}:{message.content}" for message in tail] + [" ".join(question.split())]
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    def skip(self) -> None:
+        """
+        Records a condensation which has been skipped for a self-contained question.
+        """
+        with self._lock:
+            self._skipped += 1
+
+    def contains(self, key: str) -> bool:
+        """
+        Checks if a condensation is cached without recording a cache hit.
+
+        :param key: The cache key.
+        :return: True if the condensation is cached, False otherwise.
+        """
+        with self._lock:
+            return key in self._cache
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Retrieves a cached condensation.
+
+        :param key: The cache key.
+        :return: The standalone question if cached, None otherwise.
+        """
+        with self._lock:
+            standalone = self._cache.get(key)
+            if standalone is not None:
+                self._cache.move_to_end(key)
+                self._cached += 1
+            return standalone
+
+    def put(self, key: str, standalone: str, latency: float) -> None:
+        """
+        Caches a condensation of the LLM.
+
+        :param key: The cache key.
+        :param standalone: The standalone question.
+        :param latency: The time in seconds it took the LLM to condense the question.
+        """
+        with self._lock:
+            self._condensed += 1
+            self._latency += latency
+            self._cache[key] = standalone
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.settings.cache_max_entries:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> CondenseStats:
+        """
+        Returns the statistics of the question condensation.
+
+        :return: A CondenseStats model.
+        """
+        with self._lock:
+            average_latency = self._latency / self._condensed if self._condensed else 0.0
+            return CondenseStats(
+                condensed=self._condensed,
+                skipped=self._skipped,
+                cached=self._cached,
+                latency_saved=(self._skipped + self._cached) * average_latency
+            )
@@ -1,47 +1,87 @@
+import asyncio
 import logging
-from kink import di
+import time
+from kink import di, inject
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains.history_aware_retriever import create_history_aware_retriever
-from langchain.chains.retrieval import create_retrieval_chain
 from langchain.globals import set_debug, set_verbose
-from langchain.memory import ConversationBufferMemory
-from langchain.memory.chat_memory import BaseChatMemory
 from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import MessagesPlaceholder, ChatPromptTemplate
-from langchain_core.runnables import Runnable, RunnableWithMessageHistory
+from langchain_core.runnables import (ConfigurableField, ConfigurableFieldSpec, Runnable, RunnableConfig,
+                                      RunnableLambda, RunnableParallel, RunnablePassthrough,
+                                      RunnableWithMessageHistory)
+from typing import List, Optional, Tuple, Union
 
+from agent.chat.condense import QuestionCondenser
+from agent.chat.speculation import SpeculativeRetrieval
 from agent.history.service import HistoryAgent
-from agent.knowledge_base.service import KnowledgeBaseAgent
+from agent.knowledge_base.cache import RetrievalCache
+from agent.knowledge_base.hybrid import HybridSearch
+from agent.knowledge_base.packing import ContextPacker
+from agent.knowledge_base.pipeline import PostProcessingPipeline
+from agent.knowledge_base.rerank import RerankSearch
+from agent.knowledge_base.service import KnowledgeBaseAgent, VectorDB
 from agent.llm.service import ChatVertexLLM
 from config.app import Settings
 
 logger = logging.getLogger(__name__)
 
 
-class ChatAgent:
+@inject
+class ChatChain:
     """
-    ChatAgent class handles the initialization and management of chat sessions
-    with integrated history and knowledge base retrieval.
+    Builds the retrieval chain once and shares it across all chat sessions. The prompts and the
+    language model are identical for every session, whereas the message history and the retriever
+    search arguments are supplied at runtime through the configuration of each invocation.
     """
 
-    def __init__(self, kb_agent: KnowledgeBaseAgent, history_agent: HistoryAgent):
+    def __init__(self, settings: Settings, vector_db: VectorDB, post_processing: PostProcessingPipeline,
+                 retrieval_cache: RetrievalCache, condenser: QuestionCondenser, speculation: SpeculativeRetrieval,
+                 packer: ContextPacker):
         """
-        Initializes the ChatAgent with the given knowledge base and history agents.
+        Initializes the ChatChain with the provided settings and vector database.
 
-        :param kb_agent: An instance of KnowledgeBaseAgent for retrieving knowledge base data.
-        :param history_agent: An instance of HistoryAgent for managing chat history.
+        :param settings: Application settings.
+        :param vector_db: The vector database to retrieve the documents from.
+        :param post_processing: The pipeline post-processing the retrieved documents.
+        :param retrieval_cache: The cache of the retrieved documents.
+        :param condenser: The gate and cache of the question condensation.
+        :param speculation: The speculative retrieval during the question condensation.
+        :param packer: The packing of the retrieved documents into the context of the answer prompt.
         """
-        self.settings: Settings = di[Settings]
-        self.vertex: ChatVertexLLM = di[ChatVertexLLM]
-        self.kb_agent = kb_agent
-        self.history_agent = history_agent
+        self.settings = settings
+        self.vector_db = vector_db
+        self.post_processing = post_processing
+        self.retrieval_cache = retrieval_cache
+        self.condenser = condenser
+        self.speculation = speculation
+        self.packer = packer
+        self.model = self._initialize_model()
         self.prompt = self._initialize_prompt(di['template'])
         self.condense_prompt = self._initialize_condense_prompt(di['condense_template'])
-        self._memory = self._initialize_memory()
 
         set_debug(self.settings.gcp.vertex.model.debug)
         set_verbose(self.settings.gcp.vertex.model.verbose)
 
+        self._condense_chain = self._initialize_condense_chain()
+        self._retriever = self._initialize_retriever()
+        self._runnable = self._initialize_chain()
+
+    @staticmethod
+    def _initialize_model() -> Runnable:
+        """
+        Initializes the language model of the chains, which acquires a client from the LLM pool on every
+        call, so that the requests of all sessions are spread across the pooled clients.
+
+        :return: A Runnable instance invoking or streaming a pooled chat language model.
+        """
+        def acquire(_) -> Runnable:
+            return di[ChatVertexLLM].model
+
+        return RunnableLambda(acquire).with_config(run_name="pooled_chat_model")
+
     def _initialize_prompt(self, template: str) -> ChatPromptTemplate:
         """
         Initializes the main prompt template for the chat agent.
@@ -68,59 +108,263 @@ class ChatAgent:
             ("human", "{input}")
         ])
 
-    def _initialize_memory(self) -> ConversationBufferMemory:
+    def _initialize_retriever(self) -> Runnable:
         """
-        Initializes the conversation buffer memory for the chat agent.
+        Initializes the shared retriever whose search arguments (including the user specific
+        permission filter) are configurable per invocation. The similarity, hybrid and rerank searches
+        set the search parameters of the vector index per query, the other search types operate on the
+        asynchronous vector store as the chain is only consumed through its async API.
 
-        :return: A ConversationBufferMemory instance.
+        :return: A Runnable instance representing the configurable retriever.
         """
-        return ConversationBufferMemory(
-            input_key="question",
-            output_key="answer",
-            return_messages=True,
-            chat_memory=self.history_agent.memory,
-            max_token_limit=self.settings.gcp.vertex.chat_memory.max_token_limit
-        )
+        search_type = self.settings.db.vector_db.retriever.type
+        searches = {"similarity": VectorDB, "hybrid": HybridSearch, "rerank": RerankSearch}
+        if search_type in searches:
+            retriever = self._initialize_search_retriever(di[searches[search_type]], f"{search_type}_retriever")
+        else:
+            retriever = self.vector_db.async_db.as_retriever(
+                search_type=self.settings.db.vector_db.retriever.type,
+                search_kwargs={"k": self.settings.db.vector_db.retriever.k}
+            )
+            retriever = retriever.configurable_fields(
+                search_kwargs=ConfigurableField(
+                    id="search_kwargs",
+                    name="Search Arguments",
+                    description="The search arguments including the permission filter of the user"
+                )
+            )
+        if self.retrieval_cache.enabled:
+            retriever = self._initialize_cached_retriever(retriever)
+        if not self.post_processing.stages:
+            return retriever
 
-    @property
-    def memory(self) -> BaseChatMemory:
+        post_processing = RunnableLambda(self.post_processing.aprocess).with_config(run_name="post_processing")
+        return RunnableParallel(query=RunnablePassthrough(), documents=retriever) | post_processing
+
+    def _initialize_search_retriever(self, search: Union[VectorDB, HybridSearch, RerankSearch],
+                                     run_name: str) -> Runnable:
         """
-        Returns the conversation memory.
+        Initializes a retriever on a search implemented outside the vector store retrievers, whose search
+        arguments are supplied through the configuration of each invocation. Besides the number of documents
+        and the filter, the search arguments may contain the search parameters of the vector index.
 
-        :return: An instance of BaseChatMemory.
+        :param search: The search retrieving the documents.
+        :param run_name: The name of the retriever in the traces.
+        :return: A Runnable instance representing the retriever.
         """
-        return self._memory
+        default_search_kwargs = {"k": self.settings.db.vector_db.retriever.k}
 
-    @property
-    def chain(self) -> Runnable:
+        async def aretrieve(question: str, config: RunnableConfig) -> List[Document]:
+            search_kwargs = config.get("configurable", {}).get("search_kwargs", default_search_kwargs)
+            return await search.asearch(question, search_kwargs["k"], search_kwargs.get("filter"),
+                                        search_kwargs.get("search_params"))
+
+        return RunnableLambda(aretrieve).with_config(run_name=run_name)
+
+    def _initialize_cached_retriever(self, retriever: Runnable) -> Runnable:
         """
-        Constructs the retrieval chain for the chat agent.
+        Wraps the retriever to serve the documents from the retrieval cache.
+
+        :param retriever: The configurable retriever.
+        :return: A Runnable instance representing the cached retriever.
+        """
+        search_type = self.settings.db.vector_db.retriever.type
+        default_search_kwargs = {"k": self.settings.db.vector_db.retriever.k}
+
+        async def aretrieve(question: str, config: RunnableConfig) -> List[Document]:
+            search_kwargs = config.get("configurable", {}).get("search_kwargs", default_search_kwargs)
+            key = self.retrieval_cache.key(question, search_kwargs, search_type)
+            documents = await self.retrieval_cache.aget(key)
+            if documents is None:
+                documents = await retriever.ainvoke(question, config)
+                self.retrieval_cache.put(key, list(documents))
+            return list(documents)
+
+        return RunnableLambda(aretrieve).with_config(run_name="cached_retriever")
+
+    def _initialize_condense_chain(self) -> Runnable:
+        """
+        Constructs the chain condensing a follow-up question and the chat history into a standalone question.
+
+        :return: A Runnable instance representing the condense chain.
+        """
+        return (self.condense_prompt | self.model | StrOutputParser()).with_config(
+            run_name="condense_question")
+
+    def _initialize_chain(self) -> Runnable:
+        """
+        Constructs the retrieval chain shared by all chat agents. The documents are retrieved for the
+        standalone question, which is either supplied as input or condensed from the chat history, and
+        packed into the context of the answer prompt.
 
         :return: A Runnable instance representing the retrieval chain.
         """
-        logger.debug("Initializing retrieval from knowledge base chain")
+        logger.info("Initializing retrieval from knowledge base chain")
+
+        async def aretrieve(inputs: dict, config: RunnableConfig) -> dict:
+            standalone, documents = await self.retrieve(
+                inputs["input"], inputs.get("chat_history", []), inputs.get("standalone"), config)
+            if self.packer.enabled:
+                documents = self.packer.pack(documents)
+            return {**inputs, "standalone": standalone, "context": documents}
 
-        history_aware_retriever = create_history_aware_retriever(
-            llm=self.vertex.model,
-            retriever=self.kb_agent.retriever,
-            prompt=self.condense_prompt
-        )
         document_chain = create_stuff_documents_chain(
-            llm=self.vertex.model,
+            llm=self.model,
             prompt=self.prompt
         )
-        retrieval_chain = create_retrieval_chain(
-            retriever=history_aware_retriever,
-            combine_docs_chain=document_chain
-        )
+        retrieval_chain = (
+                RunnableLambda(aretrieve).with_config(run_name="retrieve_documents") |
+                RunnablePassthrough.assign(answer=document_chain)
+        ).with_config(run_name="retrieval_chain")
 
-        def get_session_history(session_id: str) -> BaseChatMessageHistory:
-            return self.history_agent.message_history
+        def get_session_history(message_history: BaseChatMessageHistory) -> BaseChatMessageHistory:
+            return message_history
 
         return RunnableWithMessageHistory(
             retrieval_chain,
             get_session_history,
             input_messages_key="input",
             history_messages_key="chat_history",
-            output_messages_key="answer"
+            output_messages_key="answer",
+            history_factory_config=[
+                ConfigurableFieldSpec(
+                    id="message_history",
+                    annotation=BaseChatMessageHistory,
+                    name="Message History",
+                    description="The message history of the chat session",
+                    default=None,
+                    is_shared=True
+                )
+            ]
         )
+
+    @property
+    def runnable(self) -> Runnable:
+        """
+        Returns the shared retrieval chain.
+
+        :return: A Runnable instance representing the retrieval chain.
+        """
+        return self._runnable
+
+    async def retrieve(self, question: str, chat_history: List[BaseMessage], standalone: Optional[str] = None,
+                       config: Optional[RunnableConfig] = None) -> Tuple[str, List[Document]]:
+        """
+        Retrieves the documents for the standalone question of a question. If the question has to be
+        condensed by the LLM, the documents are speculatively retrieved for the raw question in the
+        meantime and used if the condensed question turns out to be similar enough.
+
+        :param question: The question.
+        :param chat_history: The messages of the chat history.
+        :param standalone: The standalone question if it has already been condensed.
+        :param config: The configuration of the invocation.
+        :return: A tuple of the standalone question and the retrieved documents.
+        """
+        if standalone is None and self.speculation.enabled and self._requires_llm(question, chat_history):
+            self.speculation.attempt()
+            speculative = asyncio.ensure_future(self._retriever.ainvoke(question, config))
+            try:
+                standalone = await self.condense(question, chat_history, config)
+            except BaseException:
+                speculative.cancel()
+                raise
+
+            if await self.speculation.accept(question, standalone):
+                return standalone, await speculative
+            # the discarded retrieval is left to complete, so that its connection is released cleanly
+            speculative.add_done_callback(lambda task: task.cancelled() or task.exception())
+        elif standalone is None:
+            standalone = await self.condense(question, chat_history, config)
+
+        return standalone, await self._retriever.ainvoke(standalone, config)
+
+    def _requires_llm(self, question: str, chat_history: List[BaseMessage]) -> bool:
+        """
+        Checks if the condensation of a question requires the LLM.
+
+        :param question: The question.
+        :param chat_history: The messages of the chat history.
+        :return: True if the question is neither self-contained nor its condensation cached, False otherwise.
+        """
+        if self.condenser.is_self_contained(question, chat_history):
+            return False
+        return not self.condenser.contains(self.condenser.key(question, chat_history))
+
+    async def condense(self, question: str, chat_history: List[BaseMessage],
+                       config: Optional[RunnableConfig] = None) -> str:
+        """
+        Condenses a follow-up question and the chat history into a standalone question. The LLM is only
+        called if the question is not self-contained and its condensation has not been cached.
+
+        :param question: The question.
+        :param chat_history: The messages of the chat history.
+        :param config: The configuration of the invocation.
+        :return: The standalone question.
+        """
+        if self.condenser.is_self_contained(question, chat_history):
+            if chat_history:
+                self.condenser.skip()
+            return question
+
+        key = self.condenser.key(question, chat_history)
+        standalone = self.condenser.get(key)
+        if standalone is None:
+            start = time.perf_counter()
+            standalone = await self._condense_chain.ainvoke({"input": question, "chat_history": chat_history}, config)
+            self.condenser.put(key, standalone, time.perf_counter() - start)
+        return standalone
+
+
+class ChatAgent:
+    """
+    ChatAgent class handles the initialization and management of chat sessions
+    with integrated history and knowledge base retrieval.
+    """
+
+    def __init__(self, kb_agent: KnowledgeBaseAgent, history_agent: HistoryAgent):
+        """
+        Initializes the ChatAgent with the given knowledge base and history agents.
+
+        :param kb_agent: An instance of KnowledgeBaseAgent for retrieving knowledge base data.
+        :param history_agent: An instance of HistoryAgent for managing chat history.
+        """
+        self.settings: Settings = di[Settings]
+        self.chat_chain: ChatChain = di[ChatChain]
+        self.kb_agent = kb_agent
+        self.history_agent = history_agent
+
+    @property
+    def chain(self) -> Runnable:
+        """
+        Returns the retrieval chain shared by all chat agents.
+
+        :return: A Runnable instance representing the retrieval chain.
+        """
+        return self.chat_chain.runnable
+
+    async def condense(self, question: str, chat_history: List[BaseMessage]) -> str:
+        """
+        Condenses a follow-up question and the chat history into a standalone question.
+
+        :param question: The question.
+        :param chat_history: The messages of the chat history.
+        :return: The standalone question.
+        """
+        return await self.chat_chain.condense(question, chat_history)
+
+    def config(self, message_history: Optional[BaseChatMessageHistory] = None) -> RunnableConfig:
+        """
+        Provides the runtime configuration binding the shared chain to this session.
+
+        :param message_history: The message history to use instead of the session history, e.g. a snapshot.
+        :return: A RunnableConfig containing the session history and the retriever search arguments.
+        """
+        if message_history is None:
+            message_history = self.history_agent.message_history
+        return {
+            "configurable": {
+                "session_id": self.history_agent.session_id,
+                "message_history": message_history,
+                "search_kwargs": self.kb_agent.search_kwargs
+            }
+        }
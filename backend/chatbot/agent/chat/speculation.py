@@ -0,0 +1,94 @@
+import logging
+import numpy as np
+from kink import inject
+from pydantic import BaseModel, Field
+from threading import Lock
+
+from agent.knowledge_base.service import VectorDB
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculationStats(BaseModel):
+    """
+    Model representing the statistics of the speculative retrieval.
+    """
+    attempts: int = Field(description="The number of retrievals started for the raw question during condensation")
+    accepted: int = Field(description="The number of speculative retrievals used for the condensed question")
+    rejected: int = Field(description="The number of speculative retrievals discarded for a diverging question")
+    acceptance_ratio: float = Field(description="The ratio of speculative retrievals which have been used")
+
+
+@inject
+class SpeculativeRetrieval:
+    """
+    Decides whether the documents retrieved speculatively for a raw follow-up question can be used for
+    its condensed question, based on the cosine similarity of the embeddings of both questions.
+    """
+
+    def __init__(self, settings: Settings, vector_db: VectorDB):
+        """
+        Initializes the SpeculativeRetrieval with the provided settings.
+
+        :param settings: Application settings.
+        :param vector_db: The vector database providing the embeddings.
+        """
+        self.settings = settings.db.vector_db.retriever.speculation
+        self.vector_db = vector_db
+        self._lock = Lock()
+        self._attempts = 0
+        self._accepted = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Returns whether the speculative retrieval is enabled.
+        """
+        return self.settings.enabled
+
+    def attempt(self) -> None:
+        """
+        Records a speculative retrieval which has been started.
+        """
+        with self._lock:
+            self._attempts += 1
+
+    async def accept(self, question: str, standalone: str) -> bool:
+        """
+        Checks if the documents retrieved for the raw question can be used for the condensed question.
+
+        :param question: The raw question.
+        :param standalone: The condensed standalone question.
+        :return: True if the questions are similar enough, False otherwise.
+        """
+        if " ".join(question.split()).casefold() == " ".join(standalone.split()).casefold():
+            accepted = True
+        else:
+            # both embeddings are shared with the retrievals through the query embedding cache
+            embeddings = [await self.vector_db.embedding.aembed_query(text) for text in (question, standalone)]
+            a, b = (np.asarray(embedding, dtype=np.float32) for embedding in embeddings)
+            norm = np.linalg.norm(a) * np.linalg.norm(b)
+            similarity = float(a @ b / norm) if norm else 0.0
+            accepted = similarity >= self.settings.similarity_threshold
+            logger.debug(f"Speculative retrieval {'accepted' if accepted else 'rejected'} "
+                         f"with similarity {similarity:.3f}")
+
+        if accepted:
+            with self._lock:
+                self._accepted += 1
+        return accepted
+
+    def stats(self) -> SpeculationStats:
+        """
+        Returns the statistics of the speculative retrieval.
+
+        :return: A SpeculationStats model.
+        """
+        with self._lock:
+            return SpeculationStats(
+                attempts=self._attempts,
+                accepted=self._accepted,
+                rejected=self._attempts - self._accepted,
+                acceptance_ratio=self._accepted / self._attempts if self._attempts else 0.0
+            )
@@ -1,3 +1,3 @@
-from agent.history.sql import HistoryMessageModel
+from agent.history.sql import HistoryMessageModel, HistorySummaryModel
 
-HistoryMessageModel._meta.database.create_tables([HistoryMessageModel])
+HistoryMessageModel._meta.database.create_tables([HistoryMessageModel, HistorySummaryModel])
@@ -0,0 +1,101 @@
+import json
+import logging
+from collections import defaultdict
+from peewee import CharField, TextField, IntegerField, DateTimeField
+from playhouse.migrate import SchemaMigrator, migrate
+
+from agent.history.sql import HistoryMessageModel
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryMigration:
+    """
+    Migrates the history table from serialized message blobs to the columnar schema.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        """
+        Initializes the HistoryMigration with the given batch size.
+
+        :param batch_size: The number of sessions to rewrite within a single transaction.
+        """
+        self.batch_size = batch_size
+        self.database = HistoryMessageModel._meta.database
+        self.table_name = HistoryMessageModel._meta.table_name
+
+    def add_columns(self) -> None:
+        """
+        Adds the missing columns of the columnar schema to an existing history table. The columns
+        are nullable so that the table can be altered without rewriting it.
+        """
+        columns = {
+            "role": CharField(null=True),
+            "content": TextField(null=True),
+            "turn": IntegerField(null=True),
+            "created_at": DateTimeField(null=True)
+        }
+        existing = {column.name: column for column in self.database.get_columns(self.table_name)}
+        migrator = SchemaMigrator.from_database(self.database)
+        operations = [migrator.add_column(self.table_name, name, field)
+                      for name, field in columns.items() if name not in existing]
+        if "message" in existing and not existing["message"].null:
+            operations.append(migrator.drop_not_null(self.table_name, "message"))
+
+        if operations:
+            logger.info(f"Adding columnar schema to history table '{self.table_name}'")
+            with self.database.atomic():
+                migrate(*operations)
+
+    def backfill(self) -> int:
+        """
+        Populates the role, content and turn columns of the rows written before the columnar schema
+        from their serialized messages, rewriting the table in batches of sessions.
+
+        :return: The number of migrated rows.
+        """
+        migrated = 0
+        while True:
+            sessions = HistoryMessageModel.select(HistoryMessageModel.session_id).where(
+                HistoryMessageModel.role.is_null()).distinct().limit(self.batch_size)
+            session_ids = [session.session_id for session in sessions]
+            if not session_ids:
+                break
+
+            rows = HistoryMessageModel.select(
+                HistoryMessageModel.id,
+                HistoryMessageModel.session_id,
+                HistoryMessageModel.message
+            ).where(
+                (HistoryMessageModel.session_id.in_(session_ids)) & (HistoryMessageModel.role.is_null())
+            ).order_by(HistoryMessageModel.session_id, HistoryMessageModel.id.asc())
+
+            positions = defaultdict(int)
+            updates = []
+            for row in rows:
+                message_dict = json.loads(row.message)
+                row.role = message_dict["type"]
+                row.content = message_dict["data"]["content"]
+                row.turn = positions[row.session_id] // 2
+                positions[row.session_id] += 1
+                updates.append(row)
+
+            with self.database.atomic():
+                HistoryMessageModel.bulk_update(
+                    updates,
+                    fields=[HistoryMessageModel.role, HistoryMessageModel.content, HistoryMessageModel.turn],
+                    batch_size=self.batch_size
+                )
+            migrated += len(updates)
+            logger.info(f"Migrated {migrated} history rows to the columnar schema")
+
+        return migrated
+
+    def migrate(self) -> int:
+        """
+        Runs the complete migration of the history table.
+
+        :return: The number of migrated rows.
+        """
+        self.add_columns()
+        return self.backfill()
@@ -1,11 +1,15 @@
 import json
 import logging
 from enum import Enum, auto, StrEnum
+from kink import di
+from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import BaseMessage, HumanMessage
 from pydantic import Field, BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence
 
 from agent.history.sql import SQLMessageHistory
+from agent.history.window import HistoryWindow
+from common.db import AppDB, QueryCounter
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +52,10 @@ class History(BaseModel):
     Model representing the message history.
     """
     messages: List[QA] = Field(description="The list of all messages in order")
+    has_more: bool = Field(
+        default=False,
+        description="Flag indicating that older messages exist which can be retrieved from the session history"
+    )
 
 
 class MessageActor(str, Enum):
@@ -67,6 +75,94 @@ class Message(BaseModel):
     actor: MessageActor = Field(description="The actor who sent the message")
 
 
+class HistorySnapshot(BaseChatMessageHistory):
+    """
+    Per-request snapshot of the message history of a session. The messages are loaded once and
+    shared by all consumers of the request, whereas saved messages are written through to the
+    underlying history and appended to the snapshot in place.
+    """
+
+    def __init__(self, message_history: SQLMessageHistory, messages: List[BaseMessage],
+                 queries: Optional[QueryCounter] = None):
+        """
+        Initializes the HistorySnapshot with the underlying history and its already loaded messages.
+
+        :param message_history: The underlying message history to write through to.
+        :param messages: The messages loaded from the underlying history.
+        :param queries: The counter of the statements executed for loading the messages.
+        """
+        self.message_history = message_history
+        self._messages = messages
+        self.queries = queries or QueryCounter()
+
+    @property
+    def reads(self) -> int:
+        """
+        Returns the number of read statements executed for loading and writing the snapshot.
+        """
+        return self.queries.reads
+
+    @property
+    def writes(self) -> int:
+        """
+        Returns the number of write statements executed for writing the snapshot.
+        """
+        return self.queries.writes
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """
+        Returns the messages of the snapshot.
+
+        :return: A list of BaseMessage instances.
+        """
+        return self._messages
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        """
+        Returns the messages of the snapshot without accessing the underlying history.
+
+        :return: A list of BaseMessage instances.
+        """
+        return self._messages
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """
+        Writes the messages to the underlying history and appends them to the snapshot.
+
+        :param messages: The messages to add.
+        """
+        with AppDB.counting(self.queries):
+            self.message_history.add_messages(messages)
+        self._messages.extend(messages)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """
+        Writes the messages to the underlying history without blocking the event loop and appends them to the snapshot.
+
+        :param messages: The messages to add.
+        """
+        with AppDB.counting(self.queries):
+            await self.message_history.aadd_messages(messages)
+        self._messages.extend(messages)
+
+    def add_message(self, message: BaseMessage) -> None:
+        """
+        Writes the message to the underlying history and appends it to the snapshot.
+
+        :param message: The message to add.
+        """
+        self.add_messages([message])
+
+    def clear(self) -> None:
+        """
+        Clears the underlying history and the snapshot.
+        """
+        with AppDB.counting(self.queries):
+            self.message_history.clear()
+        self._messages.clear()
+
+
 class HistoryAgent:
     """
     Agent responsible for managing message history.
@@ -80,6 +176,7 @@ class HistoryAgent:
         """
         self.session_id = session_id
         self.message_history = SQLMessageHistory(session_id)
+        self.app_db: AppDB = di[AppDB]
 
     async def remove_history(self) -> None:
         """
@@ -106,6 +203,27 @@ class HistoryAgent:
         logger.debug(f"Retrieving history for '{self.session_id}'")
         return self.message_history.messages
 
+    async def aretrieve_history_unwrapped(self) -> List[BaseMessage]:
+        """
+        Retrieves the unwrapped message history for the current session without blocking the event loop.
+
+        :return: A list of base messages.
+        """
+        logger.debug(f"Retrieving history for '{self.session_id}'")
+        return await self.message_history.aget_messages()
+
+    async def snapshot(self) -> HistorySnapshot:
+        """
+        Loads a snapshot of the message history to be shared by all consumers of a single request.
+        The messages are limited to the token budget of the history window. The statements executed
+        for the request from now on are counted by the snapshot.
+
+        :return: A HistorySnapshot instance.
+        """
+        with self.app_db.counting(QueryCounter()) as queries:
+            messages = await di[HistoryWindow].apply(self.session_id, await self.aretrieve_history_unwrapped())
+        return HistorySnapshot(self.message_history, messages, queries)
+
     def add_user_message(self, message: str) -> None:
         """
         Adds a user message to the history.
@@ -149,25 +267,49 @@ class HistoryAgent:
         :return: A History model containing all QA pairs.
         """
         logger.debug(f"Retrieving detailed history for '{self.session_id}'")
-        history = self.message_history.messages_wrapped()
-        messages = []
+        history = await self.app_db.run(lambda: list(self.message_history.messages_wrapped()))
+        return History(messages=self._to_qa_pairs(history))
+
+    @staticmethod
+    async def histories(session_ids: List[str], last_pairs: Optional[int] = None) -> Dict[str, History]:
+        """
+        Retrieves the detailed histories of multiple sessions using a single query.
 
+        :param session_ids: The session IDs.
+        :param last_pairs: The number of latest QA pairs to retrieve per session, all if None.
+        :return: A dictionary mapping each session ID to its History model.
+        """
+        logger.debug(f"Retrieving detailed history for {len(session_ids)} sessions")
+        app_db: AppDB = di[AppDB]
+        histories = await app_db.run(SQLMessageHistory.messages_wrapped_by_session, session_ids, last_pairs)
+        return {
+            session_id: History(messages=HistoryAgent._to_qa_pairs(pairs), has_more=total > len(pairs))
+            for session_id, (pairs, total) in histories.items()
+        }
+
+    @staticmethod
+    def _to_qa_pairs(history) -> List[QA]:
+        """
+        Converts paired history rows into QA pairs.
+
+        :param history: An iterable of paired human and AI message rows.
+        :return: A list of QA pairs.
+        """
+        messages = []
         for human_message, ai_message in history:
-            human_message_dict = json.loads(human_message.message)
-            ai_message_dict = json.loads(ai_message.message)
             sources = json.loads(ai_message.sources) if ai_message.sources else []
 
             llm_message = Answer(
                 id=ai_message.id,
-                content=ai_message_dict['data']['content'],
+                content=ai_message.content,
                 feedback=ai_message.feedback,
                 sources=sources
             )
-            user_message = Question(content=human_message_dict["data"]['content'])
+            user_message = Question(content=human_message.content)
             qa_pair = QA(question=user_message, answer=llm_message)
             messages.append(qa_pair)
 
-        return History(messages=messages)
+        return messages
 
     async def provide_feedback(self, message_id: int, feedback: Optional[Feedback]) -> bool:
         """
@@ -177,7 +319,7 @@ class HistoryAgent:
         :param feedback: The feedback to provide.
         :return: True if feedback was successfully provided, False otherwise.
         """
-        messages = self.retrieve_history()
+        messages = [self._wrap_message(m) for m in await self.message_history.aget_messages()]
         message = next((msg for msg in messages if msg.id == message_id), None)
 
         if not message or message.actor == MessageActor.HUMAN:
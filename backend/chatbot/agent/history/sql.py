@@ -1,15 +1,16 @@
 import json
 import logging
-from benedict import benedict
-from kink import di
+from collections import OrderedDict
+from datetime import datetime
+from kink import di, inject
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_core.messages import BaseMessage, messages_from_dict, message_to_dict
-from peewee import Model, CharField, AutoField, TextField
-from playhouse.db_url import connect
-from playhouse.shortcuts import model_to_dict
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, messages_from_dict, message_to_dict
+from peewee import Model, CharField, AutoField, TextField, IntegerField, DateTimeField, Case, SQL, Value, fn
 from traceloop.sdk import Traceloop
-from typing import List, Optional
+from threading import RLock
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from common.db import AppDB
 from config.app import Settings
 
 logger = logging.getLogger(__name__)
@@ -17,23 +18,134 @@ logger = logging.getLogger(__name__)
 
 class HistoryMessageModel(Model):
     """
-    Peewee model representing a message in the chat history.
+    Peewee model representing a message in the chat history. The role, content and turn are stored
+    in dedicated columns, whereas the serialized message is only kept for messages which cannot be
+    restored from these columns. Rows written before the columnar schema have these columns unset
+    until migrated by HistoryMigration.
     """
     id = AutoField()
     session_id = CharField(null=False)
-    message = TextField(null=False)
+    role = CharField(null=True)
+    content = TextField(null=True)
+    turn = IntegerField(null=True)
+    created_at = DateTimeField(null=True, default=datetime.now)
+    message = TextField(null=True)
     feedback = CharField(null=True)
     sources = TextField(null=True)
 
     class Meta:
         table_name = di[Settings].db.app_db.history_table_name
-        database = connect(di[Settings].db.app_db.connection_string)
+        database = di[AppDB].database
+
+
+class HistorySummaryModel(Model):
+    """
+    Peewee model representing the rolling summary of the messages of a session which no longer fit
+    into the token budget of the history window.
+    """
+    session_id = CharField(primary_key=True)
+    summary = TextField(null=False)
+    last_message_id = IntegerField(null=False)
+    updated_at = DateTimeField(null=False, default=datetime.now)
+
+    class Meta:
+        table_name = di[Settings].db.app_db.history_summary_table_name
+        database = di[AppDB].database
+
+
+@inject
+class HistoryCache:
+    """
+    Thread-safe in-process LRU cache of the parsed messages of open sessions. The cache is
+    bounded by the number of sessions and the total number of cached messages.
+    """
+
+    def __init__(self, settings: Settings):
+        """
+        Initializes the HistoryCache with the provided settings.
+
+        :param settings: Application settings.
+        """
+        self.settings = settings.db.app_db.history_cache
+        self._lock = RLock()
+        self._entries: OrderedDict[str, List[BaseMessage]] = OrderedDict()
+        self._size = 0
+
+    def get(self, session_id: str) -> Optional[List[BaseMessage]]:
+        """
+        Retrieves a copy of the cached messages of a session.
+
+        :param session_id: The session ID.
+        :return: A list of BaseMessage instances if cached, None otherwise.
+        """
+        with self._lock:
+            messages = self._entries.get(session_id)
+            if messages is None:
+                return None
+            self._entries.move_to_end(session_id)
+            return list(messages)
+
+    def put(self, session_id: str, messages: List[BaseMessage]) -> None:
+        """
+        Caches the messages of a session.
+
+        :param session_id: The session ID.
+        :param messages: The messages loaded from the database.
+        """
+        if not self.settings.enabled:
+            return
+        with self._lock:
+            self.evict(session_id)
+            self._entries[session_id] = list(messages)
+            self._size += len(messages)
+            self._shrink()
+
+    def append(self, session_id: str, message: BaseMessage) -> None:
+        """
+        Appends a message to the cached messages of a session if the session is cached.
+
+        :param session_id: The session ID.
+        :param message: The message that has been written to the database.
+        """
+        with self._lock:
+            messages = self._entries.get(session_id)
+            if messages is None:
+                return
+            messages.append(message)
+            self._entries.move_to_end(session_id)
+            self._size += 1
+            self._shrink()
+
+    def evict(self, session_id: str) -> None:
+        """
+        Removes the cached messages of a session.
+
+        :param session_id: The session ID.
+        """
+        with self._lock:
+            messages = self._entries.pop(session_id, None)
+            if messages is not None:
+                self._size -= len(messages)
+
+    def _shrink(self) -> None:
+        """
+        Evicts the least recently used sessions until the cache is within its bounds.
+        """
+        while self._entries and (len(self._entries) > self.settings.max_sessions or
+                                 self._size > self.settings.max_messages):
+            session_id, messages = self._entries.popitem(last=False)
+            self._size -= len(messages)
+            logger.debug(f"Evicted cached history of '{session_id}'")
 
 
 class SQLMessageHistory(BaseChatMessageHistory):
     """
     Class for handling SQL-based message history.
     """
+    MESSAGE_TYPES = {
+        "human": HumanMessage,
+        "ai": AIMessage
+    }
 
     def __init__(self, session_id: str):
         """
@@ -43,19 +155,35 @@ class SQLMessageHistory(BaseChatMessageHistory):
         """
         self.session_id = session_id
         self.sources = []
+        self.cache: HistoryCache = di[HistoryCache]
+        self.app_db: AppDB = di[AppDB]
 
     @property
     def messages(self) -> List[BaseMessage]:
         """
-        Retrieves all messages for the current session.
+        Retrieves all messages for the current session, served from the cache once loaded.
 
         :return: A list of BaseMessage instances.
         """
-        messages = HistoryMessageModel.select().where(
-            HistoryMessageModel.session_id == self.session_id).order_by(
-            HistoryMessageModel.id.asc())
-        message_dicts = [json.loads(model_to_dict(row)["message"]) for row in messages]
-        return messages_from_dict(message_dicts)
+        cached = self.cache.get(self.session_id)
+        if cached is not None:
+            return cached
+
+        rows = [self._normalize(row) for row in self._select()]
+        messages = [self._to_message(row) for row in rows]
+        self.cache.put(self.session_id, messages)
+        return messages
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        """
+        Retrieves all messages for the current session without blocking the event loop.
+
+        :return: A list of BaseMessage instances.
+        """
+        cached = self.cache.get(self.session_id)
+        if cached is not None:
+            return cached
+        return await self.app_db.run(lambda: self.messages)
 
     def messages_wrapped(self):
         """
@@ -63,10 +191,120 @@ class SQLMessageHistory(BaseChatMessageHistory):
 
         :return: An iterable of paired messages.
         """
-        messages = HistoryMessageModel.select().where(
-            HistoryMessageModel.session_id == self.session_id).order_by(
-            HistoryMessageModel.id.asc())
-        return self._pairwise(messages)
+        rows = self._select(HistoryMessageModel.feedback, HistoryMessageModel.sources)
+        return self._pairwise(self._normalize(row) for row in rows)
+
+    @classmethod
+    def messages_wrapped_by_session(cls, session_ids: List[str],
+                                    last_pairs: Optional[int] = None) -> Dict[str, Tuple[list, int]]:
+        """
+        Retrieves the messages of multiple sessions in a paired format using a single query.
+
+        :param session_ids: The session IDs.
+        :param last_pairs: The number of latest message pairs to retrieve per session, all if None.
+        :return: A dictionary mapping each session ID to its paired messages and its total number of pairs.
+        """
+        query = cls._ranked_query(session_ids, last_pairs)
+
+        rows_by_session: Dict[str, list] = {session_id: [] for session_id in session_ids}
+        totals: Dict[str, int] = {session_id: 0 for session_id in session_ids}
+        for row in query:
+            rows_by_session[row.session_id].append(cls._normalize(row))
+            totals[row.session_id] = row.total
+
+        histories = {}
+        for session_id, rows in rows_by_session.items():
+            # keep the complete pairs only, so that a trailing unanswered question cannot shift the pairing
+            if totals[session_id] % 2:
+                rows = rows[:-1]
+            if last_pairs is not None:
+                rows = rows[len(rows) - min(len(rows), 2 * last_pairs):]
+            histories[session_id] = (list(cls._pairwise(rows)), totals[session_id] // 2)
+        return histories
+
+    @classmethod
+    def _ranked_query(cls, session_ids: List[str], last_pairs: Optional[int] = None):
+        """
+        Builds the query projecting the messages of multiple sessions along with their position and the
+        total number of messages of their session.
+
+        :param session_ids: The session IDs.
+        :param last_pairs: The number of latest message pairs to retrieve per session, all if None.
+        :return: The select query ordered by session and message ID, which may include a trailing unanswered
+            question per session.
+        """
+        partition = dict(partition_by=[HistoryMessageModel.session_id])
+        ranked = HistoryMessageModel.select(
+            HistoryMessageModel.id,
+            HistoryMessageModel.session_id,
+            HistoryMessageModel.role,
+            HistoryMessageModel.content,
+            HistoryMessageModel.feedback,
+            HistoryMessageModel.sources,
+            cls._raw_message().alias("raw"),
+            fn.ROW_NUMBER().over(order_by=[HistoryMessageModel.id.asc()], **partition).alias("position"),
+            fn.COUNT(HistoryMessageModel.id).over(**partition).alias("total")
+        ).where(HistoryMessageModel.session_id.in_(session_ids)).alias("ranked")
+
+        query = HistoryMessageModel.select(SQL("*")).from_(ranked)
+        if last_pairs is not None:
+            # one more row than the latest pairs, as it may be a trailing unanswered question to be trimmed
+            query = query.where(ranked.c.position > ranked.c.total - (2 * last_pairs + 1))
+        return query.order_by(ranked.c.session_id, ranked.c.id.asc()).objects()
+
+    def _select(self, *fields):
+        """
+        Builds the query projecting the columns of the messages of the current session.
+
+        :param fields: Additional fields to project.
+        :return: The select query ordered by message ID.
+        """
+        return HistoryMessageModel.select(
+            HistoryMessageModel.id,
+            HistoryMessageModel.role,
+            HistoryMessageModel.content,
+            self._raw_message().alias("raw"),
+            *fields
+        ).where(HistoryMessageModel.session_id == self.session_id).order_by(HistoryMessageModel.id.asc())
+
+    @classmethod
+    def _raw_message(cls) -> Case:
+        """
+        Builds the expression projecting the serialized message of the rows which cannot be restored from
+        their columns, i.e. rows which have not been migrated yet or whose role has no message type of its own.
+
+        :return: The expression, which is NULL for all other rows.
+        """
+        restorable = HistoryMessageModel.role.in_(list(cls.MESSAGE_TYPES))
+        return Case(None, [(HistoryMessageModel.role.is_null() | ~restorable, HistoryMessageModel.message)], None)
+
+    @staticmethod
+    def _normalize(row: HistoryMessageModel) -> HistoryMessageModel:
+        """
+        Populates the role and content of a row which has not been migrated yet from its raw message.
+
+        :param row: The projected row.
+        :return: The row with its role and content set.
+        """
+        if row.role is None and row.raw:
+            message_dict = json.loads(row.raw)
+            row.role = message_dict["type"]
+            row.content = message_dict["data"]["content"]
+        return row
+
+    def _to_message(self, row: HistoryMessageModel) -> BaseMessage:
+        """
+        Converts a projected row into a message.
+
+        :param row: The projected row.
+        :return: A BaseMessage instance.
+        """
+        message_type = self.MESSAGE_TYPES.get(row.role)
+        if message_type:
+            return message_type(content=row.content, id=str(row.id))
+        message = messages_from_dict([json.loads(row.raw)])[0]
+        message.id = str(row.id)
+        return message
 
     def add_message(self, message: BaseMessage):
         """
@@ -74,18 +312,81 @@ class SQLMessageHistory(BaseChatMessageHistory):
 
         :param message: The message to add.
         """
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """
+        Adds multiple messages to the history within a single transaction, using a single insert
+        statement per message. The message IDs are the primary keys of the inserted rows and are
+        therefore not stored in the serialized messages. The messages are only assigned their IDs and
+        appended to the cache once the transaction has been committed, so that a rollback leaves the
+        cache consistent with the database.
+
+        :param messages: The messages to add.
+        """
+        with HistoryMessageModel._meta.database.atomic():
+            ids = [self._insert(message) for message in messages]
+
+        for message, message_id in zip(messages, ids):
+            message.id = str(message_id)
+            self.cache.append(self.session_id, message)
+
+    def _insert(self, message: BaseMessage) -> int:
+        """
+        Inserts a message into the history table. The turn of the message is derived from the number of
+        messages stored for the session by the insert statement itself, so that it is consistent across all
+        handles and replicas writing to the session.
+
+        :param message: The message to insert.
+        :return: The ID of the inserted row.
+        """
         msg_dict = message_to_dict(message)
-        model = HistoryMessageModel.create(session_id=self.session_id,
-                                           message=json.dumps(msg_dict))
-        deep_copy_source = benedict(msg_dict)
-        update = {'data': {'id': model.id}}
-        deep_copy_source.merge(update)
-        model.message = json.dumps(deep_copy_source)
-        if msg_dict['type'] == 'ai':
-            model.sources = json.dumps(self.sources)
-        model.save()
+        msg_dict['data']['id'] = None
+        # human and AI messages are restored from their role and content, so only the other ones are serialized
+        raw = json.dumps(msg_dict) if msg_dict['type'] not in self.MESSAGE_TYPES else None
+        sources = json.dumps(self.sources) if msg_dict['type'] == 'ai' else None
+        values = {
+            HistoryMessageModel.session_id: self.session_id,
+            HistoryMessageModel.role: msg_dict['type'],
+            HistoryMessageModel.content: message.content,
+            HistoryMessageModel.created_at: datetime.now(),
+            HistoryMessageModel.message: raw,
+            HistoryMessageModel.sources: sources
+        }
+        # the position of the message within the session is halved, rounding down first as / does not divide
+        # integers on every database
+        position = fn.COUNT(HistoryMessageModel.id)
+        turn = (position - position.bin_and(1)) / 2
+        select = HistoryMessageModel.select(
+            *(Value(value, converter=field.db_value) for field, value in values.items()),
+            turn
+        ).where(HistoryMessageModel.session_id == self.session_id)
+
+        query = HistoryMessageModel.insert_from(select, [*values, HistoryMessageModel.turn])
+        if HistoryMessageModel._meta.database.returning_clause:
+            return query.returning(HistoryMessageModel.id).tuples().execute()[0][0]
+        return query.execute()
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """
+        Adds multiple messages to the history without blocking the event loop.
+
+        :param messages: The messages to add.
+        """
+        await self.app_db.run(self.add_messages, messages)
 
     async def update_feedback(self, message_id: int, session_id: str, feedback: Optional[str]) -> bool:
+        """
+        Updates the feedback for a specific message without blocking the event loop.
+
+        :param message_id: The ID of the message to update.
+        :param session_id: The session ID.
+        :param feedback: The feedback to apply.
+        :return: True if the feedback was updated, False otherwise.
+        """
+        return await self.app_db.run(self._update_feedback, message_id, session_id, feedback)
+
+    def _update_feedback(self, message_id: int, session_id: str, feedback: Optional[str]) -> bool:
         """
         Updates the feedback for a specific message.
 
@@ -134,6 +435,14 @@ class SQLMessageHistory(BaseChatMessageHistory):
         messages = HistoryMessageModel.select().where(HistoryMessageModel.session_id == self.session_id)
         for message in messages:
             message.delete_instance()
+        HistorySummaryModel.delete().where(HistorySummaryModel.session_id == self.session_id).execute()
+        self.cache.evict(self.session_id)
+
+    async def aclear(self):
+        """
+        Clears all messages for the current session without blocking the event loop.
+        """
+        await self.app_db.run(self.clear)
 
     @staticmethod
     def _pairwise(iterable):
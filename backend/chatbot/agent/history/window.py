@@ -0,0 +1,167 @@
+import asyncio
+import contextvars
+import logging
+from datetime import datetime
+from kink import di, inject
+from langchain.memory.prompt import SUMMARY_PROMPT
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, get_buffer_string
+from langchain_core.output_parsers import StrOutputParser
+from peewee import EXCLUDED, ModelInsert
+from typing import List, Optional, Set, Tuple
+
+from agent.history.sql import HistorySummaryModel
+from agent.llm.service import VertexLLM
+from agent.llm.tokens import estimate_message_tokens
+from common.db import AppDB
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@inject
+class HistoryWindow:
+    """
+    Limits the chat history sent to the model to the latest turns fitting into the configured token
+    budget. The turns which no longer fit are folded into a rolling summary of the session, which is
+    computed in the background and prepended to the window once available.
+    """
+
+    SUMMARY_REQUEST = "Summarize our conversation so far."
+
+    def __init__(self, settings: Settings, app_db: AppDB):
+        """
+        Initializes the HistoryWindow with the provided settings.
+
+        :param settings: Application settings.
+        :param app_db: The app DB executing the queries off the event loop.
+        """
+        self.settings = settings.gcp.vertex.chat_memory
+        self.app_db = app_db
+        self._summarizing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def apply(self, session_id: str, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        Applies the token budget to the messages of a session.
+
+        :param session_id: The session ID.
+        :param messages: All messages of the session in order.
+        :return: The summary of the folded turns, if any, followed by the latest turns within the budget.
+        """
+        budget = self.settings.max_token_limit
+        if estimate_message_tokens(messages) <= budget:
+            return messages
+
+        summary, last_message_id = await self._load_summary(session_id) if self.settings.summarize else (None, 0)
+        summary_messages = [HumanMessage(content=self.SUMMARY_REQUEST), AIMessage(content=summary)] if summary else []
+        cut = self._cut(messages, budget - estimate_message_tokens(summary_messages))
+        folded, window = messages[:cut], messages[cut:]
+        logger.debug(f"Folded {len(folded)} of {len(messages)} messages of '{session_id}' exceeding the token budget")
+
+        pending = [message for message in folded if self._id(message) > last_message_id]
+        if self.settings.summarize and pending:
+            self._schedule(session_id, summary, pending)
+        return summary_messages + window
+
+    @staticmethod
+    def _cut(messages: List[BaseMessage], budget: int) -> int:
+        """
+        Determines the index of the first message of the latest complete turns fitting into the budget.
+        The latest turn is always kept, even if it exceeds the budget on its own.
+
+        :param messages: The messages in order.
+        :param budget: The token budget.
+        :return: The index of the first message within the window.
+        """
+        cut = len(messages)
+        used = 0
+        while cut > 0:
+            start = max(cut - 2 if cut % 2 == 0 else cut - 1, 0)
+            tokens = estimate_message_tokens(messages[start:cut])
+            if used and used + tokens > budget:
+                break
+            used += tokens
+            cut = start
+        return cut
+
+    @staticmethod
+    def _id(message: BaseMessage) -> int:
+        """
+        Returns the database ID of a message.
+
+        :param message: The message.
+        :return: The ID, 0 if the message has not been stored.
+        """
+        return int(message.id) if message.id and str(message.id).isdigit() else 0
+
+    async def _load_summary(self, session_id: str) -> Tuple[Optional[str], int]:
+        """
+        Loads the rolling summary of a session.
+
+        :param session_id: The session ID.
+        :return: A tuple of the summary and the ID of the last message folded into it.
+        """
+        model = await self.app_db.run(HistorySummaryModel.get_or_none, HistorySummaryModel.session_id == session_id)
+        return (model.summary, model.last_message_id) if model else (None, 0)
+
+    def _schedule(self, session_id: str, summary: Optional[str], messages: List[BaseMessage]) -> None:
+        """
+        Schedules the update of the rolling summary of a session in the background, unless an update
+        of the session is already in progress. The task runs in an empty context, so that it neither
+        shares the connection state nor the query counter of the request scheduling it.
+
+        :param session_id: The session ID.
+        :param summary: The current summary.
+        :param messages: The folded messages which are not part of the summary yet.
+        """
+        if session_id in self._summarizing:
+            return
+        self._summarizing.add(session_id)
+        task = contextvars.Context().run(asyncio.create_task, self._summarize(session_id, summary, messages))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, session_id: str, summary: Optional[str], messages: List[BaseMessage]) -> None:
+        """
+        Folds messages into the rolling summary of a session and stores it.
+
+        :param session_id: The session ID.
+        :param summary: The current summary.
+        :param messages: The messages to fold into the summary.
+        """
+        self.app_db.reset_state()
+        try:
+            chain = SUMMARY_PROMPT | di[VertexLLM].model | StrOutputParser()
+            new_summary = await chain.ainvoke({"summary": summary or "", "new_lines": get_buffer_string(messages)})
+            last_message_id = self._id(messages[-1])
+            await self.app_db.run(self._upsert(session_id, new_summary.strip(), last_message_id).execute)
+            logger.debug(f"Updated summary of '{session_id}' up to message {last_message_id}")
+        except Exception as e:
+            logger.warning(f"Failed to summarize the history of '{session_id}': {e}")
+        finally:
+            self.app_db.release()
+            self._summarizing.discard(session_id)
+
+    @staticmethod
+    def _upsert(session_id: str, summary: str, last_message_id: int) -> ModelInsert:
+        """
+        Builds the query inserting the summary of a session or updating the existing one.
+
+        :param session_id: The session ID.
+        :param summary: The summary.
+        :param last_message_id: The ID of the last message folded into the summary.
+        :return: The insert query.
+        """
+        return HistorySummaryModel.insert(
+            session_id=session_id,
+            summary=summary,
+            last_message_id=last_message_id,
+            updated_at=datetime.now()
+        ).on_conflict(
+            conflict_target=[HistorySummaryModel.session_id],
+            update={
+                HistorySummaryModel.summary: EXCLUDED.summary,
+                HistorySummaryModel.last_message_id: EXCLUDED.last_message_id,
+                HistorySummaryModel.updated_at: EXCLUDED.updated_at
+            }
+        )
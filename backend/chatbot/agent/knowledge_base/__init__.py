@@ -0,0 +1,3 @@
+from agent.knowledge_base.components.pp_embedding_filter import PostProcessorEmbeddingFilter
+from agent.knowledge_base.components.pp_llm_compression import PostProcessorLLMCompression
+from agent.knowledge_base.components.pp_redundancy_filter import PostProcessorRedundancyFilter
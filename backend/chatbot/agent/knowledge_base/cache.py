@@ -0,0 +1,68 @@
+import hashlib
+import json
+import logging
+from kink import inject
+from langchain_core.documents import Document
+from typing import Any, Dict, List, Optional
+
+from agent.knowledge_base.version import KnowledgeBaseVersion
+from common.registry import Registry
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@inject
+class RetrievalCache(Registry):
+    """
+    Cache of the documents retrieved for standalone questions keyed by the normalised question, the
+    search arguments including the permission filter and the search type. The cache is cleared
+    whenever the version of the knowledge base changes.
+    """
+
+    def __init__(self, settings: Settings, kb_version: KnowledgeBaseVersion):
+        """
+        Initializes the RetrievalCache with the provided settings.
+
+        :param settings: Application settings.
+        :param kb_version: The version of the knowledge base.
+        """
+        super().__init__(settings.db.vector_db.retrieval_cache, "retrieval")
+        self.kb_version = kb_version
+        self._version: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Returns whether the cache is enabled.
+        """
+        return self.settings.enabled
+
+    @staticmethod
+    def key(question: str, search_kwargs: Dict[str, Any], search_type: str) -> str:
+        """
+        Builds the cache key of a retrieval.
+
+        :param question: The standalone question.
+        :param search_kwargs: The search arguments including the permission filter.
+        :param search_type: The search type of the retriever.
+        :return: The cache key.
+        """
+        normalized = " ".join(question.split()).casefold()
+        arguments = json.dumps(search_kwargs, sort_keys=True, default=str)
+        return hashlib.sha256(f"{search_type}\x00{arguments}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    async def aget(self, key: str) -> Optional[List[Document]]:
+        """
+        Retrieves the cached documents of a retrieval, clearing the cache first if the knowledge base
+        has changed.
+
+        :param key: The cache key.
+        :return: The cached documents if found, None otherwise.
+        """
+        version = await self.kb_version.current()
+        if self._version is not None and version != self._version:
+            logger.info("Clearing retrieval cache for the changed knowledge base")
+            self.clear()
+        self._version = version
+        return self.get(key)
@@ -0,0 +1,51 @@
+import logging
+from kink import di, inject
+from langchain.retrievers.document_compressors import EmbeddingsFilter
+from langchain_core.documents import Document
+from threading import Lock
+from typing import List, Optional
+
+from agent.knowledge_base.service import VectorDB
+from agent.knowledge_base.spi import PostProcessorAbstract
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@inject(alias=PostProcessorAbstract)
+class PostProcessorEmbeddingFilter(PostProcessorAbstract):
+    """
+    Stage dropping the documents whose embedding is not similar enough to the embedding of the query.
+    """
+
+    def __init__(self, settings: Settings):
+        super().__init__(name="embedding_filter")
+        self.settings = settings
+        self._lock = Lock()
+        self._filter: Optional[EmbeddingsFilter] = None
+
+    @property
+    def filter(self) -> EmbeddingsFilter:
+        """
+        Returns the embeddings filter, building it on first access.
+
+        :return: EmbeddingsFilter instance.
+        """
+        with self._lock:
+            if self._filter is None:
+                logger.info("Initializing embeddings filter")
+                self._filter = EmbeddingsFilter(
+                    embeddings=di[VectorDB].embedding,
+                    similarity_threshold=self.settings.db.vector_db.retriever.post_processing.similarity_threshold
+                )
+            return self._filter
+
+    async def aprocess(self, query: str, documents: List[Document]) -> List[Document]:
+        """
+        Filters the documents by their similarity to the query.
+
+        :param query: The query the documents have been retrieved for.
+        :param documents: The retrieved documents.
+        :return: The documents similar to the query.
+        """
+        return list(await self.filter.acompress_documents(documents, query))
@@ -0,0 +1,46 @@
+import logging
+from kink import di, inject
+from langchain.retrievers.document_compressors import LLMChainExtractor
+from langchain_core.documents import Document
+from threading import Lock
+from typing import List, Optional
+
+from agent.knowledge_base.spi import PostProcessorAbstract
+from agent.llm.service import VertexLLM
+
+logger = logging.getLogger(__name__)
+
+
+@inject(alias=PostProcessorAbstract)
+class PostProcessorLLMCompression(PostProcessorAbstract):
+    """
+    Stage extracting only the parts of each document which are relevant to the query using the LLM.
+    """
+
+    def __init__(self):
+        super().__init__(name="llm_compression")
+        self._lock = Lock()
+        self._compressor: Optional[LLMChainExtractor] = None
+
+    @property
+    def compressor(self) -> LLMChainExtractor:
+        """
+        Returns the LLM chain extractor, building it on first access.
+
+        :return: LLMChainExtractor instance.
+        """
+        with self._lock:
+            if self._compressor is None:
+                logger.info("Initializing LLM chain extractor")
+                self._compressor = LLMChainExtractor.from_llm(llm=di[VertexLLM].model)
+            return self._compressor
+
+    async def aprocess(self, query: str, documents: List[Document]) -> List[Document]:
+        """
+        Compresses the documents to their parts relevant to the query.
+
+        :param query: The query the documents have been retrieved for.
+        :param documents: The retrieved documents.
+        :return: The compressed documents.
+        """
+        return list(await self.compressor.acompress_documents(documents, query))
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from kink import di, inject
+from langchain_community.document_transformers import EmbeddingsRedundantFilter
+from langchain_core.documents import Document
+from threading import Lock
+from typing import List, Optional
+
+from agent.knowledge_base.service import VectorDB
+from agent.knowledge_base.spi import PostProcessorAbstract
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@inject(alias=PostProcessorAbstract)
+class PostProcessorRedundancyFilter(PostProcessorAbstract):
+    """
+    Stage dropping the documents whose embedding is nearly identical to the one of a preceding document.
+    """
+
+    def __init__(self, settings: Settings):
+        super().__init__(name="redundancy_filter")
+        self.settings = settings
+        self._lock = Lock()
+        self._filter: Optional[EmbeddingsRedundantFilter] = None
+
+    @property
+    def filter(self) -> EmbeddingsRedundantFilter:
+        """
+        Returns the redundancy filter, building it on first access.
+
+        :return: EmbeddingsRedundantFilter instance.
+        """
+        with self._lock:
+            if self._filter is None:
+                logger.info("Initializing embeddings redundant filter")
+                self._filter = EmbeddingsRedundantFilter(
+                    embeddings=di[VectorDB].embedding,
+                    similarity_threshold=self.settings.db.vector_db.retriever.post_processing.redundancy_threshold
+                )
+            return self._filter
+
+    async def aprocess(self, query: str, documents: List[Document]) -> List[Document]:
+        """
+        Removes the redundant documents. The filter only provides a synchronous API, hence it is
+        executed off the event loop.
+
+        :param query: The query the documents have been retrieved for.
+        :param documents: The retrieved documents.
+        :return: The documents without the redundant ones.
+        """
+        return list(await asyncio.to_thread(self.filter.transform_documents, documents))
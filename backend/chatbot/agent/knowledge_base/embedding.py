@@ -0,0 +1,287 @@
+import array
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from kink import inject
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel, Field
+from threading import Lock, RLock
+from typing import List, Optional, Tuple
+
+from config.app import Settings, EmbeddingCacheSettings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCacheStats(BaseModel):
+    """
+    Model representing the statistics of the query embedding cache.
+    """
+    size: int = Field(description="The number of embeddings cached in memory")
+    disk_size: int = Field(description="The number of embeddings cached on disk")
+    hits: int = Field(description="The number of queries whose embedding has been found in memory")
+    disk_hits: int = Field(description="The number of queries whose embedding has been found on disk")
+    misses: int = Field(description="The number of queries which have been embedded remotely")
+    hit_ratio: float = Field(description="The ratio of queries served from the cache")
+    latency_saved: float = Field(
+        description="The estimated time in seconds saved by the cache based on the average remote latency"
+    )
+
+
+class EmbeddingDiskCache:
+    """
+    Persistent tier of the embedding cache stored in a SQLite database, so that the cached embeddings
+    survive restarts.
+    """
+
+    def __init__(self, path: str, settings: EmbeddingCacheSettings):
+        """
+        Initializes the EmbeddingDiskCache, creating the database if it does not exist.
+
+        :param path: The path of the SQLite database file.
+        :param settings: Embedding cache settings.
+        """
+        self.settings = settings
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS embedding_cache_accessed_at ON embedding_cache (accessed_at)")
+        self._size = self._connection.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        """
+        Returns the number of cached embeddings.
+        """
+        return self._size
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """
+        Retrieves a cached embedding which has not expired.
+
+        :param key: The cache key.
+        :return: The embedding if cached, None otherwise.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT vector, created_at FROM embedding_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.settings.ttl:
+                self._connection.execute("DELETE FROM embedding_cache WHERE key = ?", (key,))
+                self._size -= 1
+                return None
+            self._connection.execute("UPDATE embedding_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return array.array("d", row[0]).tolist()
+
+    def put(self, key: str, embedding: List[float]) -> None:
+        """
+        Caches an embedding, evicting the least recently used ones beyond the maximum size.
+
+        :param key: The cache key.
+        :param embedding: The embedding.
+        """
+        now = time.time()
+        vector = array.array("d", embedding).tobytes()
+        with self._lock:
+            inserted = self._connection.execute(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, vector, now, now)
+            ).rowcount
+            self._size = self._size + 1 if inserted else self._size
+            if self._size > self.settings.disk_max_entries:
+                self._connection.execute("DELETE FROM embedding_cache WHERE created_at < ?", (now - self.settings.ttl,))
+                self._connection.execute(
+                    "DELETE FROM embedding_cache WHERE key IN "
+                    "(SELECT key FROM embedding_cache ORDER BY accessed_at LIMIT "
+                    "MAX(0, (SELECT COUNT(*) FROM embedding_cache) - ?))",
+                    (self.settings.disk_max_entries,)
+                )
+                self._size = self._connection.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+
+@inject
+class EmbeddingCache:
+    """
+    Two-tier cache of query embeddings keyed by the embedding model and the normalised query. The
+    first tier is an in-memory LRU, the optional second tier is a SQLite database on disk.
+    """
+
+    def __init__(self, settings: Settings):
+        """
+        Initializes the EmbeddingCache with the provided settings.
+
+        :param settings: Application settings.
+        """
+        self.settings = settings.gcp.vertex.embedding.cache
+        self._lock = RLock()
+        self._entries: OrderedDict[str, Tuple[float, List[float]]] = OrderedDict()
+        self._disk = EmbeddingDiskCache(self.settings.disk_path, self.settings) if self.settings.disk_path else None
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._miss_latency = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Returns whether the cache is enabled.
+        """
+        return self.settings.enabled
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        """
+        Builds the cache key of a query.
+
+        :param model: The name of the embedding model.
+        :param text: The query.
+        :return: The cache key.
+        """
+        normalized = " ".join(text.split()).casefold()
+        return hashlib.sha256(f"{model}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """
+        Retrieves a cached embedding from memory.
+
+        :param key: The cache key.
+        :return: The embedding if cached, None otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, embedding = entry
+            if time.monotonic() - created_at > self.settings.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return embedding
+
+    def get_from_disk(self, key: str) -> Optional[List[float]]:
+        """
+        Retrieves a cached embedding from disk and promotes it to memory.
+
+        :param key: The cache key.
+        :return: The embedding if cached, None otherwise.
+        """
+        if self._disk is None:
+            return None
+        embedding = self._disk.get(key)
+        if embedding is not None:
+            with self._lock:
+                self._disk_hits += 1
+            self._put_in_memory(key, embedding)
+        return embedding
+
+    def put(self, key: str, embedding: List[float], latency: float) -> None:
+        """
+        Caches an embedding which has been computed remotely.
+
+        :param key: The cache key.
+        :param embedding: The embedding.
+        :param latency: The time in seconds it took to compute the embedding.
+        """
+        with self._lock:
+            self._misses += 1
+            self._miss_latency += latency
+        self._put_in_memory(key, embedding)
+        if self._disk is not None:
+            self._disk.put(key, embedding)
+
+    def stats(self) -> EmbeddingCacheStats:
+        """
+        Returns the statistics of the cache.
+
+        :return: An EmbeddingCacheStats model.
+        """
+        with self._lock:
+            hits = self._hits + self._disk_hits
+            lookups = hits + self._misses
+            average_latency = self._miss_latency / self._misses if self._misses else 0.0
+            return EmbeddingCacheStats(
+                size=len(self._entries),
+                disk_size=self._disk.size if self._disk is not None else 0,
+                hits=self._hits,
+                disk_hits=self._disk_hits,
+                misses=self._misses,
+                hit_ratio=hits / lookups if lookups else 0.0,
+                latency_saved=hits * average_latency
+            )
+
+    def _put_in_memory(self, key: str, embedding: List[float]) -> None:
+        """
+        Caches an embedding in memory, evicting the least recently used ones beyond the maximum size.
+
+        :param key: The cache key.
+        :param embedding: The embedding.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.settings.max_entries:
+                self._entries.popitem(last=False)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings serving the query embeddings from the cache before embedding them remotely. The
+    document embeddings are always computed by the underlying embeddings.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: EmbeddingCache):
+        """
+        Initializes the CachedEmbeddings wrapping the given embeddings.
+
+        :param embeddings: The underlying embeddings.
+        :param model: The name of the embedding model.
+        :param cache: The query embedding cache.
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        if not self.cache.enabled:
+            return self.embeddings.embed_query(text)
+
+        key = self.cache.key(self.model, text)
+        embedding = self.cache.get(key) or self.cache.get_from_disk(key)
+        if embedding is not None:
+            return embedding
+
+        start = time.perf_counter()
+        embedding = self.embeddings.embed_query(text)
+        self.cache.put(key, embedding, time.perf_counter() - start)
+        return embedding
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if not self.cache.enabled:
+            return await self.embeddings.aembed_query(text)
+
+        key = self.cache.key(self.model, text)
+        embedding = self.cache.get(key) or await asyncio.to_thread(self.cache.get_from_disk, key)
+        if embedding is not None:
+            return embedding
+
+        start = time.perf_counter()
+        embedding = await self.embeddings.aembed_query(text)
+        await asyncio.to_thread(self.cache.put, key, embedding, time.perf_counter() - start)
+        return embedding
@@ -0,0 +1,26 @@
+from typing import Any, Dict, Tuple
+
+
+def metadata_clause(db_filter: Dict[str, Any], alias: str = "e") -> Tuple[str, Dict[str, Any]]:
+    """
+    Translates a metadata filter of the vector store into a SQL condition on the JSONB metadata of the
+    embeddings table. Only equality and membership conditions are supported, any other operator is
+    rejected rather than ignored, so that a permission filter is never silently dropped.
+
+    :param db_filter: The metadata filter, e.g. the permission filter of the user.
+    :param alias: The alias of the embeddings table in the query.
+    :return: A tuple of the SQL condition, which is empty or starts with AND, and its parameters.
+    """
+    clauses = []
+    params = {}
+    for i, (field, condition) in enumerate(db_filter.items()):
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        if set(condition) - {"$eq", "$in"} or len(condition) != 1:
+            raise ValueError(f"Unsupported filter condition {condition} on '{field}'")
+        operator, value = next(iter(condition.items()))
+        values = value if operator == "$in" else [value]
+        clauses.append(f" AND ({alias}.cmetadata ->> :field_{i}) = ANY(:values_{i})")
+        params[f"field_{i}"] = field
+        params[f"values_{i}"] = [str(v) for v in values]
+    return "".join(clauses), params
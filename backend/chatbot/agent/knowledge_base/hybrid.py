@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import re
+import time
+from kink import inject
+from langchain_core.documents import Document
+from sqlalchemy import text
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent.knowledge_base.filter import metadata_clause
+from agent.knowledge_base.packing import SCORE_KEY
+from agent.knowledge_base.service import VectorDB
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@inject
+class HybridSearch:
+    """
+    Retrieves documents by combining a Postgres full-text search with the vector similarity search on
+    the same collection. Both searches are executed concurrently and their rankings are fused with
+    reciprocal-rank fusion, so that exact matches of page keys, error codes or product names are found
+    even if their embeddings are not similar to the one of the query. The GIN index of the full-text
+    search is managed by the VectorIndexManager on startup or migration.
+    """
+
+    def __init__(self, settings: Settings, vector_db: VectorDB):
+        """
+        Initializes the HybridSearch with the provided settings and vector database.
+
+        :param settings: Application settings.
+        :param vector_db: The vector database containing the collection.
+        """
+        self.settings = settings.db.vector_db.retriever.hybrid
+        self.collection_name = settings.db.vector_db.collection_name
+        self.vector_db = vector_db
+        if not re.fullmatch(r"\w+", self.settings.text_search_config):
+            raise ValueError(f"Invalid text search configuration '{self.settings.text_search_config}'")
+        self._tsvector = f"to_tsvector('{self.settings.text_search_config}'::regconfig, e.document)"
+
+    async def asearch(self, query: str, k: int, db_filter: Optional[Dict[str, Any]] = None,
+                      search_params: Optional[Dict[str, int]] = None) -> List[Document]:
+        """
+        Retrieves the documents for a query from both searches and fuses their rankings.
+
+        :param query: The query.
+        :param k: The number of documents to return.
+        :param db_filter: The metadata filter, e.g. the permission filter of the user.
+        :param search_params: The search parameters of the vector index for this query.
+        :return: The documents ordered by their fused score, which is stored in their metadata.
+        """
+        fetch_k = max(k, self.settings.fetch_k)
+        start = time.perf_counter()
+        vector, lexical = await asyncio.gather(
+            self._avector_search(query, fetch_k, db_filter, search_params),
+            self._alexical_search(query, fetch_k, db_filter)
+        )
+        documents = self._fuse([(vector, self.settings.vector_weight), (lexical, self.settings.lexical_weight)])[:k]
+        logger.debug(f"Hybrid search fused {len(vector)} vector and {len(lexical)} lexical into {len(documents)} "
+                     f"documents in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return documents
+
+    async def _avector_search(self, query: str, k: int, db_filter: Optional[Dict[str, Any]],
+                              search_params: Optional[Dict[str, int]]) -> List[Document]:
+        """
+        Retrieves the documents most similar to the query.
+
+        :param query: The query.
+        :param k: The number of documents to return.
+        :param db_filter: The metadata filter.
+        :param search_params: The search parameters of the vector index.
+        :return: The documents ordered by similarity.
+        """
+        embedding = await self.vector_db.embedding.aembed_query(query)
+        results = await self.vector_db.anearest(embedding, k, db_filter, search_params)
+        return [document for document, _ in results]
+
+    async def _alexical_search(self, query: str, k: int, db_filter: Optional[Dict[str, Any]]) -> List[Document]:
+        """
+        Retrieves the documents matching the query by full-text search.
+
+        :param query: The query in web search syntax.
+        :param k: The number of documents to return.
+        :param db_filter: The metadata filter.
+        :return: The documents ordered by their text search rank.
+        """
+        clause, params = metadata_clause(db_filter or {})
+        statement = text(
+            f"SELECT e.id, e.document, e.cmetadata, ts_rank_cd({self._tsvector}, q) AS rank "
+            f"FROM langchain_pg_embedding e JOIN langchain_pg_collection c ON e.collection_id = c.uuid, "
+            f"websearch_to_tsquery('{self.settings.text_search_config}'::regconfig, :query) q "
+            f"WHERE c.name = :name AND {self._tsvector} @@ q{clause} "
+            f"ORDER BY rank DESC LIMIT :k"
+        )
+        async with self.vector_db.async_db.session_maker() as session:
+            rows = (await session.execute(
+                statement, {"query": query, "name": self.collection_name, "k": k, **params})).all()
+        return [Document(id=str(row.id), page_content=row.document, metadata=row.cmetadata or {}) for row in rows]
+
+    def _fuse(self, rankings: List[Tuple[List[Document], float]]) -> List[Document]:
+        """
+        Fuses the rankings of the searches with reciprocal-rank fusion.
+
+        :param rankings: The rankings of the searches along with their weights.
+        :return: The documents ordered by their fused score.
+        """
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        for ranking, weight in rankings:
+            for rank, document in enumerate(ranking, start=1):
+                key = document.id or document.page_content
+                scores[key] = scores.get(key, 0.0) + weight / (self.settings.rrf_k + rank)
+                documents.setdefault(key, document)
+
+        fused = []
+        for key in sorted(scores, key=scores.get, reverse=True):
+            document = documents[key]
+            fused.append(Document(id=document.id, page_content=document.page_content,
+                                  metadata={**document.metadata, SCORE_KEY: scores[key]}))
+        return fused
@@ -0,0 +1,163 @@
+import logging
+import re
+from kink import inject
+from sqlalchemy import Connection, create_engine, text
+from typing import Callable, Optional
+
+from agent.knowledge_base.service import VectorDB
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+
+
+@inject
+class VectorIndexManager:
+    """
+    Verifies and creates the indexes of the vector DB as an explicit step on startup or migration,
+    before any request is served. Missing indexes are created concurrently, so that the collection
+    stays readable and writable meanwhile, and invalid leftovers of an interrupted creation are
+    rebuilt. Failures are logged rather than raised, as the searches still work without the indexes.
+    """
+
+    INDEXES_QUERY = text(
+        "SELECT c.relname AS name, pg_get_indexdef(i.indexrelid) AS definition, i.indisvalid AS valid "
+        "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        f"WHERE i.indrelid = to_regclass('{EMBEDDING_TABLE}')"
+    )
+
+    def __init__(self, settings: Settings):
+        """
+        Initializes the VectorIndexManager with the provided settings.
+
+        :param settings: Application settings.
+        """
+        self.settings = settings.db.vector_db
+        self.index_settings = settings.db.vector_db.index
+        self.hybrid_settings = settings.db.vector_db.retriever.hybrid
+        if not re.fullmatch(r"\w+", self.hybrid_settings.text_search_config):
+            raise ValueError(f"Invalid text search configuration '{self.hybrid_settings.text_search_config}'")
+        if self.index_settings.type is not None and self.index_settings.type not in VectorDB.INDEX_TYPES:
+            raise ValueError(f"Unknown vector index type '{self.index_settings.type}', "
+                             f"available are {sorted(VectorDB.INDEX_TYPES)}")
+
+    def ensure(self, create: bool = False) -> None:
+        """
+        Verifies the configured indexes and creates the missing ones if enabled.
+
+        :param create: Flag to create the missing indexes regardless of the configuration.
+        """
+        vector_index = self.index_settings.type is not None
+        text_search_index = self.settings.retriever.type == "hybrid"
+        if not vector_index and not text_search_index:
+            return
+        engine = create_engine(self.settings.connection_string, isolation_level="AUTOCOMMIT")
+        try:
+            with engine.connect() as connection:
+                if connection.execute(text(f"SELECT to_regclass('{EMBEDDING_TABLE}')")).scalar() is None:
+                    logger.warning(f"Table '{EMBEDDING_TABLE}' does not exist yet, its indexes are not verified")
+                    return
+                if vector_index:
+                    self._ensure_vector_index(connection, create or self.index_settings.create)
+                if text_search_index:
+                    self._ensure_text_search_index(connection, create or self.hybrid_settings.create_index)
+        except Exception as e:
+            logger.error(f"Failed to ensure the vector DB indexes: {e}")
+        finally:
+            engine.dispose()
+
+    def _ensure_vector_index(self, connection: Connection, create: bool) -> None:
+        """
+        Verifies that the configured index of the embeddings exists and creates it if it does not.
+
+        :param connection: The connection in autocommit mode.
+        :param create: Flag to create the index if it does not exist.
+        """
+        index_type = self.index_settings.type
+        options, _, _ = VectorDB.INDEX_TYPES[index_type]
+        self._ensure_index(
+            connection,
+            name=f"ix_{EMBEDDING_TABLE}_{index_type}",
+            definition=(f"USING {index_type} (embedding vector_cosine_ops) "
+                        f"{options.format(**self.index_settings.model_dump())}"),
+            create=create,
+            matches=lambda definition: f"USING {index_type} " in definition,
+            prepare=self._ensure_dimensions
+        )
+
+    def _ensure_text_search_index(self, connection: Connection, create: bool) -> None:
+        """
+        Verifies that the GIN index of the full-text search of the hybrid retriever exists and creates it
+        if it does not.
+
+        :param connection: The connection in autocommit mode.
+        :param create: Flag to create the index if it does not exist.
+        """
+        config = self.hybrid_settings.text_search_config
+        name = f"ix_{EMBEDDING_TABLE}_tsv_{config}"
+        self._ensure_index(
+            connection,
+            name=name,
+            definition=f"USING gin (to_tsvector('{config}'::regconfig, document))",
+            create=create,
+            matches=lambda definition: f" {name} " in definition
+        )
+
+    def _ensure_index(self, connection: Connection, name: str, definition: str, create: bool,
+                      matches: Callable[[str], bool], prepare: Optional[Callable[[Connection], bool]] = None) -> None:
+        """
+        Verifies that a valid index matching the definition exists, otherwise drops the invalid one, if
+        any, and creates the index concurrently. Failures are logged rather than raised.
+
+        :param connection: The connection in autocommit mode.
+        :param name: The name of the index.
+        :param definition: The definition of the index following the table name.
+        :param create: Flag to create the index if it does not exist.
+        :param matches: Checks if the definition of an existing index provides the index.
+        :param prepare: Prepares the table for the creation of the index, returning False if it cannot be created.
+        """
+        try:
+            existing = [row for row in connection.execute(self.INDEXES_QUERY).all() if matches(row.definition)]
+            valid = [row for row in existing if row.valid]
+            for row in valid:
+                logger.info(f"Verified vector DB index '{row.name}': {row.definition}")
+            if valid:
+                return
+            if not create:
+                logger.warning(f"Vector DB index '{name}' does not exist, searches scan sequentially")
+                return
+            if prepare is not None and not prepare(connection):
+                return
+
+            for row in existing:
+                logger.warning(f"Dropping invalid vector DB index '{row.name}' left by an interrupted creation")
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {row.name}"))
+            logger.info(f"Creating vector DB index '{name}' concurrently, this may take a while for large tables")
+            connection.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {EMBEDDING_TABLE} {definition}"))
+            logger.info(f"Vector DB index '{name}' has been created")
+        except Exception as e:
+            logger.error(f"Failed to ensure vector DB index '{name}': {e}")
+
+    def _ensure_dimensions(self, connection: Connection) -> bool:
+        """
+        Ensures that the embedding column has dimensions, which is required to index it.
+
+        :param connection: The connection in autocommit mode.
+        :return: True if the column has dimensions, False otherwise.
+        """
+        column_type = connection.execute(text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            f"WHERE attrelid = '{EMBEDDING_TABLE}'::regclass AND attname = 'embedding'"
+        )).scalar_one()
+        if column_type != "vector":
+            return True
+        if self.index_settings.dimensions is None:
+            logger.warning("Embedding column has no dimensions to be indexed, the dimensions need to be configured")
+            return False
+
+        logger.info(f"Altering embedding column to {self.index_settings.dimensions} dimensions")
+        connection.execute(text(
+            f"ALTER TABLE {EMBEDDING_TABLE} ALTER COLUMN embedding TYPE vector({self.index_settings.dimensions})"))
+        return True
@@ -0,0 +1,274 @@
+import logging
+import re
+import time
+from kink import inject
+from langchain_core.documents import Document
+from pydantic import BaseModel, Field
+from threading import Lock
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+from agent.llm.tokens import estimate_tokens
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+SCORE_KEY = "score"
+
+
+class PackingStats(BaseModel):
+    """
+    Model representing the statistics of the context packing.
+    """
+    requests: int = Field(description="The number of packed contexts")
+    documents_in: int = Field(description="The total number of retrieved documents passed to the packing")
+    documents_out: int = Field(description="The total number of documents of the packed contexts")
+    duplicates: int = Field(description="The total number of near-duplicate documents dropped")
+    merged: int = Field(description="The total number of documents merged into a neighbour of the same source")
+    truncated: int = Field(description="The total number of documents dropped for exceeding the token budget")
+    tokens_in: int = Field(description="The total estimated number of tokens of the retrieved documents")
+    tokens_out: int = Field(description="The total estimated number of tokens of the packed contexts")
+    tokens_saved: int = Field(description="The total estimated number of prompt tokens saved by the packing")
+    latency: float = Field(description="The total time in seconds spent packing")
+
+
+class PackingReport(BaseModel):
+    """
+    Model representing the outcome of packing the context of a single request.
+    """
+    documents_in: int = Field(description="The number of retrieved documents")
+    documents_out: int = Field(description="The number of documents of the packed context")
+    duplicates: int = Field(description="The number of near-duplicate documents dropped")
+    merged: int = Field(description="The number of documents merged into a neighbour of the same source")
+    truncated: int = Field(description="The number of documents dropped for exceeding the token budget")
+    tokens_in: int = Field(description="The estimated number of tokens of the retrieved documents")
+    tokens_out: int = Field(description="The estimated number of tokens of the packed context")
+
+    @property
+    def tokens_saved(self) -> int:
+        """
+        Returns the estimated number of prompt tokens saved by the packing.
+        """
+        return self.tokens_in - self.tokens_out
+
+
+@inject
+class ContextPacker:
+    """
+    Packs the retrieved documents into the context of the answer prompt. Near-duplicate documents are
+    dropped, the remaining ones are selected by score within the token budget and the selected
+    documents of the same source are merged into one in the order of their position within the
+    source, removing the overlap of adjacent chunks.
+    Documents without a score are ranked by their retrieval order.
+    """
+
+    WORD = re.compile(r"\w+")
+
+    def __init__(self, settings: Settings):
+        """
+        Initializes the ContextPacker with the provided settings.
+
+        :param settings: Application settings.
+        """
+        self.settings = settings.db.vector_db.retriever.packing
+        self._lock = Lock()
+        self._stats = PackingStats(requests=0, documents_in=0, documents_out=0, duplicates=0, merged=0, truncated=0,
+                                   tokens_in=0, tokens_out=0, tokens_saved=0, latency=0.0)
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Returns whether the context packing is enabled.
+        """
+        return self.settings.enabled
+
+    def pack(self, documents: List[Document]) -> List[Document]:
+        """
+        Packs the retrieved documents into the context of the answer prompt.
+
+        :param documents: The retrieved documents in retrieval order.
+        :return: The packed documents ordered by score.
+        """
+        start = time.perf_counter()
+        ranked = sorted(enumerate(documents), key=lambda item: (-self._score(item[1]), item[0]))
+        unique, duplicates = self._deduplicate([document for _, document in ranked])
+        selected, truncated = self._select(unique)
+        packed, merged = self._merge(selected) if self.settings.merge_neighbours else (selected, 0)
+
+        report = PackingReport(
+            documents_in=len(documents),
+            documents_out=len(packed),
+            duplicates=duplicates,
+            merged=merged,
+            truncated=truncated,
+            tokens_in=sum(estimate_tokens(document.page_content) for document in documents),
+            tokens_out=sum(estimate_tokens(document.page_content) for document in packed)
+        )
+        latency = time.perf_counter() - start
+        logger.info(f"Packed {report.documents_in} into {report.documents_out} documents, dropping "
+                    f"{duplicates} duplicates, merging {merged} and truncating {truncated}, "
+                    f"saving {report.tokens_saved} of {report.tokens_in} prompt tokens in {latency * 1000:.1f}ms")
+        self._record(report, latency)
+        return packed
+
+    def stats(self) -> PackingStats:
+        """
+        Returns the statistics of the context packing.
+
+        :return: A PackingStats model.
+        """
+        with self._lock:
+            return self._stats.model_copy()
+
+    @staticmethod
+    def _score(document: Document) -> float:
+        """
+        Returns the score of a document.
+
+        :param document: The document.
+        :return: The score, 0 if the document has no score.
+        """
+        score = document.metadata.get(SCORE_KEY)
+        return float(score) if score is not None else 0.0
+
+    def _shingles(self, text: str) -> FrozenSet[Tuple[str, ...]]:
+        """
+        Builds the word shingles of a text.
+
+        :param text: The text.
+        :return: The set of shingles.
+        """
+        words = self.WORD.findall(text.lower())
+        size = self.settings.shingle_size
+        if len(words) <= size:
+            return frozenset([tuple(words)])
+        return frozenset(tuple(words[i:i + size]) for i in range(len(words) - size + 1))
+
+    def _deduplicate(self, documents: List[Document]) -> Tuple[List[Document], int]:
+        """
+        Drops the documents whose shingles are nearly identical to the ones of a higher ranked document.
+
+        :param documents: The documents ordered by rank.
+        :return: A tuple of the unique documents and the number of dropped documents.
+        """
+        threshold = self.settings.duplicate_threshold
+        kept: List[Tuple[Document, FrozenSet[Tuple[str, ...]]]] = []
+        for document in documents:
+            shingles = self._shingles(document.page_content)
+            if any(self._jaccard(shingles, other) >= threshold for _, other in kept):
+                continue
+            kept.append((document, shingles))
+        return [document for document, _ in kept], len(documents) - len(kept)
+
+    @staticmethod
+    def _jaccard(a: FrozenSet, b: FrozenSet) -> float:
+        """
+        Computes the Jaccard similarity of two sets.
+
+        :param a: The first set.
+        :param b: The second set.
+        :return: The similarity between 0 and 1.
+        """
+        union = len(a | b)
+        return len(a & b) / union if union else 1.0
+
+    def _select(self, documents: List[Document]) -> Tuple[List[Document], int]:
+        """
+        Selects the documents in order of rank until the token budget is exhausted. The best ranked
+        document is always selected.
+
+        :param documents: The documents ordered by rank.
+        :return: A tuple of the selected documents and the number of dropped documents.
+        """
+        budget = self.settings.max_tokens
+        selected: List[Document] = []
+        used = 0
+        for document in documents:
+            tokens = estimate_tokens(document.page_content)
+            if selected and used + tokens > budget:
+                break
+            selected.append(document)
+            used += tokens
+        return selected, len(documents) - len(selected)
+
+    def _merge(self, documents: List[Document]) -> Tuple[List[Document], int]:
+        """
+        Merges the documents of the same source into the best ranked document of that source. The chunks
+        are joined in order of their position within the source, so that the overlap of adjacent chunks
+        is found regardless of their rank.
+
+        :param documents: The documents ordered by rank.
+        :return: A tuple of the merged documents ordered by rank and the number of merged documents.
+        """
+        sources: Dict[str, List[Document]] = {}
+        packed: List[Union[Document, str]] = []
+        for document in documents:
+            source: Optional[str] = document.metadata.get("source")
+            if source is None:
+                packed.append(document)
+            elif source not in sources:
+                sources[source] = [document]
+                packed.append(source)
+            else:
+                sources[source].append(document)
+
+        for index, item in enumerate(packed):
+            if isinstance(item, Document):
+                continue
+            chunks = self._in_position_order(sources[item])
+            page_content = chunks[0].page_content
+            for chunk in chunks[1:]:
+                page_content = self._join(page_content, chunk.page_content)
+            packed[index] = Document(page_content=page_content, metadata=dict(sources[item][0].metadata))
+        return packed, len(documents) - len(packed)
+
+    def _in_position_order(self, chunks: List[Document]) -> List[Document]:
+        """
+        Orders the chunks of a source by the first position key present in all of them.
+
+        :param chunks: The chunks ordered by rank.
+        :return: The chunks ordered by position, or by rank if their positions are unknown.
+        """
+        for key in self.settings.position_keys:
+            positions = [chunk.metadata.get(key) for chunk in chunks]
+            if all(isinstance(position, (int, float)) and not isinstance(position, bool) for position in positions):
+                return [chunk for _, chunk in sorted(zip(positions, chunks), key=lambda item: item[0])]
+        return chunks
+
+    def _join(self, head: str, tail: str) -> str:
+        """
+        Joins two chunks of the same source, removing the overlap between the end of the first and the
+        beginning of the second chunk.
+
+        :param head: The first chunk.
+        :param tail: The second chunk.
+        :return: The joined chunks.
+        """
+        probe = tail[:self.settings.min_overlap]
+        if len(probe) == self.settings.min_overlap:
+            window = head[-self.settings.max_overlap:]
+            position = window.find(probe)
+            while position != -1:
+                if tail.startswith(window[position:]):
+                    return head + tail[len(window) - position:]
+                position = window.find(probe, position + 1)
+        return f"{head}\n\n{tail}"
+
+    def _record(self, report: PackingReport, latency: float) -> None:
+        """
+        Records the outcome of packing a context.
+
+        :param report: The report of the packing.
+        :param latency: The time in seconds spent packing.
+        """
+        with self._lock:
+            stats = self._stats
+            stats.requests += 1
+            stats.documents_in += report.documents_in
+            stats.documents_out += report.documents_out
+            stats.duplicates += report.duplicates
+            stats.merged += report.merged
+            stats.truncated += report.truncated
+            stats.tokens_in += report.tokens_in
+            stats.tokens_out += report.tokens_out
+            stats.tokens_saved += report.tokens_saved
+            stats.latency += latency
@@ -0,0 +1,101 @@
+import logging
+import time
+from kink import inject
+from langchain_core.documents import Document
+from pydantic import BaseModel, Field
+from threading import Lock
+from typing import Any, Dict, List
+
+from agent.knowledge_base.spi import PostProcessorAbstract
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats(BaseModel):
+    """
+    Model representing the statistics of a post-processing stage.
+    """
+    name: str = Field(description="The name of the stage")
+    invocations: int = Field(default=0, description="The number of times the stage has been applied")
+    latency: float = Field(default=0.0, description="The total time in seconds spent in the stage")
+    documents_in: int = Field(default=0, description="The total number of documents passed to the stage")
+    documents_out: int = Field(default=0, description="The total number of documents returned by the stage")
+
+
+@inject
+class PostProcessingPipeline:
+    """
+    Pipeline of the configured post-processing stages applied in order to the retrieved documents.
+    """
+
+    def __init__(self, settings: Settings, components: List[PostProcessorAbstract]):
+        """
+        Initializes the PostProcessingPipeline with the stages configured in the settings.
+
+        :param settings: Application settings.
+        :param components: All available post-processing stages.
+        """
+        available = {component.name: component for component in components}
+        names = settings.db.vector_db.retriever.post_processing.stages
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ValueError(f"Unknown post-processing stages {unknown}, available are {sorted(available)}")
+
+        self._stages: List[PostProcessorAbstract] = [available[name] for name in names]
+        self._lock = Lock()
+        self._stats: Dict[str, StageStats] = {name: StageStats(name=name) for name in names}
+        logger.info(f"Initialized post-processing pipeline with stages {names}")
+
+    @property
+    def stages(self) -> List[PostProcessorAbstract]:
+        """
+        Returns the configured stages in the order they are applied.
+
+        :return: A list of PostProcessorAbstract instances.
+        """
+        return self._stages
+
+    async def aprocess(self, inputs: Dict[str, Any]) -> List[Document]:
+        """
+        Applies all stages to the retrieved documents.
+
+        :param inputs: A dictionary containing the query and the retrieved documents.
+        :return: The processed documents.
+        """
+        query: str = inputs["query"]
+        documents: List[Document] = inputs["documents"]
+        for stage in self._stages:
+            start = time.perf_counter()
+            processed = await stage.aprocess(query, documents)
+            latency = time.perf_counter() - start
+            logger.debug(f"Post-processing stage '{stage.name}' reduced {len(documents)} to "
+                         f"{len(processed)} documents in {latency * 1000:.1f}ms")
+            self._record(stage.name, latency, len(documents), len(processed))
+            documents = processed
+        return documents
+
+    def stats(self) -> List[StageStats]:
+        """
+        Returns the statistics of the configured stages.
+
+        :return: A list of StageStats models.
+        """
+        with self._lock:
+            return [stats.model_copy() for stats in self._stats.values()]
+
+    def _record(self, name: str, latency: float, documents_in: int, documents_out: int) -> None:
+        """
+        Records an application of a stage.
+
+        :param name: The name of the stage.
+        :param latency: The time in seconds spent in the stage.
+        :param documents_in: The number of documents passed to the stage.
+        :param documents_out: The number of documents returned by the stage.
+        """
+        with self._lock:
+            stats = self._stats[name]
+            stats.invocations += 1
+            stats.latency += latency
+            stats.documents_in += documents_in
+            stats.documents_out += documents_out
@@ -0,0 +1,107 @@
+import logging
+import numpy as np
+import time
+from kink import inject
+from langchain_core.documents import Document
+from typing import Any, Dict, List, Optional
+
+from agent.knowledge_base.packing import SCORE_KEY
+from agent.knowledge_base.service import VectorDB
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def maximal_marginal_relevance(query: np.ndarray, embeddings: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """
+    Selects the embeddings maximising the marginal relevance to the query. The similarities among the
+    candidates are computed incrementally against the last selected embedding only, so that each step
+    costs a single matrix-vector product.
+
+    :param query: The normalised embedding of the query.
+    :param embeddings: The normalised embeddings of the candidates as rows.
+    :param k: The number of embeddings to select.
+    :param lambda_mult: The trade-off between relevance (1) and diversity (0).
+    :return: The indices of the selected embeddings in order of selection.
+    """
+    count = min(k, len(embeddings))
+    if count <= 0:
+        return []
+
+    relevance = embeddings @ query
+    redundancy = np.full(len(embeddings), -np.inf, dtype=embeddings.dtype)
+    available = np.ones(len(embeddings), dtype=bool)
+    selected: List[int] = []
+    index = int(np.argmax(relevance))
+    while True:
+        selected.append(index)
+        available[index] = False
+        if len(selected) == count:
+            return selected
+        redundancy = np.maximum(redundancy, embeddings @ embeddings[index])
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        index = int(np.argmax(np.where(available, scores, -np.inf)))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Normalises vectors to unit length along their last axis.
+
+    :param vectors: The vectors.
+    :return: The normalised vectors, zero vectors are left unchanged.
+    """
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+@inject
+class RerankSearch:
+    """
+    Retrieves documents by over-fetching the candidates most similar to the query along with their
+    stored embeddings in a single query and reranking them in-process. Candidates below the score
+    threshold are dropped and the remaining ones are diversified by maximal marginal relevance.
+    """
+
+    def __init__(self, settings: Settings, vector_db: VectorDB):
+        """
+        Initializes the RerankSearch with the provided settings and vector database.
+
+        :param settings: Application settings.
+        :param vector_db: The vector database containing the collection.
+        """
+        self.settings = settings.db.vector_db.retriever.rerank
+        self.vector_db = vector_db
+
+    async def asearch(self, query: str, k: int, db_filter: Optional[Dict[str, Any]] = None,
+                      search_params: Optional[Dict[str, int]] = None) -> List[Document]:
+        """
+        Retrieves and reranks the documents for a query.
+
+        :param query: The query.
+        :param k: The number of documents to return.
+        :param db_filter: The metadata filter, e.g. the permission filter of the user.
+        :param search_params: The search parameters of the vector index for this query.
+        :return: The documents in order of selection with their similarity to the query stored in their metadata.
+        """
+        embedding = await self.vector_db.embedding.aembed_query(query)
+        results = await self.vector_db.anearest(embedding, max(k, self.settings.fetch_k), db_filter, search_params,
+                                                with_embeddings=True)
+        if not results:
+            return []
+        documents = [document for document, _ in results]
+        embeddings = np.asarray([vector for _, vector in results], dtype=np.float32)
+
+        start = time.perf_counter()
+        query_vector = normalize(np.asarray(embedding, dtype=np.float32))
+        candidates = normalize(embeddings)
+        similarities = candidates @ query_vector
+        if self.settings.score_threshold is not None:
+            keep = np.flatnonzero(similarities >= self.settings.score_threshold)
+            documents = [documents[i] for i in keep]
+            candidates, similarities = candidates[keep], similarities[keep]
+
+        selected = maximal_marginal_relevance(query_vector, candidates, k, self.settings.lambda_mult)
+        logger.debug(f"Reranked {len(embeddings)} into {len(selected)} documents "
+                     f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return [Document(id=documents[i].id, page_content=documents[i].page_content,
+                         metadata={**documents[i].metadata, SCORE_KEY: float(similarities[i])}) for i in selected]
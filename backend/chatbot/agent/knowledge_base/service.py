@@ -1,14 +1,15 @@
 import logging
 from kink import di, inject
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import LLMChainExtractor
-from langchain_core.retrievers import BaseRetriever
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_google_vertexai import VertexAIEmbeddings
 from langchain_postgres import PGVector
-from typing import Any, Dict
+from sqlalchemy import text
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from agent.auth.service import GCPAuth
-from agent.llm.service import VertexLLM
+from agent.knowledge_base.embedding import CachedEmbeddings, EmbeddingCache
+from agent.knowledge_base.filter import metadata_clause
 from config.app import Settings
 
 logger = logging.getLogger(__name__)
@@ -19,80 +20,107 @@ class KnowledgeBaseAgent:
     Agent for managing knowledge base retrieval.
     """
 
-    def __init__(self, user_id: str):
+    def __init__(self, user_id: str, user: Dict[str, Any]):
         """
-        Initializes the KnowledgeBaseAgent with the specified user ID.
+        Initializes the KnowledgeBaseAgent with the specified user.
 
         :param user_id: The ID of the user.
+        :param user: The registered information of the user including the permission filter.
         """
         settings: Settings = di[Settings]
-        vector_db: VectorDB = di[VectorDB]
-        user: Dict[str, Any] = di[user_id]
-
-        logger.debug(f"Initializing vector DB retriever for user '{user_id}'")
-        vertex: VertexLLM = di[VertexLLM]
-        compressor = LLMChainExtractor.from_llm(llm=vertex.model)
-
-        self.db_retriever = vector_db.db.as_retriever(
-            search_type=settings.db.vector_db.retriever.type,
-            search_kwargs={
-                "k": settings.db.vector_db.retriever.k,
-                "filter": user['filter']
-            }
-        )
 
-        '''Contextual compression is disabled since according to experience, it removes 
-        important information from the context. Keeping it for future use.'''
-        self._retriever = ContextualCompressionRetriever(
-            base_compressor=compressor,
-            base_retriever=self.db_retriever
-        )
+        logger.debug(f"Initializing vector DB search arguments for user '{user_id}'")
+        self._search_kwargs = {
+            "k": settings.db.vector_db.retriever.k,
+            "filter": user['filter']
+        }
 
     @property
-    def retriever(self) -> BaseRetriever:
+    def search_kwargs(self) -> Dict[str, Any]:
         """
-        Returns the base retriever for the knowledge base.
+        Returns the user specific search arguments to be supplied to the shared retriever at runtime.
 
-        :return: BaseRetriever instance.
+        :return: Dictionary containing the number of documents and the permission filter.
         """
-        return self.db_retriever
+        return self._search_kwargs
 
 
 @inject
 class VectorDB:
     """
-    Class for managing the vector database and embeddings.
+    Class for managing the vector database and embeddings. If configured, the search parameters of
+    the approximate nearest neighbour index of the embeddings are set per nearest neighbour query,
+    raised for queries with a metadata filter, as the index is scanned before the filter is applied.
+    The nearest neighbour queries run on the asynchronous driver, whose connections, which are only
+    used by the chat retriever and thus by filtered queries, default to the parameters of filtered
+    queries for the searches of the vector store itself. The index itself is
+    managed by the VectorIndexManager on startup or migration.
     """
 
-    def __init__(self, settings: Settings, gcp_auth: GCPAuth):
+    ITERATIVE_SCANS = ("strict_order", "relaxed_order")
+    MAX_EF_SEARCH = 1000
+
+    INDEX_TYPES = {
+        "hnsw": ("WITH (m = {m}, ef_construction = {ef_construction})", "hnsw.ef_search", "ef_search"),
+        "ivfflat": ("WITH (lists = {lists})", "ivfflat.probes", "probes")
+    }
+
+    def __init__(self, settings: Settings, gcp_auth: GCPAuth, embedding_cache: EmbeddingCache):
         """
         Initializes the VectorDB with the specified settings and GCP authentication.
 
         :param settings: Application settings.
         :param gcp_auth: GCP authentication service.
+        :param embedding_cache: The cache of query embeddings.
         """
         logger.info("Initializing Vertex AI embeddings")
-        self._embedding = VertexAIEmbeddings(
-            project=settings.gcp.project_id,
-            credentials=gcp_auth.credentials if gcp_auth.has_service_account() else None,
-            model_name=settings.gcp.vertex.embedding.model,
-            location=settings.gcp.vertex.embedding.location
+        self._embedding = CachedEmbeddings(
+            embeddings=VertexAIEmbeddings(
+                project=settings.gcp.project_id,
+                credentials=gcp_auth.credentials if gcp_auth.has_service_account() else None,
+                model_name=settings.gcp.vertex.embedding.model,
+                location=settings.gcp.vertex.embedding.location
+            ),
+            model=settings.gcp.vertex.embedding.model,
+            cache=embedding_cache
         )
 
+        self.settings = settings.db.vector_db
+        self.index_settings = settings.db.vector_db.index
+        if self.index_settings.type is not None and self.index_settings.type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown vector index type '{self.index_settings.type}', "
+                             f"available are {sorted(self.INDEX_TYPES)}")
+        if self.index_settings.iterative_scan not in (None, *self.ITERATIVE_SCANS):
+            raise ValueError(f"Unknown iterative scan '{self.index_settings.iterative_scan}', "
+                             f"available are {list(self.ITERATIVE_SCANS)}")
+
         logger.info("Initializing PGVector")
         self._db = PGVector(
             connection=settings.db.vector_db.connection_string,
             collection_name=settings.db.vector_db.collection_name,
             embeddings=self._embedding,
-            use_jsonb=True
+            embedding_length=self.index_settings.dimensions,
+            use_jsonb=True,
+            engine_args=self._engine_args(self.search_params())
+        )
+
+        logger.info("Initializing asynchronous PGVector")
+        self._async_db = PGVector(
+            connection=settings.db.vector_db.connection_string,
+            collection_name=settings.db.vector_db.collection_name,
+            embeddings=self._embedding,
+            embedding_length=self.index_settings.dimensions,
+            use_jsonb=True,
+            async_mode=True,
+            engine_args=self._engine_args(self.search_params(filtered=True))
         )
 
     @property
-    def embedding(self) -> VertexAIEmbeddings:
+    def embedding(self) -> Embeddings:
         """
-        Returns the Vertex AI embeddings instance.
+        Returns the Vertex AI embeddings instance serving the query embeddings from the cache.
 
-        :return: VertexAIEmbeddings instance.
+        :return: Embeddings instance.
         """
         return self._embedding
 
@@ -104,3 +132,101 @@ class VectorDB:
         :return: PGVector instance.
         """
         return self._db
+
+    @property
+    def async_db(self) -> PGVector:
+        """
+        Returns the PGVector database instance operating on the asynchronous driver.
+
+        :return: PGVector instance in async mode.
+        """
+        return self._async_db
+
+    @staticmethod
+    def _engine_args(search_params: Dict[str, Union[int, str]]) -> Optional[Dict[str, Any]]:
+        """
+        Builds the engine arguments applying search parameters to every connection of an engine.
+
+        :param search_params: The search parameters by their Postgres setting name.
+        :return: The engine arguments, None if there are no search parameters.
+        """
+        options = " ".join(f"-c {setting}={value}" for setting, value in search_params.items())
+        return {"connect_args": {"options": options}} if options else None
+
+    def search_params(self, overrides: Optional[Dict[str, int]] = None, k: int = 0,
+                      filtered: bool = False) -> Dict[str, Union[int, str]]:
+        """
+        Returns the search parameters of the configured index. As the index is scanned before the metadata
+        filter is applied, a filtered query would return fewer results than requested if only a few of the
+        scanned rows pass the filter. The candidate list or the probed lists of filtered queries are thus
+        raised by the configured oversampling factor and the iterative scan is enabled if configured.
+
+        :param overrides: The search parameters of a single query by their short name, i.e. ef_search or probes.
+        :param k: The number of results of the query, the HNSW candidate list is raised to at least this size.
+        :param filtered: Flag indicating that the query has a metadata filter.
+        :return: Dictionary of the search parameters by their Postgres setting name.
+        """
+        index_type = self.index_settings.type
+        if index_type is None:
+            return {}
+        _, setting, name = self.INDEX_TYPES[index_type]
+        value = int((overrides or {}).get(name, getattr(self.index_settings, name)))
+        factor = max(1, self.index_settings.filter_oversampling) if filtered else 1
+        if name == "ef_search":
+            value = min(max(value * factor, k), self.MAX_EF_SEARCH)
+        else:
+            value = min(value * factor, self.index_settings.lists)
+        params: Dict[str, Union[int, str]] = {setting: value}
+        if filtered and self.index_settings.iterative_scan is not None:
+            params[f"{index_type}.iterative_scan"] = self.index_settings.iterative_scan
+        return params
+
+    async def asearch(self, query: str, k: int, db_filter: Optional[Dict[str, Any]] = None,
+                      search_params: Optional[Dict[str, int]] = None) -> List[Document]:
+        """
+        Retrieves the documents most similar to a query.
+
+        :param query: The query.
+        :param k: The number of documents to return.
+        :param db_filter: The metadata filter, e.g. the permission filter of the user.
+        :param search_params: The search parameters of the vector index for this query.
+        :return: The documents ordered by similarity.
+        """
+        embedding = await self.embedding.aembed_query(query)
+        results = await self.anearest(embedding, k, db_filter, search_params)
+        return [document for document, _ in results]
+
+    async def anearest(self, embedding: List[float], k: int, db_filter: Optional[Dict[str, Any]] = None,
+                       search_params: Optional[Dict[str, int]] = None,
+                       with_embeddings: bool = False) -> List[Tuple[Document, Optional[List[float]]]]:
+        """
+        Queries the documents of the collection nearest to an embedding by cosine distance on the
+        asynchronous driver. The search parameters of the index, raised if the query is filtered, are
+        set for this query only.
+
+        :param embedding: The embedding of the query.
+        :param k: The number of documents to return.
+        :param db_filter: The metadata filter, e.g. the permission filter of the user.
+        :param search_params: The search parameters overriding the configured ones, i.e. ef_search or probes.
+        :param with_embeddings: Flag to return the stored embeddings of the documents.
+        :return: A list of tuples of the documents ordered by distance and their embeddings if requested.
+        """
+        clause, params = metadata_clause(db_filter or {})
+        statement = text(
+            f"SELECT e.id, e.document, e.cmetadata{', e.embedding::real[] AS vector' if with_embeddings else ''} "
+            f"FROM langchain_pg_embedding e JOIN langchain_pg_collection c ON e.collection_id = c.uuid "
+            f"WHERE c.name = :name{clause} "
+            f"ORDER BY e.embedding <=> CAST(:embedding AS vector) LIMIT :k"
+        )
+        async with self._async_db.session_maker() as session:
+            async with session.begin():
+                for setting, value in self.search_params(search_params, k, filtered=bool(db_filter)).items():
+                    await session.execute(text(f"SET LOCAL {setting} = {value}"))
+                rows = (await session.execute(statement, {
+                    "name": self.settings.collection_name,
+                    "embedding": str(list(embedding)),
+                    "k": k,
+                    **params
+                })).all()
+        return [(Document(id=str(row.id), page_content=row.document, metadata=row.cmetadata or {}),
+                 row.vector if with_embeddings else None) for row in rows]
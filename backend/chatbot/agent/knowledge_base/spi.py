@@ -0,0 +1,39 @@
+from abc import ABC, abstractmethod
+from langchain_core.documents import Document
+from typing import List
+
+
+class PostProcessorAbstract(ABC):
+    """
+    Abstract base class for the post-processing stages applied to the documents retrieved from the
+    knowledge base. Implementations must build their expensive resources lazily, so that stages which
+    are not configured cost nothing.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initializes the PostProcessorAbstract with the name the stage is configured by.
+
+        :param name: The name of the stage.
+        """
+        self._name = name
+
+    @abstractmethod
+    async def aprocess(self, query: str, documents: List[Document]) -> List[Document]:
+        """
+        Processes the retrieved documents. Implementations must override this method.
+
+        :param query: The query the documents have been retrieved for.
+        :param documents: The retrieved documents.
+        :return: The processed documents.
+        """
+        pass
+
+    @property
+    def name(self) -> str:
+        """
+        Returns the name of the stage.
+
+        :return: The stage name as a string.
+        """
+        return self._name
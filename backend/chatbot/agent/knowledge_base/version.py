@@ -0,0 +1,117 @@
+import asyncio
+import contextvars
+import logging
+import time
+from kink import inject
+from sqlalchemy import text
+from threading import Lock
+from typing import Optional, Set
+
+from agent.knowledge_base.service import VectorDB
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+@inject
+class KnowledgeBaseVersion:
+    """
+    Tracks the version of the knowledge base, so that the caches derived from it can be invalidated
+    once it changes. The version combines a fingerprint of the documents in the collection, which is
+    refreshed periodically in the background, with a local generation which is increased on explicit
+    invalidation. Reading the version never waits for the fingerprint, whose computation scans the
+    whole collection.
+
+    The fingerprint covers the IDs, contents and metadata of the documents, so that documents
+    re-ingested in place under their previous IDs change it as well. The generation is kept per
+    process, so an explicit invalidation only takes effect in the process serving it, whereas the
+    other processes detect the change through the fingerprint at their next check.
+    """
+
+    FINGERPRINT_QUERY = text(
+        "SELECT COUNT(*), COALESCE(SUM(hashtext("
+        "e.id || ':' || COALESCE(e.document, '') || ':' || COALESCE(e.cmetadata::text, ''))::bigint), 0) "
+        "FROM langchain_pg_embedding e JOIN langchain_pg_collection c ON e.collection_id = c.uuid "
+        "WHERE c.name = :name"
+    )
+
+    def __init__(self, settings: Settings, vector_db: VectorDB):
+        """
+        Initializes the KnowledgeBaseVersion with the provided settings and vector database.
+
+        :param settings: Application settings.
+        :param vector_db: The vector database containing the knowledge base.
+        """
+        self.settings = settings
+        self.vector_db = vector_db
+        self._lock = Lock()
+        self._generation = 0
+        self._fingerprint: Optional[str] = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def current(self) -> str:
+        """
+        Returns the current version of the knowledge base without waiting for the fingerprint of the
+        collection. If the configured interval has elapsed since the last check, the fingerprint is
+        refreshed in the background and the version changes once the refresh has completed.
+
+        :return: The version as a string.
+        """
+        self._schedule_refresh()
+        with self._lock:
+            return f"{self._generation}:{self._fingerprint}"
+
+    def invalidate(self) -> None:
+        """
+        Changes the version of the knowledge base in this process explicitly, e.g. after an ingestion,
+        and refreshes the fingerprint of the collection on the next access.
+        """
+        with self._lock:
+            self._generation += 1
+            self._checked_at = 0.0
+        logger.info("Knowledge base version has been invalidated")
+
+    def _schedule_refresh(self) -> None:
+        """
+        Schedules the refresh of the fingerprint in the background if the configured interval has elapsed
+        since the last check, unless a refresh is already in progress.
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._checked_at
+            if self._refreshing or elapsed < self.settings.db.vector_db.version_check_interval:
+                return
+            self._refreshing = True
+            self._checked_at = time.monotonic()
+        task = contextvars.Context().run(asyncio.create_task, self._refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self) -> None:
+        """
+        Refreshes the fingerprint of the collection.
+        """
+        try:
+            fingerprint = await self._compute_fingerprint()
+        except Exception as e:
+            logger.warning(f"Failed to check the version of the knowledge base: {e}")
+        else:
+            with self._lock:
+                if self._fingerprint is not None and fingerprint != self._fingerprint:
+                    logger.info("Knowledge base has changed")
+                self._fingerprint = fingerprint
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    async def _compute_fingerprint(self) -> str:
+        """
+        Computes the fingerprint of the documents in the collection, which scans all their contents.
+
+        :return: The fingerprint as a string.
+        """
+        async with self.vector_db.async_db.session_maker() as session:
+            count, checksum = (await session.execute(
+                self.FINGERPRINT_QUERY, {"name": self.settings.db.vector_db.collection_name})).one()
+        return f"{count}:{checksum}"
@@ -1,7 +1,10 @@
+import itertools
 import logging
 from kink import inject
 from langchain_core.language_models import BaseLanguageModel
 from langchain_google_vertexai import ChatVertexAI, VertexAI
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Tuple, Type
 
 from agent.auth.service import GCPAuth
 from config.app import Settings
@@ -9,23 +12,64 @@ from config.app import Settings
 logger = logging.getLogger(__name__)
 
 
-@inject(use_factory=True)
-class ChatVertexLLM:
+@inject
+class LLMPool:
     """
-    Class for initializing and providing access to the Vertex AI chat language model.
+    Process-wide pool of language model clients keyed by their model settings. Clients are created
+    on demand up to the configured pool size and handed out in a round-robin fashion, so that the
+    underlying connections and gRPC channels are reused across all sessions.
     """
 
     def __init__(self, settings: Settings, gcp_auth: GCPAuth):
         """
-        Initializes the ChatVertexLLM with the provided settings and GCP authentication.
+        Initializes the LLMPool with the provided settings and GCP authentication.
 
         :param settings: Application settings.
         :param gcp_auth: GCP authentication service.
         """
-        logger.debug("Initializing Vertex AI chat language model")
-        credentials = gcp_auth.credentials if gcp_auth.has_service_account() else None
-        self._model = ChatVertexAI(
-            credentials=credentials,
+        self.pool_size = max(1, settings.gcp.vertex.model.pool_size)
+        self.gcp_auth = gcp_auth
+        self._lock = Lock()
+        self._clients: Dict[Tuple, List[BaseLanguageModel]] = {}
+        self._cycles: Dict[Tuple, Iterator[BaseLanguageModel]] = {}
+
+    def acquire(self, model_class: Type[BaseLanguageModel], **params: Any) -> BaseLanguageModel:
+        """
+        Returns a pooled client of the given model class configured with the given parameters.
+
+        :param model_class: The language model class.
+        :param params: The parameters of the language model.
+        :return: BaseLanguageModel instance.
+        """
+        key = (model_class, tuple(sorted(params.items())))
+        with self._lock:
+            clients = self._clients.setdefault(key, [])
+            if len(clients) < self.pool_size:
+                logger.debug(f"Initializing {model_class.__name__} client {len(clients) + 1}/{self.pool_size}")
+                credentials = self.gcp_auth.credentials if self.gcp_auth.has_service_account() else None
+                client = model_class(credentials=credentials, **params)
+                clients.append(client)
+                if len(clients) == self.pool_size:
+                    self._cycles[key] = itertools.cycle(clients)
+                return client
+            return next(self._cycles[key])
+
+
+@inject(use_factory=True)
+class ChatVertexLLM:
+    """
+    Class for providing access to a pooled Vertex AI chat language model.
+    """
+
+    def __init__(self, settings: Settings, llm_pool: LLMPool):
+        """
+        Initializes the ChatVertexLLM with the provided settings and LLM pool.
+
+        :param settings: Application settings.
+        :param llm_pool: The pool of language model clients.
+        """
+        self._model = llm_pool.acquire(
+            ChatVertexAI,
             top_p=settings.gcp.vertex.model.top_p,
             top_k=settings.gcp.vertex.model.top_k,
             model_name=settings.gcp.vertex.model.name,
@@ -48,20 +92,18 @@ class ChatVertexLLM:
 @inject(use_factory=True)
 class VertexLLM:
     """
-    Class for initializing and providing access to the Vertex AI language model.
+    Class for providing access to a pooled Vertex AI language model.
     """
 
-    def __init__(self, settings: Settings, gcp_auth: GCPAuth):
+    def __init__(self, settings: Settings, llm_pool: LLMPool):
         """
-        Initializes the VertexLLM with the provided settings and GCP authentication.
+        Initializes the VertexLLM with the provided settings and LLM pool.
 
         :param settings: Application settings.
-        :param gcp_auth: GCP authentication service.
+        :param llm_pool: The pool of language model clients.
         """
-        logger.debug("Initializing Vertex AI language model")
-        credentials = gcp_auth.credentials if gcp_auth.has_service_account() else None
-        self._model = VertexAI(
-            credentials=credentials,
+        self._model = llm_pool.acquire(
+            VertexAI,
             top_p=settings.gcp.vertex.model.top_p,
             top_k=settings.gcp.vertex.model.top_k,
             model_name=settings.gcp.vertex.model.name,
@@ -0,0 +1,26 @@
+import math
+from langchain_core.messages import BaseMessage
+from typing import Sequence
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens of a text locally without calling the tokenizer of the model.
+
+    :param text: The text.
+    :return: The estimated number of tokens.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: Sequence[BaseMessage]) -> int:
+    """
+    Estimates the number of tokens of chat messages including the overhead of their roles.
+
+    :param messages: The messages.
+    :return: The estimated number of tokens.
+    """
+    return sum(estimate_tokens(str(message.content)) + MESSAGE_OVERHEAD_TOKENS for message in messages)
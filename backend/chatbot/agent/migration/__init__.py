@@ -0,0 +1,2 @@
+from agent.migration.components.m0001_history_columns import MigrationHistoryColumns
+from agent.migration.components.m0002_indexes import MigrationIndexes
@@ -0,0 +1,28 @@
+import logging
+from kink import inject
+from peewee import Database
+from playhouse.migrate import SchemaMigrator
+
+from agent.history.migration import HistoryMigration
+from agent.migration.spi import MigrationAbstract
+
+logger = logging.getLogger(__name__)
+
+
+@inject(alias=MigrationAbstract)
+class MigrationHistoryColumns(MigrationAbstract):
+    """
+    Migration adding the columnar schema to the history table.
+    """
+
+    def __init__(self):
+        super().__init__(version=1, description="Add role, content, turn and created_at columns to history")
+
+    def apply(self, database: Database, migrator: SchemaMigrator) -> None:
+        """
+        Adds the columns of the columnar schema. The rows are backfilled separately in batches.
+
+        :param database: The app DB.
+        :param migrator: The schema migrator for the app DB.
+        """
+        HistoryMigration().add_columns()
@@ -0,0 +1,48 @@
+import logging
+from kink import inject
+from peewee import Database
+from playhouse.migrate import SchemaMigrator
+
+from agent.history.sql import HistoryMessageModel
+from agent.migration.spi import MigrationAbstract
+from agent.session.service import SessionModel
+from agent.user.info import SpacePermission
+
+logger = logging.getLogger(__name__)
+
+
+@inject(alias=MigrationAbstract)
+class MigrationIndexes(MigrationAbstract):
+    """
+    Migration adding the composite indexes backing the frequent queries of the app DB.
+    """
+
+    def __init__(self):
+        super().__init__(version=2, description="Add composite indexes for history, session and permission lookups")
+
+    def apply(self, database: Database, migrator: SchemaMigrator) -> None:
+        """
+        Creates the indexes unless they already exist.
+
+        :param database: The app DB.
+        :param migrator: The schema migrator for the app DB.
+        """
+        indexes = [
+            HistoryMessageModel.index(
+                HistoryMessageModel.session_id,
+                HistoryMessageModel.id,
+                name=f"{HistoryMessageModel._meta.table_name}_session_id_id"
+            ),
+            SessionModel.index(
+                SessionModel.user_id,
+                SessionModel.last_modified_at.desc(),
+                name=f"{SessionModel._meta.table_name}_user_id_last_modified_at"
+            ),
+            SpacePermission.index(
+                SpacePermission.user_id,
+                SpacePermission.space_id,
+                name=f"{SpacePermission._meta.table_name}_user_id_space_id"
+            )
+        ]
+        for index in indexes:
+            database.execute(index)
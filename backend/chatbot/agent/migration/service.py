@@ -0,0 +1,68 @@
+import logging
+from datetime import datetime
+from kink import di, inject
+from peewee import Model, CharField, DateTimeField, IntegerField
+from playhouse.migrate import SchemaMigrator
+from typing import List
+
+from agent.migration.spi import MigrationAbstract
+from common.db import AppDB
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaVersionModel(Model):
+    """
+    Peewee model representing an applied migration of the app DB.
+    """
+    version = IntegerField(primary_key=True)
+    description = CharField(null=False)
+    applied_at = DateTimeField(null=False, default=datetime.now)
+
+    class Meta:
+        table_name = di[Settings].db.app_db.migration_table_name
+        database = di[AppDB].database
+
+
+@inject
+class MigrationAgent:
+    """
+    Agent responsible for applying the versioned migrations of the app DB.
+    """
+
+    def __init__(self, components: List[MigrationAbstract]):
+        """
+        Initializes the MigrationAgent with the given migration components.
+
+        :param components: List of migration components implementing MigrationAbstract.
+        """
+        self.components = sorted(components, key=lambda m: m.version)
+        self.database = SchemaVersionModel._meta.database
+
+    def pending(self) -> List[MigrationAbstract]:
+        """
+        Lists the migrations which have not been applied yet.
+
+        :return: A list of pending migrations in ascending order of their version.
+        """
+        self.database.create_tables([SchemaVersionModel])
+        applied = {model.version for model in SchemaVersionModel.select(SchemaVersionModel.version)}
+        return [m for m in self.components if m.version not in applied]
+
+    def migrate(self) -> int:
+        """
+        Applies all pending migrations, each within its own transaction.
+
+        :return: The number of applied migrations.
+        """
+        pending = self.pending()
+        migrator = SchemaMigrator.from_database(self.database)
+        for migration in pending:
+            logger.info(f"Applying app DB migration {migration.version}: {migration.description}")
+            with self.database.atomic():
+                migration.apply(self.database, migrator)
+                SchemaVersionModel.create(version=migration.version, description=migration.description)
+
+        logger.info(f"App DB is up to date with {len(pending)} newly applied migrations")
+        return len(pending)
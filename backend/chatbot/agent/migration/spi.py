@@ -0,0 +1,47 @@
+from abc import ABC, abstractmethod
+from peewee import Database
+from playhouse.migrate import SchemaMigrator
+
+
+class MigrationAbstract(ABC):
+    """
+    Abstract base class for defining a versioned migration of the app DB.
+    """
+
+    def __init__(self, version: int, description: str):
+        """
+        Initializes the MigrationAbstract with a version and a description.
+
+        :param version: The version of the migration, migrations are applied in ascending order.
+        :param description: The description of the migration.
+        """
+        self._version = version
+        self._description = description
+
+    @abstractmethod
+    def apply(self, database: Database, migrator: SchemaMigrator) -> None:
+        """
+        Abstract method to apply the migration. Must be implemented by subclasses.
+
+        :param database: The app DB.
+        :param migrator: The schema migrator for the app DB.
+        """
+        pass
+
+    @property
+    def version(self) -> int:
+        """
+        Returns the version of the migration.
+
+        :return: The migration version.
+        """
+        return self._version
+
+    @property
+    def description(self) -> str:
+        """
+        Returns the description of the migration.
+
+        :return: The migration description.
+        """
+        return self._description
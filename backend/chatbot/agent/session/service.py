@@ -2,14 +2,17 @@ import logging
 from datetime import datetime, timedelta
 from kink import di, inject
 from peewee import Model, CharField, DateTimeField
-from playhouse.db_url import connect
 from playhouse.shortcuts import model_to_dict
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from agent.chat.service import ChatAgent
 from agent.history.service import HistoryAgent
+from agent.history.sql import HistoryCache
 from agent.knowledge_base.service import KnowledgeBaseAgent
+from agent.user.info import load_user_info
+from common.db import AppDB
+from common.registry import SessionRegistry, UserRegistry, sizeof
 from config.app import Settings
 
 logger = logging.getLogger(__name__)
@@ -38,7 +41,56 @@ class SessionModel(Model):
 
     class Meta:
         table_name = di[Settings].db.app_db.session_table_name
-        database = connect(di[Settings].db.app_db.connection_string)
+        database = di[AppDB].database
+
+
+class SessionHandle:
+    """
+    Lightweight handle of an open session which builds its chatbot on first use.
+    """
+
+    def __init__(self, user_id: str, session_id: str):
+        """
+        Initializes the SessionHandle without building the chatbot.
+
+        :param user_id: The user ID associated with the session.
+        :param session_id: The session ID.
+        """
+        self.user_id = user_id
+        self.session_id = session_id
+        self._chatbot: Optional[ChatAgent] = None
+
+    @property
+    def is_materialized(self) -> bool:
+        """
+        Returns whether the chatbot of the session has already been built.
+        """
+        return self._chatbot is not None
+
+    @property
+    def footprint(self) -> int:
+        """
+        Returns the estimated memory in bytes held by the session, excluding the components shared
+        across sessions.
+        """
+        size = sizeof(self, depth=1)
+        if self._chatbot is not None:
+            size += sizeof(self._chatbot.kb_agent) + sizeof(self._chatbot.history_agent)
+        return size
+
+    def materialize(self, user: Optional[Dict[str, Any]]) -> ChatAgent:
+        """
+        Returns the chatbot of the session, building it on first use.
+
+        :param user: The registered user owning the session, only required if the chatbot has not been built yet.
+        :return: The ChatAgent instance.
+        """
+        if self._chatbot is None:
+            logger.debug(f"Materializing chatbot for session '{self.session_id}'")
+            kb_agent = KnowledgeBaseAgent(self.user_id, user)
+            history_agent = HistoryAgent(self.session_id)
+            self._chatbot = ChatAgent(kb_agent, history_agent)
+        return self._chatbot
 
 
 @inject
@@ -47,13 +99,20 @@ class SessionAgent:
     Agent for managing sessions.
     """
 
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, app_db: AppDB, registry: SessionRegistry, user_registry: UserRegistry):
         """
         Initializes the SessionAgent with the provided settings.
 
         :param settings: Application settings.
+        :param app_db: The app DB executing the queries off the event loop.
+        :param registry: The registry of the open sessions.
+        :param user_registry: The registry of the logged-in users.
         """
         self.settings = settings
+        self.app_db = app_db
+        self.registry = registry
+        self.user_registry = user_registry
+        self.registry.on_evict(lambda session_id, _: di[HistoryCache].evict(session_id))
 
     async def new_session(self, user_id: str, session_id: str, session_name: str) -> bool:
         """
@@ -64,12 +123,19 @@ class SessionAgent:
         :param session_name: The session name.
         :return: True if the session was created successfully, False otherwise.
         """
-        if SessionModel.select().where(SessionModel.session_id == session_id).exists():
-            logger.info(f"Session ID '{session_id}' already exists in session table")
+
+        def _create() -> bool:
+            if SessionModel.select().where(SessionModel.session_id == session_id).exists():
+                logger.info(f"Session ID '{session_id}' already exists in session table")
+                return False
+
+            logger.debug(f"Storing session info for '{session_id}' in session table")
+            SessionModel.create(session_id=session_id, session_name=session_name, user_id=user_id)
+            return True
+
+        if not await self.app_db.run(_create):
             return False
 
-        logger.debug(f"Storing session info for '{session_id}' in session table")
-        SessionModel.create(session_id=session_id, session_name=session_name, user_id=user_id)
         logger.info(f"Session ID '{session_id}' has been created successfully")
         return True
 
@@ -81,18 +147,26 @@ class SessionAgent:
         :param session_id: The session ID.
         :return: True if the session was opened successfully, False if it already exists, None if not found.
         """
-        if not SessionModel.select().where(
-                (SessionModel.session_id == session_id) & (SessionModel.user_id == user_id)).exists():
+        if not await self.check_session_id_ownership(session_id=session_id, user_id=user_id):
             logger.warning(f"Session ID '{session_id}' does not exist")
             return None
 
-        if session_id in di:
+        return self.register_session(user_id=user_id, session_id=session_id)
+
+    def register_session(self, user_id: str, session_id: str) -> bool:
+        """
+        Registers a session, whose ownership has already been verified, as open. The chatbot of the
+        session is only built once the session is used.
+
+        :param user_id: The user ID associated with the session.
+        :param session_id: The session ID.
+        :return: True if the session was opened successfully, False if it already exists.
+        """
+        if session_id in self.registry:
             logger.info(f"Session ID '{session_id}' already exists")
             return False
 
-        kb_agent = KnowledgeBaseAgent(user_id)
-        history_agent = HistoryAgent(session_id)
-        di[session_id] = ChatAgent(kb_agent, history_agent)
+        self.registry.put(session_id, SessionHandle(user_id=user_id, session_id=session_id))
         logger.info(f"Session ID '{session_id}' has been opened successfully")
         return True
 
@@ -104,69 +178,89 @@ class SessionAgent:
         :param new_session_name: The new session name.
         :return: True if the session was renamed successfully, False if not found, None if the name is the same.
         """
-        session = SessionModel.get_or_none(SessionModel.session_id == session_id)
-        if not session:
-            logger.warning(f"Session ID '{session_id}' has not been found")
-            return False
 
-        if session.session_name == new_session_name:
-            return None
+        def _rename() -> Optional[bool]:
+            session = SessionModel.get_or_none(SessionModel.session_id == session_id)
+            if not session:
+                return False
+
+            if session.session_name == new_session_name:
+                return None
+
+            session.session_name = new_session_name
+            session.last_modified_at = datetime.now()
+            session.save()
+            return True
+
+        is_renamed = await self.app_db.run(_rename)
+        if is_renamed is False:
+            logger.warning(f"Session ID '{session_id}' has not been found")
+        if not is_renamed:
+            return is_renamed
 
-        session.session_name = new_session_name
-        session.last_modified_at = datetime.now()
-        session.save()
         logger.info(f"Session ID '{session_id}' has been renamed")
         return True
 
     def invalidate_session(self, session_id: str) -> bool:
         """
-        Invalidates a session.
+        Invalidates a session, evicting its cached history regardless of whether it is still registered.
 
         :param session_id: The session ID.
-        :return: True if the session was invalidated successfully, False otherwise.
+        :return: True if the session was registered and has been invalidated, False otherwise.
         """
-        if session_id in di:
-            di._services.pop(session_id)
+        di[HistoryCache].evict(session_id)
+        if self.registry.pop(session_id) is not None:
             logger.info(f"Session ID '{session_id}' has been invalidated successfully")
             return True
 
-        logger.warning(f"Session ID '{session_id}' doesn't exist to be invalidated")
+        logger.debug(f"Session ID '{session_id}' is not registered to be invalidated")
         return False
 
     async def remove_session(self, session_id: str) -> bool:
         """
-        Removes a session.
+        Removes a session along with its history. The session is removed even if it has already been
+        evicted from the registry.
 
         :param session_id: The session ID.
-        :return: True if the session was removed successfully, False otherwise.
+        :return: True if the session was removed successfully, False if it does not exist.
         """
-        if not self.invalidate_session(session_id):
-            return False
-
+        self.invalidate_session(session_id)
         await HistoryAgent(session_id).remove_history()
 
         logger.debug(f"Removing session info for '{session_id}' from session table")
-        session = SessionModel.get_or_none(SessionModel.session_id == session_id)
-        if not session:
+        is_deleted = await self.app_db.run(
+            lambda: SessionModel.delete().where(SessionModel.session_id == session_id).execute() > 0)
+        if not is_deleted:
             logger.warning(f"Session ID '{session_id}' has not been found")
             return False
 
-        session.delete_instance()
         logger.info(f"Session ID '{session_id}' has been removed successfully")
         return True
 
-    def chatbot(self, session_id: str) -> Optional[ChatAgent]:
+    async def chatbot(self, session_id: str, user_id: str) -> ChatAgent:
         """
-        Retrieves the chatbot associated with a session.
+        Retrieves the chatbot associated with a session owned by the user. Sessions and users which
+        have been evicted from their registries are transparently registered again.
 
         :param session_id: The session ID.
-        :return: The ChatAgent instance if found, None otherwise.
+        :param user_id: The user ID owning the session.
+        :return: The ChatAgent instance.
         """
-        if session_id in di:
-            return di[session_id]
-
-        logger.warning(f"Session ID '{session_id}' has not been found")
-        return None
+        handle: Optional[SessionHandle] = self.registry.get(session_id)
+        if handle is None:
+            logger.info(f"Session ID '{session_id}' is not open, registering it again")
+            handle = SessionHandle(user_id=user_id, session_id=session_id)
+            self.registry.put(session_id, handle)
+
+        user = None
+        if not handle.is_materialized:
+            user = self.user_registry.get(user_id)
+            if user is None:
+                logger.info(f"User ID '{user_id}' is not loaded, loading it again")
+                user = (await self.app_db.run(load_user_info, user_id)).model_dump()
+                self.user_registry.put(user_id, user)
+
+        return handle.materialize(user)
 
     async def sessions(self, user_id: str) -> List[SessionInfo]:
         """
@@ -176,9 +270,13 @@ class SessionAgent:
         :return: A list of SessionInfo instances.
         """
         logger.debug(f"Listing sessions for user '{user_id}'")
-        sessions = SessionModel.select().where(SessionModel.user_id == user_id).order_by(
-            SessionModel.last_modified_at.desc())
-        return [SessionInfo(**model_to_dict(session)) for session in sessions]
+
+        def _sessions() -> List[SessionInfo]:
+            sessions = SessionModel.select().where(SessionModel.user_id == user_id).order_by(
+                SessionModel.last_modified_at.desc())
+            return [SessionInfo(**model_to_dict(session)) for session in sessions]
+
+        return await self.app_db.run(_sessions)
 
     async def purge_sessions(self, days: float):
         """
@@ -188,7 +286,8 @@ class SessionAgent:
         """
         logger.debug(f"Purging sessions older than {days} days")
         threshold_date = datetime.now() - timedelta(days=days)
-        sessions = SessionModel.select().where(SessionModel.created_at < threshold_date)
+        sessions = await self.app_db.run(
+            lambda: list(SessionModel.select().where(SessionModel.created_at < threshold_date)))
         for session in sessions:
             await self.remove_session(session.session_id)
 
@@ -200,4 +299,5 @@ class SessionAgent:
         :param user_id: The user ID.
         :return: True if the session ID is owned by the user, False otherwise.
         """
-        return any(session.session_id == session_id for session in await self.sessions(user_id))
+        return await self.app_db.run(lambda: SessionModel.select().where(
+            (SessionModel.session_id == session_id) & (SessionModel.user_id == user_id)).exists())
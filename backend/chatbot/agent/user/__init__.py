@@ -1,3 +1,3 @@
-from agent.user.service import SpacePermission
+from agent.user.info import SpacePermission
 
 SpacePermission._meta.database.create_tables([SpacePermission])
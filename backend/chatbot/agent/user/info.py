@@ -0,0 +1,48 @@
+import logging
+from kink import di
+from peewee import Model, CharField, AutoField
+from pydantic import BaseModel, Field
+from typing import Any, Dict
+
+from common.db import AppDB
+from config.app import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class SpacePermission(Model):
+    """
+    Peewee model representing space permissions.
+    """
+    id = AutoField()
+    user_id = CharField(null=False)
+    space_id = CharField(null=False)
+
+    class Meta:
+        table_name = di[Settings].db.app_db.permission_table_name
+        database = di[AppDB].database
+
+
+class LoggedInUserInfo(BaseModel):
+    """
+    Pydantic model representing logged-in user information.
+    """
+    user_id: str = Field(description="The user ID of the logged-in user")
+    filter: Dict[str, Any] = Field(description="The filter for vector DB")
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+def load_user_info(user_id: str) -> LoggedInUserInfo:
+    """
+    Loads the information of a user including the vector DB filter of the permitted spaces.
+
+    :param user_id: The user ID.
+    :return: A LoggedInUserInfo model.
+    """
+    logger.debug(f"Initializing filter for user '{user_id}'")
+    permissions = SpacePermission.select().where(SpacePermission.user_id == user_id)
+    space_ids = [permission.space_id for permission in permissions]
+    db_filter = {'space_key': {'$in': space_ids}} if space_ids else {}
+    return LoggedInUserInfo(user_id=user_id, filter=db_filter)
@@ -4,8 +4,8 @@ from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from kink import di
 from peewee import Model, AutoField, CharField, DateTimeField
 from peewee_extra_fields import SimplePasswordField
-from playhouse.db_url import connect
 
+from common.db import AppDB
 from config.app import Settings
 
 security = HTTPBasic()
@@ -22,7 +22,7 @@ class UserModel(Model):
 
     class Meta:
         table_name = di[Settings].db.app_db.user_table_name
-        database = connect(di[Settings].db.app_db.connection_string)
+        database = di[AppDB].database
 
 
 def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)) -> str:
@@ -0,0 +1,8 @@
+from .pool import AppDB, DatabaseConnectionMiddleware, PoolStats, QueryCounter
+
+__all__ = [
+    "AppDB",
+    "DatabaseConnectionMiddleware",
+    "PoolStats",
+    "QueryCounter"
+]
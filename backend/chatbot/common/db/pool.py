@@ -0,0 +1,374 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from kink import inject
+from peewee import Database, _ConnectionState
+from playhouse.db_url import parse
+from playhouse.pool import (MaxConnectionsExceeded, PooledDatabase, PooledMySQLDatabase, PooledPostgresqlDatabase,
+                            PooledSqliteDatabase)
+from pydantic import BaseModel, Field
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from threading import Condition, Lock
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+from urllib.parse import urlparse
+
+from config.app import AppDBConfiguration, Settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_connection_state: ContextVar[Optional[Dict[str, Any]]] = ContextVar("app_db_connection_state", default=None)
+_query_counter: ContextVar[Optional["QueryCounter"]] = ContextVar("app_db_query_counter", default=None)
+
+
+class ContextConnectionState(_ConnectionState):
+    """
+    Connection state of peewee kept per execution context instead of per thread, so that
+    concurrent requests served on the same event loop thread use separate connections.
+    """
+
+    @staticmethod
+    def new_state() -> Dict[str, Any]:
+        """
+        Creates the state of a closed connection.
+
+        :return: The connection state as a dictionary.
+        """
+        return {"closed": True, "conn": None, "ctx": [], "transactions": []}
+
+    @staticmethod
+    def _state() -> Dict[str, Any]:
+        """
+        Returns the connection state of the current context, initializing it if absent.
+
+        :return: The connection state as a dictionary.
+        """
+        state = _connection_state.get()
+        if state is None:
+            state = ContextConnectionState.new_state()
+            _connection_state.set(state)
+        return state
+
+    def __setattr__(self, name: str, value: Any):
+        self._state()[name] = value
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._state()[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class QueryCounter:
+    """
+    Counts the statements executed against the app DB within an execution context and all copies of it,
+    e.g. the database functions of a single request executed by AppDB.run.
+    """
+    WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reads = 0
+        self.writes = 0
+
+    def record(self, sql: str) -> None:
+        """
+        Records an executed statement, transaction control statements are not counted.
+
+        :param sql: The SQL statement.
+        """
+        statement = sql.lstrip().upper()
+        with self._lock:
+            if statement.startswith(("SELECT", "WITH")):
+                self.reads += 1
+            elif statement.startswith(self.WRITES):
+                self.writes += 1
+
+
+class PoolStats(BaseModel):
+    """
+    Model representing the statistics of the app DB connection pool.
+    """
+    max_connections: int = Field(description="The maximum number of connections")
+    in_use: int = Field(description="The number of connections currently checked out")
+    available: int = Field(description="The number of idle connections in the pool")
+    waits: int = Field(description="The number of connection requests which had to wait for a free connection")
+    wait_time: float = Field(description="The total time in seconds spent waiting for a free connection")
+
+
+class PoolStatsMixin:
+    """
+    Mixin for pooled peewee databases waiting for a free connection until one is returned to the
+    pool, instead of polling, and recording these waits.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._state = ContextConnectionState()
+        self._stats_lock = Lock()
+        self._released = Condition()
+        self._releases = 0
+        self._waits = 0
+        self._wait_time = 0.0
+
+    def connect(self, reuse_if_open: bool = False) -> bool:
+        """
+        Opens a connection from the pool, waiting up to the configured timeout for a free one.
+
+        :param reuse_if_open: Whether to reuse the connection of the current context if already open.
+        :return: True if a new connection has been opened, False if reused.
+        """
+        started = None
+        while True:
+            with self._released:
+                releases = self._releases
+            try:
+                opened = super(PooledDatabase, self).connect(reuse_if_open)
+            except MaxConnectionsExceeded:
+                now = time.monotonic()
+                started = started or now
+                remaining = (self._wait_timeout or 0) - (now - started)
+                if remaining <= 0:
+                    self._record_wait(started)
+                    raise
+                with self._released:
+                    # a connection returned since the attempt has already been signalled
+                    if self._releases == releases:
+                        self._released.wait(remaining)
+                continue
+            if started is not None:
+                self._record_wait(started)
+            return opened
+
+    def _close(self, conn: Any, close_conn: bool = False) -> None:
+        """
+        Returns a connection to the pool or closes it and wakes up a thread waiting for a free connection.
+
+        :param conn: The connection.
+        :param close_conn: Whether to close the connection instead of returning it to the pool.
+        """
+        super()._close(conn, close_conn)
+        with self._released:
+            self._releases += 1
+            self._released.notify()
+
+    def execute_sql(self, sql: str, params: Any = None, commit: Any = None):
+        """
+        Executes a statement and records it in the query counter of the current context, if any.
+
+        :param sql: The SQL statement.
+        :param params: The parameters of the statement.
+        :param commit: Deprecated commit flag of peewee.
+        :return: The cursor of the executed statement.
+        """
+        counter = _query_counter.get()
+        if counter is not None:
+            counter.record(sql)
+        return super().execute_sql(sql, params, commit)
+
+    def _record_wait(self, started: float) -> None:
+        """
+        Records a wait for a free connection.
+
+        :param started: The monotonic time the wait has started at.
+        """
+        with self._stats_lock:
+            self._waits += 1
+            self._wait_time += time.monotonic() - started
+
+    def stats(self) -> PoolStats:
+        """
+        Returns the statistics of the connection pool.
+
+        :return: A PoolStats instance.
+        """
+        with self._pool_lock:
+            in_use = len(self._in_use)
+            available = len(self._connections)
+        return PoolStats(
+            max_connections=self._max_connections,
+            in_use=in_use,
+            available=available,
+            waits=self._waits,
+            wait_time=self._wait_time
+        )
+
+
+class AppPostgresqlDatabase(PoolStatsMixin, PooledPostgresqlDatabase):
+    pass
+
+
+class AppMySQLDatabase(PoolStatsMixin, PooledMySQLDatabase):
+    pass
+
+
+class AppSqliteDatabase(PoolStatsMixin, PooledSqliteDatabase):
+    pass
+
+
+@inject
+class AppDB:
+    """
+    Provides the pooled app DB connection shared by all peewee models.
+    """
+    DATABASES = {
+        "postgres": AppPostgresqlDatabase,
+        "postgresql": AppPostgresqlDatabase,
+        "mysql": AppMySQLDatabase,
+        "sqlite": AppSqliteDatabase
+    }
+
+    def __init__(self, settings: Settings):
+        """
+        Initializes the AppDB with the provided settings.
+
+        :param settings: Application settings.
+        """
+        logger.info("Initializing app DB connection pool")
+        self._database = self._initialize_database(settings.db.app_db)
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.db.app_db.pool.executor_workers,
+            thread_name_prefix="app-db"
+        )
+
+    def _initialize_database(self, config: AppDBConfiguration) -> Database:
+        """
+        Initializes the pooled database from the SQLAlchemy formatted connection string.
+
+        :param config: The app DB configuration.
+        :return: The pooled database.
+        :raises ValueError: If the database scheme is not supported.
+        """
+        scheme = urlparse(config.connection_string).scheme.split("+")[0]
+        database_cls = self.DATABASES.get(scheme)
+        if not database_cls:
+            raise ValueError(f"Unsupported app DB scheme: {scheme}")
+
+        params = parse(config.connection_string)
+        if scheme == "sqlite":
+            params["check_same_thread"] = False
+        return database_cls(
+            max_connections=config.pool.max_connections,
+            stale_timeout=config.pool.stale_timeout,
+            timeout=config.pool.timeout,
+            **params
+        )
+
+    @property
+    def database(self) -> Database:
+        """
+        Returns the pooled database.
+
+        :return: The pooled peewee database.
+        """
+        return self._database
+
+    def stats(self) -> PoolStats:
+        """
+        Returns the statistics of the connection pool.
+
+        :return: A PoolStats instance.
+        """
+        return self._database.stats()
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Executes a blocking database function on the bounded app DB executor so that the event
+        loop is not blocked. The function runs in a copy of the current context with a connection
+        state of its own, so that it checks out a pooled connection only for its own duration and
+        returns it to the pool once done, regardless of how long the request or task calling it lives.
+
+        :param func: The function accessing the database.
+        :param args: The positional arguments of the function.
+        :param kwargs: The keyword arguments of the function.
+        :return: The result of the function.
+        """
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(context.run, self._run_scoped, func, *args, **kwargs))
+
+    def _run_scoped(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Executes a database function with a connection scoped to its execution.
+
+        :param func: The function accessing the database.
+        :param args: The positional arguments of the function.
+        :param kwargs: The keyword arguments of the function.
+        :return: The result of the function.
+        """
+        self.reset_state()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.release()
+
+    @staticmethod
+    @contextmanager
+    def counting(counter: QueryCounter) -> Iterator[QueryCounter]:
+        """
+        Counts the statements executed within the block, including the ones executed by AppDB.run.
+
+        :param counter: The counter to record the statements in.
+        :return: The counter.
+        """
+        token = _query_counter.set(counter)
+        try:
+            yield counter
+        finally:
+            _query_counter.reset(token)
+
+    def release(self) -> None:
+        """
+        Returns the connection of the current context to the pool if it is open.
+        """
+        if not self._database.is_closed():
+            self._database.close()
+
+    @staticmethod
+    def reset_state() -> None:
+        """
+        Starts a new connection state for the current context, shared by all copies of the context.
+        """
+        _connection_state.set(ContextConnectionState.new_state())
+
+
+class DatabaseConnectionMiddleware:
+    """
+    ASGI middleware isolating the connection state of every request. Database functions executed
+    by AppDB.run use connections of their own, so that only statements executed directly on the
+    event loop use the connection of the request. That connection is returned to the pool as soon
+    as the response starts, so that a streamed body does not hold a connection while it is generated,
+    and once more after the response in case it has been opened again while streaming.
+    """
+
+    def __init__(self, app: ASGIApp, app_db: AppDB):
+        """
+        Initializes the middleware.
+
+        :param app: The ASGI application.
+        :param app_db: The app DB.
+        """
+        self.app = app
+        self.app_db = app_db
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_releasing(message: Message):
+            if message["type"] == "http.response.start":
+                self.app_db.release()
+            await send(message)
+
+        self.app_db.reset_state()
+        try:
+            await self.app(scope, receive, send_releasing)
+        finally:
+            self.app_db.release()
@@ -0,0 +1,9 @@
+from .registry import Registry, RegistryStats, SessionRegistry, UserRegistry, sizeof
+
+__all__ = [
+    "Registry",
+    "RegistryStats",
+    "SessionRegistry",
+    "UserRegistry",
+    "sizeof"
+]
@@ -0,0 +1,262 @@
+import logging
+import sys
+import time
+from collections import OrderedDict
+from kink import inject
+from pydantic import BaseModel, Field
+from threading import RLock
+from typing import Any, Callable, List, Optional
+
+from config.app import Settings, RegistrySettings
+
+logger = logging.getLogger(__name__)
+
+
+def sizeof(obj: Any, depth: int = 4, seen: Optional[set] = None) -> int:
+    """
+    Estimates the memory footprint of an object by walking its containers and attributes.
+
+    :param obj: The object to measure.
+    :param depth: The maximum depth of nested objects to walk.
+    :param seen: The IDs of the objects which have already been measured.
+    :return: The estimated size in bytes.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj, 0)
+    if depth <= 0:
+        return size
+    if isinstance(obj, dict):
+        size += sum(sizeof(key, depth - 1, seen) + sizeof(value, depth - 1, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(sizeof(item, depth - 1, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += sizeof(vars(obj), depth - 1, seen)
+    return size
+
+
+class RegistryStats(BaseModel):
+    """
+    Model representing the statistics of a registry.
+    """
+    size: int = Field(description="The number of registered entries")
+    memory: int = Field(description="The estimated memory in bytes of all registered entries")
+    hits: int = Field(description="The number of lookups which found a registered entry")
+    misses: int = Field(description="The number of lookups which found no registered entry")
+    evictions: int = Field(description="The number of entries evicted for being idle or exceeding the bounds")
+
+
+class RegistryEntry:
+    """
+    A registered value along with its accounting information.
+    """
+
+    def __init__(self, value: Any):
+        """
+        Initializes the RegistryEntry with the given value.
+
+        :param value: The registered value.
+        """
+        self.value = value
+        self.accessed_at = time.monotonic()
+        self.memory = 0
+
+
+class Registry:
+    """
+    Thread-safe in-process registry bounded by the number of entries, their idle time and their
+    estimated memory. The least recently used entries are evicted first. Values providing a
+    `footprint` property are accounted with it, all others are measured by walking them.
+    """
+
+    def __init__(self, settings: RegistrySettings, name: str):
+        """
+        Initializes the Registry with the provided settings.
+
+        :param settings: Registry settings.
+        :param name: The name of the registry used for logging.
+        """
+        self.settings = settings
+        self.name = name
+        self._lock = RLock()
+        self._entries: OrderedDict[str, RegistryEntry] = OrderedDict()
+        self._memory = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._eviction_listeners: List[Callable[[str, Any], None]] = []
+
+    def on_evict(self, listener: Callable[[str, Any], None]) -> None:
+        """
+        Registers a listener called with the key and the value of every entry evicted for being idle or
+        exceeding the bounds, e.g. to release the resources held for the entry elsewhere.
+
+        :param listener: The listener.
+        """
+        self._eviction_listeners.append(listener)
+
+    def __contains__(self, key: str) -> bool:
+        """
+        Checks if a key is registered without touching its entry.
+
+        :param key: The key.
+        :return: True if the key is registered, False otherwise.
+        """
+        with self._lock:
+            self._expire()
+            return key in self._entries
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Retrieves a registered value and marks it as recently used.
+
+        :param key: The key.
+        :return: The registered value if found, None otherwise.
+        """
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            entry.accessed_at = time.monotonic()
+            self._entries.move_to_end(key)
+            self._measure(entry)
+            self._shrink()
+            return entry.value
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Registers a value, replacing any value registered with the same key.
+
+        :param key: The key.
+        :param value: The value.
+        """
+        with self._lock:
+            self.pop(key)
+            entry = RegistryEntry(value)
+            self._entries[key] = entry
+            self._measure(entry)
+            self._expire()
+            self._shrink()
+
+    def pop(self, key: str) -> Optional[Any]:
+        """
+        Removes a registered value.
+
+        :param key: The key.
+        :return: The removed value if found, None otherwise.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._memory -= entry.memory
+            return entry.value
+
+    def clear(self) -> None:
+        """
+        Removes all registered values.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
+
+    def stats(self) -> RegistryStats:
+        """
+        Returns the statistics of the registry.
+
+        :return: A RegistryStats model.
+        """
+        with self._lock:
+            return RegistryStats(
+                size=len(self._entries),
+                memory=self._memory,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions
+            )
+
+    def _measure(self, entry: RegistryEntry) -> None:
+        """
+        Updates the estimated memory of an entry, since registered values can grow after registration.
+
+        :param entry: The entry to measure.
+        """
+        memory = getattr(entry.value, "footprint", None)
+        if memory is None:
+            memory = sizeof(entry.value)
+        self._memory += memory - entry.memory
+        entry.memory = memory
+
+    def _expire(self) -> None:
+        """
+        Evicts the entries which have not been used within the idle TTL. Since the entries are kept
+        in the order of their use, only the least recent ones need to be checked.
+        """
+        threshold = time.monotonic() - self.settings.idle_ttl
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.accessed_at > threshold:
+                break
+            self._evict(key, "idle")
+
+    def _shrink(self) -> None:
+        """
+        Evicts the least recently used entries until the registry is within its bounds.
+        """
+        max_memory = self.settings.max_memory
+        while self._entries and (len(self._entries) > self.settings.max_entries or
+                                 (max_memory is not None and self._memory > max_memory)):
+            self._evict(next(iter(self._entries)), "bounds")
+
+    def _evict(self, key: str, reason: str) -> None:
+        """
+        Evicts an entry.
+
+        :param key: The key of the entry.
+        :param reason: The reason of the eviction used for logging.
+        """
+        value = self.pop(key)
+        self._evictions += 1
+        logger.debug(f"Evicted '{key}' from {self.name} registry ({reason})")
+        for listener in self._eviction_listeners:
+            try:
+                listener(key, value)
+            except Exception as e:
+                logger.warning(f"Failed to notify eviction of '{key}' from {self.name} registry: {e}")
+
+
+@inject
+class SessionRegistry(Registry):
+    """
+    Registry of the open sessions.
+    """
+
+    def __init__(self, settings: Settings):
+        """
+        Initializes the SessionRegistry with the provided settings.
+
+        :param settings: Application settings.
+        """
+        super().__init__(settings.server.sessions, "session")
+
+
+@inject
+class UserRegistry(Registry):
+    """
+    Registry of the logged-in users.
+    """
+
+    def __init__(self, settings: Settings):
+        """
+        Initializes the UserRegistry with the provided settings.
+
+        :param settings: Application settings.
+        """
+        super().__init__(settings.server.users, "user")
@@ -45,12 +45,200 @@ class KeycloakSettings(BaseModel):
     server_url: str = Field(description="The OpenID Auth server URL")
 
 
+class PostProcessingSettings(BaseModel):
+    """
+    Configuration for the post-processing of the retrieved documents.
+    """
+    stages: List[str] = Field(
+        default=[],
+        description=(
+            "The post-processing stages applied in order to the retrieved documents. "
+            "Available stages are llm_compression, embedding_filter and redundancy_filter."
+        )
+    )
+    similarity_threshold: float = Field(
+        default=0.76,
+        description="Minimum similarity to the query of the documents kept by the embedding filter"
+    )
+    redundancy_threshold: float = Field(
+        default=0.95,
+        description="Similarity above which documents are considered redundant by the redundancy filter"
+    )
+
+
+class ContextPackingSettings(BaseModel):
+    """
+    Configuration for the packing of the retrieved documents into the context of the answer prompt.
+    """
+    enabled: bool = Field(default=True, description="Flag to enable the context packing")
+    max_tokens: int = Field(
+        default=3000,
+        description="The estimated token budget of the context, the best ranked document is always kept"
+    )
+    duplicate_threshold: float = Field(
+        default=0.9,
+        description="Jaccard similarity of the word shingles above which documents are considered duplicates"
+    )
+    shingle_size: int = Field(default=3, description="The number of words of the shingles compared for duplicates")
+    merge_neighbours: bool = Field(default=True, description="Flag to merge the documents of the same source")
+    min_overlap: int = Field(
+        default=32,
+        description="Minimum number of characters shared by adjacent chunks of a source to be removed on merging"
+    )
+    max_overlap: int = Field(
+        default=1000,
+        description="Maximum number of characters at the end of a chunk searched for the overlap with the next one"
+    )
+    position_keys: List[str] = Field(
+        default=["start_index", "chunk", "offset", "page"],
+        description=(
+            "The metadata keys of the position of a chunk within its source, in order of preference. The chunks "
+            "of a source are merged in order of the first key present in all of them, else in order of rank."
+        )
+    )
+
+
+class HybridSearchSettings(BaseModel):
+    """
+    Configuration for the hybrid retrieval fusing the full-text search with the vector similarity search,
+    used by the retriever type hybrid.
+    """
+    fetch_k: int = Field(default=20, description="The number of documents fetched by each search before the fusion")
+    rrf_k: int = Field(default=60, description="The rank constant of the reciprocal-rank fusion")
+    vector_weight: float = Field(default=1.0, description="The weight of the vector similarity ranking in the fusion")
+    lexical_weight: float = Field(default=1.0, description="The weight of the full-text search ranking in the fusion")
+    text_search_config: str = Field(default="english", description="The Postgres text search configuration")
+    create_index: bool = Field(
+        default=False,
+        description=(
+            "Flag to create the GIN index of the full-text search concurrently on startup if it does not exist. "
+            "Otherwise, it is only created by the vector index migration."
+        )
+    )
+
+
+class RerankSettings(BaseModel):
+    """
+    Configuration for the in-process reranking of over-fetched candidates, used by the retriever type rerank.
+    """
+    fetch_k: int = Field(default=40, description="The number of candidates fetched along with their embeddings")
+    lambda_mult: float = Field(
+        default=0.5,
+        description="The trade-off of the maximal marginal relevance between relevance (1) and diversity (0)"
+    )
+    score_threshold: Optional[float] = Field(
+        default=None,
+        description="Minimum cosine similarity to the query of the candidates. If not set, no candidate is dropped."
+    )
+
+
+class SpeculationSettings(BaseModel):
+    """
+    Configuration for the speculative retrieval of the raw question during the question condensation.
+    """
+    enabled: bool = Field(default=True, description="Flag to enable the speculative retrieval")
+    similarity_threshold: float = Field(
+        default=0.9,
+        description="Minimum cosine similarity of the condensed to the raw question to use the speculative documents"
+    )
+
+
 class VectorDBRetrieverSettings(BaseModel):
     """
     Configuration for VectorDB retriever settings.
     """
-    type: str = Field(description="Type of retriever to use")
+    type: str = Field(
+        description="Type of retriever to use, either one of the vector store search types, hybrid or rerank"
+    )
     k: int = Field(description="The number of documents to return")
+    post_processing: PostProcessingSettings = Field(
+        default_factory=PostProcessingSettings,
+        description="Post-processing configuration of the retrieved documents"
+    )
+    hybrid: HybridSearchSettings = Field(
+        default_factory=HybridSearchSettings,
+        description="Hybrid retrieval configuration"
+    )
+    rerank: RerankSettings = Field(
+        default_factory=RerankSettings,
+        description="In-process reranking configuration"
+    )
+    packing: ContextPackingSettings = Field(
+        default_factory=ContextPackingSettings,
+        description="Packing configuration of the retrieved documents into the context of the answer prompt"
+    )
+    speculation: SpeculationSettings = Field(
+        default_factory=SpeculationSettings,
+        description="Speculative retrieval configuration"
+    )
+
+
+class RegistrySettings(BaseModel):
+    """
+    Configuration for a bounded in-process registry, e.g. of logged-in users, open sessions or cached results.
+    """
+    max_entries: int = Field(default=1000, description="Maximum number of entries before evicting the least recent")
+    idle_ttl: int = Field(default=3600, description="Number of seconds after which an unused entry is evicted")
+    max_memory: Optional[int] = Field(
+        default=None,
+        description=(
+            "Maximum estimated memory in bytes of all entries before evicting the least recent. "
+            "If not set, the memory of the entries is only accounted."
+        )
+    )
+
+
+class RetrievalCacheSettings(RegistrySettings):
+    """
+    Configuration for the cache of the documents retrieved for standalone questions.
+    """
+    enabled: bool = Field(default=True, description="Flag to enable the retrieval cache")
+
+
+class VectorIndexSettings(BaseModel):
+    """
+    Configuration for the approximate nearest neighbour index of the embeddings and its search parameters.
+    """
+    type: Optional[str] = Field(
+        default=None,
+        description="The index type, either hnsw or ivfflat. If not set, no index is managed."
+    )
+    create: bool = Field(
+        default=False,
+        description=(
+            "Flag to create the index concurrently on startup if it does not exist. Otherwise, it is only "
+            "created by the vector index migration."
+        )
+    )
+    dimensions: Optional[int] = Field(
+        default=None,
+        description=(
+            "The number of dimensions of the embeddings. Required to index an embedding column "
+            "which has been created without dimensions."
+        )
+    )
+    m: int = Field(default=16, description="The maximum number of connections per layer of the HNSW index")
+    ef_construction: int = Field(default=64, description="The size of the candidate list building the HNSW index")
+    lists: int = Field(default=100, description="The number of inverted lists of the IVFFlat index")
+    ef_search: int = Field(
+        default=40,
+        description="The default size of the candidate list searching the HNSW index, raised to the number of results"
+    )
+    probes: int = Field(default=10, description="The default number of inverted lists probed by an IVFFlat search")
+    filter_oversampling: int = Field(
+        default=4,
+        description=(
+            "The factor by which the HNSW candidate list or the probed IVFFlat lists are raised for queries with "
+            "a metadata filter, as the index is scanned before the filter is applied"
+        )
+    )
+    iterative_scan: Optional[str] = Field(
+        default=None,
+        description=(
+            "The iterative index scan of queries with a metadata filter, either strict_order or relaxed_order, "
+            "which keeps scanning the index until enough rows pass the filter. Requires pgvector 0.8 or later."
+        )
+    )
 
 
 class VectorDBSettings(BaseModel):
@@ -60,6 +248,36 @@ class VectorDBSettings(BaseModel):
     connection_string: str = Field(description="The connection string of the PGVector db (only SQLAlchemy format)")
     collection_name: str = Field(description="The PGVector collection name to store the embeddings")
     retriever: VectorDBRetrieverSettings = Field(description="Retriever configuration")
+    retrieval_cache: RetrievalCacheSettings = Field(
+        default_factory=lambda: RetrievalCacheSettings(max_entries=5000, idle_ttl=3600, max_memory=64 * 1024 * 1024),
+        description="Retrieval cache configuration"
+    )
+    index: VectorIndexSettings = Field(
+        default_factory=VectorIndexSettings,
+        description="Vector index configuration"
+    )
+    version_check_interval: int = Field(
+        default=300,
+        description=(
+            "Number of seconds after which the collection is checked for changes invalidating the caches. "
+            "Explicit invalidations only apply to the process serving them, the other processes detect "
+            "changed documents at their next check."
+        )
+    )
+
+
+class EmbeddingCacheSettings(BaseModel):
+    """
+    Configuration for the cache of query embeddings.
+    """
+    enabled: bool = Field(default=True, description="Flag to enable the query embedding cache")
+    max_entries: int = Field(default=10000, description="Maximum number of embeddings cached in memory")
+    ttl: int = Field(default=86400, description="Number of seconds after which a cached embedding expires")
+    disk_path: Optional[str] = Field(
+        default=None,
+        description="Path of the SQLite database caching the embeddings on disk. If not set, no disk tier is used."
+    )
+    disk_max_entries: int = Field(default=100000, description="Maximum number of embeddings cached on disk")
 
 
 class VertexEmbeddingSettings(BaseModel):
@@ -69,13 +287,21 @@ class VertexEmbeddingSettings(BaseModel):
     model: str = Field(description="The embedding model name")
     project_id: str = Field(description="Project ID of the embedding model")
     location: str = Field(description="The location")
+    cache: EmbeddingCacheSettings = Field(
+        default_factory=EmbeddingCacheSettings,
+        description="Query embedding cache configuration"
+    )
 
 
 class ChatMemorySettings(BaseModel):
     """
     Configuration for chat memory settings.
     """
-    max_token_limit: int = Field(description="Maximum token limit")
+    max_token_limit: int = Field(description="Maximum estimated number of tokens of the history sent to the model")
+    summarize: bool = Field(
+        default=True,
+        description="Flag to fold the messages exceeding the token limit into a rolling summary of the session"
+    )
 
 
 class VertexAIModelSettings(BaseModel):
@@ -100,6 +326,38 @@ class VertexAIModelSettings(BaseModel):
             "is selected from among the top-k most probable tokens"
         )
     )
+    pool_size: int = Field(
+        default=1,
+        description=(
+            "Number of clients shared by all sessions for every distinct model configuration. "
+            "Requests are distributed across the clients in a round-robin fashion."
+        )
+    )
+
+
+class HistoryCacheSettings(BaseModel):
+    """
+    Configuration for the in-process cache of the message history of open sessions.
+    """
+    enabled: bool = Field(default=True, description="Flag to enable the history cache")
+    max_sessions: int = Field(default=1000, description="Maximum number of sessions to keep the history cached for")
+    max_messages: int = Field(
+        default=50000,
+        description="Maximum number of messages to keep cached across all sessions before evicting the least recent"
+    )
+
+
+class AppDBPoolSettings(BaseModel):
+    """
+    Configuration for the app DB connection pool.
+    """
+    max_connections: int = Field(default=20, description="Maximum number of connections in the pool")
+    stale_timeout: int = Field(default=300, description="Number of seconds after which an idle connection is recycled")
+    timeout: int = Field(default=10, description="Number of seconds to wait for a free connection before failing")
+    executor_workers: int = Field(
+        default=16,
+        description="Number of worker threads executing app DB queries off the event loop"
+    )
 
 
 class AppDBConfiguration(BaseModel):
@@ -111,8 +369,22 @@ class AppDBConfiguration(BaseModel):
     user_table_name: str = Field(description="The database table name to store the user login information")
     session_table_name: str = Field(description="The database table name to store the session information")
     history_table_name: str = Field(description="The database table name to store the history of every session")
+    history_summary_table_name: str = Field(
+        default="chat_session_history_summary",
+        description="The database table name to store the rolling summary of the history of every session"
+    )
     user_pass_salt: str = Field(description="The salt to be used for hashing the input passwords")
     permission_table_name: str = Field(description="The database table name to store the permissions")
+    migration_table_name: str = Field(
+        default="schema_migration",
+        description="The database table name to store the applied schema migrations"
+    )
+    migrate_on_startup: bool = Field(default=True, description="Flag to apply pending schema migrations on startup")
+    pool: AppDBPoolSettings = Field(default_factory=AppDBPoolSettings, description="Connection pool configuration")
+    history_cache: HistoryCacheSettings = Field(
+        default_factory=HistoryCacheSettings,
+        description="History cache configuration"
+    )
 
 
 class DBSettings(BaseModel):
@@ -131,6 +403,70 @@ class ServerSettings(BaseModel):
     port: int = Field(default=8001, description="Port of FastAPI server, defaults to 8001")
     auth: KeycloakSettings = Field(description="Keycloak OAuth configuration")
     cors: CorsSettings = Field(default_factory=lambda: CorsSettings(enabled=False), description="CORS configuration")
+    sessions: RegistrySettings = Field(
+        default_factory=RegistrySettings,
+        description="Configuration of the registry of open sessions"
+    )
+    users: RegistrySettings = Field(
+        default_factory=lambda: RegistrySettings(max_entries=1000, idle_ttl=43200),
+        description="Configuration of the registry of logged-in users"
+    )
+    load_history_limit: Optional[int] = Field(
+        default=None,
+        description=(
+            "Number of latest QA pairs per session returned when loading the user data. "
+            "If not set, the complete history of every session is returned."
+        )
+    )
+
+
+class CredentialsRefreshSettings(BaseModel):
+    """
+    Configuration for the background refresh of the GCP credentials.
+    """
+    margin: int = Field(default=300, description="Number of seconds before the token expiry to refresh the credentials")
+    retry_delay: int = Field(default=30, description="Number of seconds to wait before retrying a failed refresh")
+
+
+class AnswerCacheSettings(BaseModel):
+    """
+    Configuration for the semantic cache of the answers.
+    """
+    enabled: bool = Field(default=False, description="Flag to enable the answer cache")
+    similarity_threshold: float = Field(
+        default=0.95,
+        description="Minimum cosine similarity of a standalone question to a cached one to reuse its answer"
+    )
+    ttl: int = Field(default=86400, description="Number of seconds after which a cached answer expires")
+    max_entries: int = Field(default=5000, description="Maximum number of cached answers across all filters")
+
+
+class CondenseSettings(BaseModel):
+    """
+    Configuration for the condensation of follow-up questions into standalone questions.
+    """
+    skip_self_contained: bool = Field(
+        default=True,
+        description="Flag to skip the condensation of follow-up questions which are considered self-contained"
+    )
+    min_words: int = Field(
+        default=4,
+        description="Minimum number of words of a follow-up question to be considered self-contained"
+    )
+    reference_words: List[str] = Field(
+        default=[
+            "it", "its", "they", "them", "their", "this", "that", "these", "those", "he", "she", "his", "her",
+            "there", "above", "previous", "same", "also", "else", "again", "former", "latter", "more",
+            "es", "sie", "ihr", "ihre", "dies", "diese", "dieser", "dieses", "das", "dort", "davon", "dazu",
+            "darüber", "damit", "dafür", "oben", "vorher", "gleiche", "auch", "noch", "mehr"
+        ],
+        description="Words referring to the preceding conversation which require a follow-up question to be condensed"
+    )
+    history_tail: int = Field(
+        default=4,
+        description="Number of latest messages of the chat history the cached condensations are keyed by"
+    )
+    cache_max_entries: int = Field(default=5000, description="Maximum number of cached condensations")
 
 
 class VertexSettings(BaseModel):
@@ -140,7 +476,19 @@ class VertexSettings(BaseModel):
     service_account_path: str = Field(description="GCP service account JSON file path")
     embedding: VertexEmbeddingSettings = Field(description="Vertex embedding configuration")
     chat_memory: ChatMemorySettings = Field(description="Chat memory configuration")
+    answer_cache: AnswerCacheSettings = Field(
+        default_factory=AnswerCacheSettings,
+        description="Answer cache configuration"
+    )
+    condense: CondenseSettings = Field(
+        default_factory=CondenseSettings,
+        description="Question condensation configuration"
+    )
     model: VertexAIModelSettings = Field(description="Vertex AI model configuration")
+    credentials_refresh: CredentialsRefreshSettings = Field(
+        default_factory=CredentialsRefreshSettings,
+        description="Background refresh configuration of the service account credentials"
+    )
 
 
 class GcpSettings(BaseModel):
@@ -1,16 +1,21 @@
+import logging
 from http import HTTPStatus
 
 from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from kink import di
+from langchain_core.messages import AIMessage, HumanMessage
 from pydantic import BaseModel, Field
 from typing import Annotated, Set
 
+from agent.chat.cache import AnswerCache
 from agent.session.service import SessionAgent
 from common.auth.basic.auth import verify_credentials
 from common.rate_limit import rate_limiter
 from endpoint import UUID4_PATTERN
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -43,7 +48,8 @@ async def ask(
         session_id: str = Annotated[
             str, Query(title="The session ID", min_length=36, max_length=36, pattern=UUID4_PATTERN)],
         user_id: str = Depends(verify_credentials),
-        session_agent: SessionAgent = Depends(lambda: di[SessionAgent])
+        session_agent: SessionAgent = Depends(lambda: di[SessionAgent]),
+        answer_cache: AnswerCache = Depends(lambda: di[AnswerCache])
 ):
     """
     Endpoint to ask a question to the foundation model.
@@ -53,6 +59,7 @@ async def ask(
     :param session_id: The session ID.
     :param user_id: The user ID.
     :param session_agent: The session agent instance.
+    :param answer_cache: The semantic answer cache.
     :return: A StreamingResponse with the answer and sources.
     """
     is_owned = await session_agent.check_session_id_ownership(session_id=session_id, user_id=user_id)
@@ -62,23 +69,31 @@ async def ask(
             status_code=HTTPStatus.FORBIDDEN
         )
 
-    chatbot = session_agent.chatbot(session_id)
-    if not chatbot:
-        return JSONResponse(
-            content=f"No session associated with {session_id}",
-            status_code=HTTPStatus.NOT_FOUND
-        )
+    chatbot = await session_agent.chatbot(session_id, user_id)
 
     history_agent = chatbot.history_agent
-    inputs = {
-        "input": question,
-        "chat_history": history_agent.retrieve_history_unwrapped()
-    }
+    snapshot = await history_agent.snapshot()
+    inputs = {"input": question}
+    db_filter = chatbot.kb_agent.search_kwargs["filter"]
 
-    def stream_message():
-        history = history_agent.retrieve_history()
+    cached = None
+    if answer_cache.enabled:
+        inputs["standalone"] = await chatbot.condense(question, snapshot.messages)
+        cached = await answer_cache.lookup(inputs["standalone"], db_filter)
+
+    async def stream_message():
+        history = snapshot.messages
         ai_message_id = int(history[-1].id) + 2 if history else 2
-        for chunk in chatbot.chain.stream(input=inputs, config={"configurable": {"session_id": session_id}}):
+        if cached:
+            logger.debug(f"Answering '{session_id}' from the answer cache with similarity {cached.similarity:.3f}")
+            history_agent.message_history.sources = cached.sources
+            yield f"data: {SourcesResponse(docs=cached.sources).model_dump_json()}\n\n"
+            yield f"data: {CompletionResponse(id=ai_message_id, response=cached.answer).model_dump_json()}\n\n"
+            await snapshot.aadd_messages([HumanMessage(content=question), AIMessage(content=cached.answer)])
+            return
+
+        answer = []
+        async for chunk in chatbot.chain.astream(input=inputs, config=chatbot.config(snapshot)):
             if "context" in chunk:
                 sources = chunk["context"]
                 src = {source.metadata['source'] for source in sources}
@@ -86,7 +101,13 @@ async def ask(
                 docs = SourcesResponse(docs=history_agent.message_history.sources)
                 yield f"data: {docs.model_dump_json()}\n\n"
             elif "answer" in chunk:
+                answer.append(chunk["answer"])
                 completion = CompletionResponse(id=ai_message_id, response=chunk["answer"])
                 yield f"data: {completion.model_dump_json()}\n\n"
+        if answer_cache.enabled and answer:
+            await answer_cache.store(inputs["standalone"], db_filter, "".join(answer),
+                                     history_agent.message_history.sources)
+        logger.debug(f"History of '{session_id}' accessed with {snapshot.reads} read(s) "
+                     f"and {snapshot.writes} write(s)")
 
     return StreamingResponse(stream_message(), media_type="text/event-stream")
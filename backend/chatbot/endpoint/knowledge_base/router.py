@@ -0,0 +1,36 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends, Request
+from kink import di
+from starlette.responses import JSONResponse
+
+from agent.knowledge_base.version import KnowledgeBaseVersion
+from common.rate_limit import rate_limiter
+
+router = APIRouter()
+
+
+@router.put(
+    path="/knowledge-base/invalidate",
+    name="Knowledge Base Invalidation Endpoint",
+    description=(
+        "The endpoint to invalidate all caches derived from the knowledge base of the serving process, "
+        "e.g. after an ingestion. Other processes detect the changed documents at their next version check."
+    ),
+    summary="Knowledge Base Invalidation",
+    tags=["knowledge-base"]
+)
+@rate_limiter(limit=5, seconds=60)
+async def invalidate(
+        request: Request = None,
+        kb_version: KnowledgeBaseVersion = Depends(lambda: di[KnowledgeBaseVersion])
+) -> JSONResponse:
+    """
+    Endpoint to invalidate all caches derived from the knowledge base.
+
+    :param request: The HTTP request object.
+    :param kb_version: The version of the knowledge base.
+    :return: A JSONResponse indicating the result of the invalidation.
+    """
+    kb_version.invalidate()
+    return JSONResponse(content="Knowledge base caches have been invalidated", status_code=HTTPStatus.OK)
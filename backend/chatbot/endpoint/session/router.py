@@ -197,7 +197,7 @@ async def create_session(
     """
     is_created = await session_agent.new_session(user_id, session_id, create_request.session_name)
     if is_created:
-        await session_agent.open_session(user_id, session_id)
+        session_agent.register_session(user_id, session_id)
         return JSONResponse(content=f"Session {session_id} has been successfully created",
                             status_code=HTTPStatus.CREATED)
     return JSONResponse(content=f"Session {session_id} already exists", status_code=HTTPStatus.BAD_REQUEST)
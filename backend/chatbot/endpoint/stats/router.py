@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, Request
+from kink import di
+from pydantic import BaseModel, Field
+from typing import List
+
+from agent.chat.cache import AnswerCache, AnswerCacheStats
+from agent.chat.condense import CondenseStats, QuestionCondenser
+from agent.chat.speculation import SpeculationStats, SpeculativeRetrieval
+from agent.knowledge_base.cache import RetrievalCache
+from agent.knowledge_base.embedding import EmbeddingCache, EmbeddingCacheStats
+from agent.knowledge_base.packing import ContextPacker, PackingStats
+from agent.knowledge_base.pipeline import PostProcessingPipeline, StageStats
+from common.db import AppDB, PoolStats
+from common.rate_limit import rate_limiter
+from common.registry import RegistryStats, SessionRegistry, UserRegistry
+
+router = APIRouter()
+
+
+class StatsResponse(BaseModel):
+    """
+    Response model for the runtime statistics of the application.
+    """
+    app_db: PoolStats = Field(description="The statistics of the app DB connection pool")
+    sessions: RegistryStats = Field(description="The statistics of the registry of open sessions")
+    users: RegistryStats = Field(description="The statistics of the registry of logged-in users")
+    post_processing: List[StageStats] = Field(description="The statistics of the retrieval post-processing stages")
+    embedding_cache: EmbeddingCacheStats = Field(description="The statistics of the query embedding cache")
+    answer_cache: AnswerCacheStats = Field(description="The statistics of the semantic answer cache")
+    retrieval_cache: RegistryStats = Field(description="The statistics of the retrieval cache")
+    condense: CondenseStats = Field(description="The statistics of the question condensation")
+    speculation: SpeculationStats = Field(description="The statistics of the speculative retrieval")
+    context_packing: PackingStats = Field(description="The statistics of the context packing")
+
+
+@router.get(
+    path="/stats",
+    name="Statistics Endpoint",
+    description="The endpoint to retrieve the runtime statistics of the application",
+    summary="Runtime Statistics",
+    tags=["stats"]
+)
+@rate_limiter(limit=15, seconds=60)
+async def retrieve_stats(
+        request: Request = None,
+        app_db: AppDB = Depends(lambda: di[AppDB]),
+        session_registry: SessionRegistry = Depends(lambda: di[SessionRegistry]),
+        user_registry: UserRegistry = Depends(lambda: di[UserRegistry]),
+        post_processing: PostProcessingPipeline = Depends(lambda: di[PostProcessingPipeline]),
+        embedding_cache: EmbeddingCache = Depends(lambda: di[EmbeddingCache]),
+        answer_cache: AnswerCache = Depends(lambda: di[AnswerCache]),
+        retrieval_cache: RetrievalCache = Depends(lambda: di[RetrievalCache]),
+        condenser: QuestionCondenser = Depends(lambda: di[QuestionCondenser]),
+        speculation: SpeculativeRetrieval = Depends(lambda: di[SpeculativeRetrieval]),
+        packer: ContextPacker = Depends(lambda: di[ContextPacker])
+) -> StatsResponse:
+    """
+    Endpoint to retrieve the runtime statistics of the application.
+
+    :param request: The HTTP request object.
+    :param app_db: The app DB instance.
+    :param session_registry: The registry of open sessions.
+    :param user_registry: The registry of logged-in users.
+    :param post_processing: The retrieval post-processing pipeline.
+    :param embedding_cache: The query embedding cache.
+    :param answer_cache: The semantic answer cache.
+    :param retrieval_cache: The retrieval cache.
+    :param condenser: The question condenser.
+    :param speculation: The speculative retrieval.
+    :param packer: The context packer.
+    :return: A StatsResponse containing the statistics.
+    """
+    return StatsResponse(
+        app_db=app_db.stats(),
+        sessions=session_registry.stats(),
+        users=user_registry.stats(),
+        post_processing=post_processing.stats(),
+        embedding_cache=embedding_cache.stats(),
+        answer_cache=answer_cache.stats(),
+        retrieval_cache=retrieval_cache.stats(),
+        condense=condenser.stats(),
+        speculation=speculation.stats(),
+        context_packing=packer.stats()
+    )
@@ -1,8 +1,9 @@
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import JSONResponse
 from kink import di
+from typing import Annotated, Optional
 
 from agent.user.service import UserAgent, LoadingResponse
 from common.auth.basic.auth import verify_credentials
@@ -65,12 +66,7 @@ async def logout(
     :param user_agent: The user agent instance.
     :return: A JSONResponse indicating the result of the logout operation.
     """
-    is_logged_out = await user_agent.logout(user_id)
-    if not is_logged_out:
-        return JSONResponse(
-            content=f"User session of {user_id} cannot be logged out as it doesn't exist",
-            status_code=HTTPStatus.BAD_REQUEST
-        )
+    await user_agent.logout(user_id)
     return JSONResponse(
         content=f"User session of {user_id} has successfully been logged out",
         status_code=HTTPStatus.OK
@@ -87,6 +83,8 @@ async def logout(
 @rate_limiter(limit=20, seconds=60)
 async def load(
         request: Request,
+        history_limit: Annotated[Optional[int], Query(
+            title="The number of latest QA pairs to return per session", ge=1)] = None,
         user_id: str = Depends(verify_credentials),
         user_agent: UserAgent = Depends(lambda: di[UserAgent])
 ):
@@ -94,11 +92,12 @@ async def load(
     Endpoint to load existing chat sessions or create a new one.
 
     :param request: The HTTP request object.
+    :param history_limit: The number of latest QA pairs to return per session.
     :param user_id: The user ID.
     :param user_agent: The user agent instance.
     :return: A JSONResponse containing the loading response.
     """
-    load_response: LoadingResponse = await user_agent.load(user_id)
+    load_response: LoadingResponse = await user_agent.load(user_id, history_limit)
     if not load_response:
         return JSONResponse(
             content=f"User {user_id} has already been logged in elsewhere",
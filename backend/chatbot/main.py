@@ -2,6 +2,7 @@ import logging
 import os
 import sentry_sdk
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_cloud_logging import RequestLoggingMiddleware
@@ -9,6 +10,7 @@ from kink import di
 from opentelemetry.sdk.trace.export import ConsoleSpanExporter
 from sentry_sdk.integrations.opentelemetry import SentrySpanProcessor, SentryPropagator
 from traceloop.sdk import Traceloop, Instruments
+from typing import AsyncIterator
 
 from config.app import Settings
 from config.loader import ConfigLoader
@@ -46,6 +48,46 @@ def initialize_logging(settings: Settings):
     di[TellyLogging] = app_logging
 
 
+def migrate_app_db(settings: Settings):
+    """
+    Apply the pending app DB migrations if enabled.
+
+    :param settings: The application settings.
+    """
+    if not settings.db.app_db.migrate_on_startup:
+        logger.info("🚀 App DB migration on startup is disabled")
+        return
+
+    from agent.migration.service import MigrationAgent
+    from common.db import AppDB
+    di[MigrationAgent].migrate()
+    di[AppDB].database.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Release the resources of the application on shutdown.
+
+    :param app: The FastAPI application.
+    """
+    yield
+
+    from agent.auth.service import GCPAuth
+    logger.info("🚀 Stopping the GCP credentials refresh")
+    di[GCPAuth].close()
+
+
+def migrate_vector_db(settings: Settings):
+    """
+    Verify the indexes of the vector DB and create the missing ones if enabled.
+
+    :param settings: The application settings.
+    """
+    from agent.knowledge_base.index import VectorIndexManager
+    di[VectorIndexManager].ensure()
+
+
 def load_fastapi_routes(settings: Settings) -> FastAPI:
     """
     Load and configure FastAPI routes and middleware.
@@ -58,11 +100,15 @@ def load_fastapi_routes(settings: Settings) -> FastAPI:
     from endpoint.session.router import router as session_router
     from endpoint.feedback.router import router as feedback_router
     from endpoint.healthcheck.router import router as healthcheck_router
+    from endpoint.stats.router import router as stats_router
+    from endpoint.knowledge_base.router import router as knowledge_base_router
+    from common.db import AppDB, DatabaseConnectionMiddleware
 
     app = FastAPI(
         title="Telly",
         description="Telly Confluence Chatbot",
-        summary="Telly Chatbot Application"
+        summary="Telly Chatbot Application",
+        lifespan=lifespan
     )
 
     if settings.server.cors.enabled:
@@ -78,12 +124,17 @@ def load_fastapi_routes(settings: Settings) -> FastAPI:
     logger.info("Adding FastAPI Logging Middleware")
     app.add_middleware(RequestLoggingMiddleware)
 
+    logger.info("Adding App DB Connection Middleware")
+    app.add_middleware(DatabaseConnectionMiddleware, app_db=di[AppDB])
+
     logger.info("Adding FastAPI routes")
     app.include_router(user_router)
     app.include_router(chatbot_router)
     app.include_router(session_router)
     app.include_router(feedback_router)
     app.include_router(healthcheck_router)
+    app.include_router(stats_router)
+    app.include_router(knowledge_base_router)
 
     return app
 
@@ -137,6 +188,12 @@ def start_application():
     initialize_logging(settings)
     configure_telemetry(settings)
 
+    logger.info("🚀 Migrating App DB")
+    migrate_app_db(settings)
+
+    logger.info("🚀 Verifying Vector DB indexes")
+    migrate_vector_db(settings)
+
     logger.info("🚀 Configuring FastAPI Routes")
     app = load_fastapi_routes(settings)
 
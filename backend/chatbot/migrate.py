@@ -0,0 +1,65 @@
+import argparse
+import logging
+from kink import di
+
+from main import load_settings
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_schema():
+    """
+    Apply all pending versioned migrations of the app DB.
+    """
+    from agent.migration.service import MigrationAgent
+
+    applied = di[MigrationAgent].migrate()
+    logger.info(f"🚀 Schema migration completed with {applied} applied migrations")
+
+
+def migrate_history(batch_size: int):
+    """
+    Backfill the columnar schema of the history table.
+
+    :param batch_size: The number of sessions to rewrite within a single transaction.
+    """
+    from agent.history.migration import HistoryMigration
+
+    migrated = HistoryMigration(batch_size=batch_size).backfill()
+    logger.info(f"🚀 History migration completed with {migrated} migrated rows")
+
+
+def migrate_vector_indexes():
+    """
+    Create the missing indexes of the vector DB concurrently.
+    """
+    from agent.knowledge_base.index import VectorIndexManager
+
+    di[VectorIndexManager].ensure(create=True)
+    logger.info("🚀 Vector DB index migration completed")
+
+
+def start_migration():
+    """
+    Run the app DB migrations with the configured settings.
+    """
+    parser = argparse.ArgumentParser(description="Telly app DB migrations")
+    parser.add_argument("--backfill-history", action="store_true",
+                        help="Backfill the columnar schema of the history table after migrating")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Number of sessions to rewrite within a single transaction")
+    parser.add_argument("--vector-indexes", action="store_true",
+                        help="Create the missing indexes of the vector DB concurrently after migrating")
+    args = parser.parse_args()
+
+    settings = load_settings()
+    logging.basicConfig(level=logging._nameToLevel[settings.log_level.upper()])
+    migrate_schema()
+    if args.backfill_history:
+        migrate_history(args.batch_size)
+    if args.vector_indexes:
+        migrate_vector_indexes()
+
+
+if __name__ == '__main__':
+    start_migration()
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+from kink import di
+
+from common.db import AppDB, DatabaseConnectionMiddleware
+from config.app import Settings
+
+
+def test_run_returns_its_connection_while_the_caller_is_still_running():
+    app_db = di[AppDB]
+    baseline = app_db.stats().in_use
+    streams = app_db.stats().max_connections + 5
+    in_use_while_streaming = []
+
+    async def main():
+        barrier = asyncio.Barrier(streams)
+
+        async def stream():
+            app_db.reset_state()
+            assert await app_db.run(lambda: app_db.database.execute_sql("SELECT 1").fetchone()) == (1,)
+            if await barrier.wait() == 0:
+                in_use_while_streaming.append(app_db.stats().in_use)
+            await barrier.wait()
+
+        await asyncio.gather(*(stream() for _ in range(streams)))
+
+    asyncio.run(main())
+
+    assert in_use_while_streaming == [baseline]
+    assert app_db.stats().waits == 0
+
+
+def test_middleware_releases_the_connection_before_streaming_the_body():
+    app_db = di[AppDB]
+    baseline = app_db.stats().in_use
+    in_use_while_streaming = []
+
+    async def app(scope, receive, send):
+        app_db.database.execute_sql("SELECT 1")
+        assert app_db.stats().in_use == baseline + 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        in_use_while_streaming.append(app_db.stats().in_use)
+        await send({"type": "http.response.body", "body": b"data", "more_body": False})
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    middleware = DatabaseConnectionMiddleware(app, app_db)
+    asyncio.run(middleware({"type": "http"}, receive, send))
+
+    assert in_use_while_streaming == [baseline]
+    assert app_db.stats().in_use == baseline
+
+
+def test_slow_query_does_not_delay_concurrent_queries():
+    app_db = di[AppDB]
+
+    def slow_query():
+        app_db.database.execute_sql("SELECT 1")
+        time.sleep(0.5)
+
+    async def fast_query() -> float:
+        start = time.perf_counter()
+        await app_db.run(lambda: app_db.database.execute_sql("SELECT 1").fetchone())
+        return time.perf_counter() - start
+
+    async def main():
+        slow = asyncio.ensure_future(app_db.run(slow_query))
+        await asyncio.sleep(0.05)
+        latencies = await asyncio.gather(*(fast_query() for _ in range(10)))
+        assert not slow.done()
+        await slow
+        return latencies
+
+    assert max(asyncio.run(main())) < 0.2
+
+
+def test_exhausted_pool_hands_over_a_returned_connection_without_polling(tmp_path):
+    settings = di[Settings].model_copy(deep=True)
+    settings.db.app_db.connection_string = f"sqlite:///{tmp_path / 'pool.db'}"
+    settings.db.app_db.pool.max_connections = 1
+    database = AppDB(settings).database
+    released_at = []
+
+    def hold():
+        database.connect()
+        time.sleep(0.21)
+        released_at.append(time.monotonic())
+        database.close()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.05)
+    database.connect()
+    acquired_at = time.monotonic()
+    database.close()
+    holder.join()
+
+    assert acquired_at - released_at[0] < 0.02
+    assert database.stats().waits == 1
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+import threading
+import time
+from copy import deepcopy
+from kink import di
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from types import SimpleNamespace
+
+from agent.chat.condense import QuestionCondenser
+from agent.chat.service import ChatChain
+from agent.knowledge_base.service import VectorDB
+from agent.llm.service import ChatVertexLLM
+from config.app import Settings
+
+TOKENS = ["a", "b", "c", "d", "e"]
+TOKEN_DELAY = 0.05
+
+threads = set()
+
+
+class StreamingChatModel(BaseChatModel):
+    @property
+    def _llm_type(self) -> str:
+        return "streaming"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise AssertionError("the chat model is only consumed through its async API")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = [chunk.message.content async for chunk in self._astream(messages)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(chunks)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for token in TOKENS:
+            threads.add(threading.get_ident())
+            await asyncio.sleep(TOKEN_DELAY)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class FakeSearch:
+    async def asearch(self, question, k, db_filter=None, search_params=None):
+        return [Document(page_content="content", metadata={"source": "source"})]
+
+
+@pytest.fixture
+def chain(monkeypatch) -> ChatChain:
+    settings = deepcopy(di[Settings])
+    settings.db.vector_db.retriever.type = "similarity"
+    model = StreamingChatModel()
+    threads.clear()
+    monkeypatch.delitem(di._memoized_services, VectorDB, raising=False)
+    monkeypatch.setitem(di._services, VectorDB, FakeSearch())
+    monkeypatch.setitem(di._factories, ChatVertexLLM, lambda _: SimpleNamespace(model=model))
+    return ChatChain(
+        settings=settings,
+        vector_db=FakeSearch(),
+        post_processing=SimpleNamespace(stages=[]),
+        retrieval_cache=SimpleNamespace(enabled=False),
+        condenser=QuestionCondenser(settings),
+        speculation=SimpleNamespace(enabled=False),
+        packer=SimpleNamespace(enabled=False)
+    )
+
+
+async def ask(chain: ChatChain, session_id: str) -> str:
+    config = {
+        "configurable": {
+            "session_id": session_id,
+            "message_history": InMemoryChatMessageHistory(),
+            "search_kwargs": {"k": 5, "filter": {}}
+        }
+    }
+    answer = []
+    async for chunk in chain.runnable.astream({"input": "question"}, config):
+        if "answer" in chunk:
+            answer.append(chunk["answer"])
+    return "".join(answer)
+
+
+@pytest.mark.parametrize("concurrency", [1, 10, 50])
+def test_concurrent_streams_interleave_on_the_event_loop(chain, concurrency, record_property):
+    async def main():
+        start = time.perf_counter()
+        answers = await asyncio.gather(*(ask(chain, str(i)) for i in range(concurrency)))
+        return answers, time.perf_counter() - start
+
+    answers, elapsed = asyncio.run(main())
+
+    record_property("elapsed_ms", elapsed * 1000)
+    print(f"\n{concurrency} concurrent streams: {elapsed * 1000:.1f} ms")
+    assert answers == ["".join(TOKENS)] * concurrency
+    assert threads == {threading.get_ident()}
+    # serially the streams would take at least concurrency times the latency of the model
+    assert concurrency == 1 or elapsed < concurrency * len(TOKENS) * TOKEN_DELAY / 2
@@ -0,0 +1,99 @@
+import asyncio
+import statistics
+import time
+from copy import deepcopy
+from kink import di
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from types import SimpleNamespace
+
+from agent.chat.condense import QuestionCondenser
+from agent.chat.service import ChatAgent, ChatChain
+from agent.knowledge_base.service import VectorDB
+from agent.llm.service import ChatVertexLLM
+from config.app import Settings
+
+
+class AnsweringChatModel(BaseChatModel):
+    @property
+    def _llm_type(self) -> str:
+        return "answering"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="answer"))])
+
+
+class FakeSearch:
+    def __init__(self):
+        self.filters = []
+
+    async def asearch(self, question, k, db_filter=None, search_params=None):
+        self.filters.append(db_filter)
+        return [Document(page_content="content", metadata={"source": "source"})]
+
+
+def chat_chain(monkeypatch) -> ChatChain:
+    settings = deepcopy(di[Settings])
+    settings.db.vector_db.retriever.type = "similarity"
+    search = FakeSearch()
+    monkeypatch.delitem(di._memoized_services, VectorDB, raising=False)
+    monkeypatch.setitem(di._services, VectorDB, search)
+    monkeypatch.setitem(di._factories, ChatVertexLLM, lambda _: SimpleNamespace(model=AnsweringChatModel()))
+    return ChatChain(
+        settings=settings,
+        vector_db=search,
+        post_processing=SimpleNamespace(stages=[]),
+        retrieval_cache=SimpleNamespace(enabled=False),
+        condenser=QuestionCondenser(settings),
+        speculation=SimpleNamespace(enabled=False),
+        packer=SimpleNamespace(enabled=False)
+    )
+
+
+def chat_agent(chain: ChatChain, session_id: str, db_filter: dict) -> ChatAgent:
+    agent = ChatAgent.__new__(ChatAgent)
+    agent.chat_chain = chain
+    agent.kb_agent = SimpleNamespace(search_kwargs={"k": 5, "filter": db_filter})
+    agent.history_agent = SimpleNamespace(session_id=session_id, message_history=InMemoryChatMessageHistory())
+    return agent
+
+
+def test_sessions_share_the_chain_and_bind_their_history_and_filter_at_runtime(monkeypatch):
+    chain = chat_chain(monkeypatch)
+    first = chat_agent(chain, "first", {"space": "A"})
+    second = chat_agent(chain, "second", {"space": "B"})
+
+    async def main():
+        return [await agent.chain.ainvoke({"input": "question"}, agent.config()) for agent in (first, second)]
+
+    results = asyncio.run(main())
+
+    assert first.chain is second.chain is chain.runnable
+    assert [result["answer"] for result in results] == ["answer", "answer"]
+    assert chain.vector_db.filters == [{"space": "A"}, {"space": "B"}]
+    assert [message.content for message in first.history_agent.message_history.messages] == ["question", "answer"]
+    assert [message.content for message in second.history_agent.message_history.messages] == ["question", "answer"]
+
+
+def test_chain_build_benchmark(monkeypatch, record_property):
+    chain = chat_chain(monkeypatch)
+    agent = chat_agent(chain, "session", {"space": "A"})
+
+    def measure(build, runs=50):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            build()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    per_request = measure(chain._initialize_chain)
+    shared = measure(lambda: agent.chain)
+
+    record_property("per_request_build_ms", per_request * 1000)
+    record_property("shared_chain_ms", shared * 1000)
+    print(f"\nchain per /ask: built {per_request * 1000:.3f} ms, shared {shared * 1000:.5f} ms")
+    assert shared < per_request
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from copy import deepcopy
+from kink import di
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from agent.chat.condense import QuestionCondenser
+from agent.chat.service import ChatChain
+from config.app import Settings
+
+HISTORY = [HumanMessage(content="What is Telly?"), AIMessage(content="Telly is a chatbot.")]
+
+
+def condenser(**update) -> QuestionCondenser:
+    settings = deepcopy(di[Settings])
+    settings.gcp.vertex.condense = settings.gcp.vertex.condense.model_copy(update=update)
+    return QuestionCondenser(settings)
+
+
+@pytest.mark.parametrize("question, history, self_contained", [
+    ("And?", [], True),
+    ("How do I reset my password?", HISTORY, True),
+    ("Wie setze ich mein Passwort zurück?", HISTORY, True),
+    ("Why?", HISTORY, False),
+    ("How do I configure it?", HISTORY, False),
+    ("Which models does THAT chatbot support?", HISTORY, False),
+    ("Wie konfiguriere ich das Modell?", HISTORY, False),
+    ("Tell me more about the pricing", HISTORY, False),
+])
+def test_questions_without_references_to_the_conversation_are_self_contained(question, history, self_contained):
+    assert condenser().is_self_contained(question, history) == self_contained
+
+
+def test_every_follow_up_question_is_condensed_if_skipping_is_disabled():
+    assert condenser(skip_self_contained=False).is_self_contained("How do I reset my password?", HISTORY) is False
+    assert condenser(skip_self_contained=False).is_self_contained("How do I reset my password?", []) is True
+
+
+def test_condensations_are_keyed_by_the_history_tail_and_cached_up_to_the_maximum():
+    cache = condenser(history_tail=1, cache_max_entries=1)
+    older = [HumanMessage(content="Other question?")] + HISTORY[1:]
+
+    assert cache.key("How does it work?", HISTORY) == cache.key("How  does it work?", older)
+    assert cache.key("How does it work?", HISTORY) != cache.key("How does it work?", HISTORY[:1])
+
+    cache.put("first", "first standalone", 1.0)
+    cache.put("second", "second standalone", 1.0)
+
+    assert (cache.get("first"), cache.get("second")) == (None, "second standalone")
+
+
+def test_chain_only_calls_the_llm_for_questions_which_are_neither_self_contained_nor_cached():
+    calls = []
+    chain = ChatChain.__new__(ChatChain)
+    chain.condenser = condenser()
+    chain._condense_chain = RunnableLambda(lambda inputs: calls.append(inputs["input"]) or "What is Telly made of?")
+
+    async def main():
+        return [await chain.condense(question, history) for question, history in [
+            ("What is it made of?", []),
+            ("How do I reset my password?", HISTORY),
+            ("What is it made of?", HISTORY),
+            ("What is it made of?", HISTORY)
+        ]]
+
+    standalones = asyncio.run(main())
+
+    assert standalones == ["What is it made of?", "How do I reset my password?",
+                           "What is Telly made of?", "What is Telly made of?"]
+    assert calls == ["What is it made of?"]
+    stats = chain.condenser.stats()
+    assert (stats.condensed, stats.skipped, stats.cached) == (1, 1, 1)
@@ -0,0 +1,32 @@
+from kink import di
+from langchain_core.documents import Document
+
+from agent.knowledge_base.packing import SCORE_KEY, ContextPacker
+from config.app import Settings
+
+TEXT = " ".join(f"word{i}" for i in range(60))
+
+
+def chunk(start: int, end: int, score: float, **metadata) -> Document:
+    return Document(page_content=TEXT[start:end], metadata={"source": "page", SCORE_KEY: score, **metadata})
+
+
+def test_chunks_of_a_source_are_merged_in_position_order():
+    packer = ContextPacker(di[Settings])
+    documents = [chunk(300, 480, 0.9, start_index=300), chunk(0, 200, 0.8, start_index=0),
+                 chunk(150, 350, 0.7, start_index=150)]
+
+    packed = packer.pack(documents)
+
+    assert len(packed) == 1
+    assert packed[0].page_content == TEXT[0:480]
+    assert packed[0].metadata[SCORE_KEY] == 0.9
+
+
+def test_chunks_without_positions_are_merged_in_rank_order():
+    packer = ContextPacker(di[Settings])
+    documents = [chunk(0, 200, 0.9), chunk(150, 350, 0.8, start_index=150)]
+
+    packed = packer.pack(documents)
+
+    assert packed[0].page_content == TEXT[0:350]
@@ -0,0 +1,94 @@
+import asyncio
+from copy import deepcopy
+from kink import di
+from langchain_core.embeddings import Embeddings
+
+from agent.knowledge_base.embedding import CachedEmbeddings, EmbeddingCache
+from config.app import Settings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries = []
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 0.5, -0.25]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def embedding_cache(**update) -> EmbeddingCache:
+    settings = deepcopy(di[Settings])
+    settings.gcp.vertex.embedding.cache = settings.gcp.vertex.embedding.cache.model_copy(
+        update={"enabled": True, "disk_path": None, **update})
+    return EmbeddingCache(settings)
+
+
+def test_memory_tier_evicts_the_least_recently_used_embeddings():
+    cache = embedding_cache(max_entries=2)
+    cache.put("a", [1.0], 0.1)
+    cache.put("b", [2.0], 0.1)
+    assert cache.get("a") == [1.0]
+
+    cache.put("c", [3.0], 0.1)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ([1.0], [3.0])
+    stats = cache.stats()
+    assert (stats.size, stats.hits, stats.misses) == (2, 3, 3)
+
+
+def test_memory_tier_expires_embeddings_after_the_ttl():
+    cache = embedding_cache(ttl=-1)
+    cache.put("a", [1.0], 0.1)
+
+    assert cache.get("a") is None
+    assert cache.stats().size == 0
+
+
+def test_disk_tier_survives_a_restart_and_promotes_to_memory(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    cache = embedding_cache(disk_path=path)
+    cache.put("a", [0.1, -0.2, 0.3], 0.1)
+
+    restarted = embedding_cache(disk_path=path)
+
+    assert restarted.get("a") is None
+    assert restarted.get_from_disk("a") == [0.1, -0.2, 0.3]
+    assert restarted.get("a") == [0.1, -0.2, 0.3]
+    stats = restarted.stats()
+    assert (stats.size, stats.disk_size, stats.hits, stats.disk_hits) == (1, 1, 1, 1)
+
+
+def test_disk_tier_evicts_the_least_recently_accessed_embeddings(tmp_path):
+    cache = embedding_cache(disk_path=str(tmp_path / "embeddings.db"), disk_max_entries=2)
+    cache.put("a", [1.0], 0.1)
+    cache.put("b", [2.0], 0.1)
+    assert cache.get_from_disk("a") == [1.0]
+
+    cache.put("c", [3.0], 0.1)
+
+    assert cache.stats().disk_size == 2
+    assert cache.get_from_disk("b") is None
+    assert (cache.get_from_disk("a"), cache.get_from_disk("c")) == ([1.0], [3.0])
+
+
+def test_cached_embeddings_embed_normalised_queries_remotely_once(tmp_path):
+    remote = CountingEmbeddings()
+    embeddings = CachedEmbeddings(remote, "model", embedding_cache(disk_path=str(tmp_path / "embeddings.db")))
+
+    async def main():
+        return [await embeddings.aembed_query("What is  Telly?"), await embeddings.aembed_query("what is telly?"),
+                embeddings.embed_query("WHAT IS TELLY?")]
+
+    first, second, third = asyncio.run(main())
+
+    assert remote.queries == ["What is  Telly?"]
+    assert first == second == third
+    CachedEmbeddings(remote, "other", embeddings.cache).embed_query("what is telly?")
+    assert remote.queries == ["What is  Telly?", "what is telly?"]
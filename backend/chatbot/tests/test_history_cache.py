@@ -0,0 +1,75 @@
+import pytest
+import uuid
+from kink import di
+from langchain_core.messages import AIMessage, HumanMessage
+
+import agent.history  # noqa: F401 creates the history tables
+from agent.history.sql import HistoryCache, HistoryMessageModel, SQLMessageHistory
+from agent.session.service import SessionAgent, SessionHandle
+from common.db import AppDB
+from common.registry import SessionRegistry, UserRegistry
+from config.app import RegistrySettings, Settings
+
+
+def test_rolled_back_messages_are_not_cached(monkeypatch):
+    session_id = str(uuid.uuid4())
+    history = SQLMessageHistory(session_id)
+    history.add_messages([HumanMessage(content="q1"), AIMessage(content="a1")])
+    assert [message.content for message in history.messages] == ["q1", "a1"]
+
+    insert = SQLMessageHistory._insert
+    calls = []
+
+    def failing_insert(self, message):
+        calls.append(message)
+        if len(calls) == 2:
+            raise RuntimeError("insert failed")
+        return insert(self, message)
+
+    monkeypatch.setattr(SQLMessageHistory, "_insert", failing_insert)
+    question, answer = HumanMessage(content="q2"), AIMessage(content="a2")
+    with pytest.raises(RuntimeError):
+        history.add_messages([question, answer])
+    monkeypatch.undo()
+
+    assert question.id is None and answer.id is None
+    assert [message.content for message in history.messages] == ["q1", "a1"]
+    assert HistoryMessageModel.select().where(HistoryMessageModel.session_id == session_id).count() == 2
+
+    history.add_messages([HumanMessage(content="q3"), AIMessage(content="a3")])
+    turns = [row.turn for row in HistoryMessageModel.select().where(HistoryMessageModel.session_id == session_id)
+             .order_by(HistoryMessageModel.id)]
+    assert turns == [0, 0, 1, 1]
+    cached = history.messages
+    assert int(cached[-1].id) == max(row.id for row in HistoryMessageModel.select())
+
+
+def test_evicted_session_evicts_its_cached_history():
+    registry = SessionRegistry(di[Settings])
+    registry.settings = RegistrySettings(max_entries=1, idle_ttl=3600)
+    SessionAgent(di[Settings], di[AppDB], registry, UserRegistry(di[Settings]))
+
+    cache = di[HistoryCache]
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    cache.put(first, [HumanMessage(content="q1")])
+    registry.put(first, SessionHandle(user_id="user", session_id=first))
+    registry.put(second, SessionHandle(user_id="user", session_id=second))
+
+    assert first not in registry
+    assert cache.get(first) is None
+
+
+def test_turns_are_derived_from_the_stored_messages_across_handles():
+    session_id = str(uuid.uuid4())
+    first, second = SQLMessageHistory(session_id), SQLMessageHistory(session_id)
+    assert first.messages == []
+
+    first.add_messages([HumanMessage(content="q1"), AIMessage(content="a1")])
+    second.add_messages([HumanMessage(content="q2"), AIMessage(content="a2")])
+    first.add_messages([HumanMessage(content="q3")])
+    second.add_messages([AIMessage(content="a3")])
+
+    rows = HistoryMessageModel.select().where(HistoryMessageModel.session_id == session_id).order_by(
+        HistoryMessageModel.id)
+    assert [(row.content, row.turn) for row in rows] == [
+        ("q1", 0), ("a1", 0), ("q2", 1), ("a2", 1), ("q3", 2), ("a3", 2)]
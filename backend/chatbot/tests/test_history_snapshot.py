@@ -0,0 +1,50 @@
+import asyncio
+import json
+import uuid
+from kink import di
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, message_to_dict
+
+import agent.history  # noqa: F401 creates the history tables
+from agent.history.service import HistoryAgent
+from agent.history.sql import HistoryCache, HistoryMessageModel
+
+
+def test_snapshot_counts_executed_reads_and_writes():
+    session_id = str(uuid.uuid4())
+    history_agent = HistoryAgent(session_id)
+    history_agent.message_history.add_messages([HumanMessage(content="q1"), AIMessage(content="a1")])
+    di[HistoryCache].evict(session_id)
+
+    async def ask():
+        snapshot = await history_agent.snapshot()
+        assert (snapshot.reads, snapshot.writes) == (1, 0)
+
+        await snapshot.aadd_messages([HumanMessage(content="q2"), AIMessage(content="a2")])
+        assert (snapshot.reads, snapshot.writes) == (1, 2)
+
+        cached = await history_agent.snapshot()
+        assert (cached.reads, cached.writes) == (0, 0)
+        assert [message.content for message in cached.messages] == ["q1", "a1", "q2", "a2"]
+
+    asyncio.run(ask())
+
+
+def test_messages_of_other_roles_and_legacy_rows_are_read_in_a_single_query():
+    session_id = str(uuid.uuid4())
+    history_agent = HistoryAgent(session_id)
+    history_agent.message_history.add_messages([
+        SystemMessage(content="instructions"), HumanMessage(content="q1"), AIMessage(content="a1")])
+    HistoryMessageModel.create(session_id=session_id, message=json.dumps(message_to_dict(HumanMessage(content="q2"))))
+    di[HistoryCache].evict(session_id)
+
+    async def ask():
+        return await history_agent.snapshot()
+
+    snapshot = asyncio.run(ask())
+
+    assert (snapshot.reads, snapshot.writes) == (1, 0)
+    assert [(message.type, message.content) for message in snapshot.messages] == [
+        ("system", "instructions"), ("human", "q1"), ("ai", "a1"), ("human", "q2")]
+    stored = HistoryMessageModel.select().where(HistoryMessageModel.session_id == session_id).order_by(
+        HistoryMessageModel.id)
+    assert [row.message is not None for row in stored] == [True, False, False, True]
@@ -0,0 +1,52 @@
+import asyncio
+import uuid
+from kink import di
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from peewee import PostgresqlDatabase
+from types import SimpleNamespace
+
+import agent.history  # noqa: F401 creates the history tables
+from agent.history.sql import HistorySummaryModel
+from agent.history.window import HistoryWindow
+from agent.llm.service import VertexLLM
+from common.db import AppDB, QueryCounter
+
+
+def test_summary_upsert_updates_the_existing_summary_on_postgres():
+    with PostgresqlDatabase(None).bind_ctx([HistorySummaryModel]):
+        sql, _ = HistoryWindow._upsert("session", "summary", 1).sql()
+
+    assert 'ON CONFLICT ("session_id") DO UPDATE SET' in sql
+    assert "REPLACE" not in sql
+
+
+def test_summary_runs_in_a_context_of_its_own_and_returns_its_connection(monkeypatch):
+    app_db = di[AppDB]
+    window = HistoryWindow()
+    session_id = str(uuid.uuid4())
+    llm = SimpleNamespace(model=RunnableLambda(lambda _: " summary "))
+    monkeypatch.setitem(di._factories, VertexLLM, lambda _: llm)
+    messages = [HumanMessage(content="q1", id="1"), AIMessage(content="a1", id="2")]
+
+    async def summarize(summary, last_message_id):
+        window._schedule(session_id, summary, messages[:last_message_id])
+        await asyncio.gather(*window._tasks)
+
+    async def main():
+        app_db.reset_state()
+        baseline = app_db.stats().in_use
+        app_db.database.connect()
+        with app_db.counting(QueryCounter()) as queries:
+            await summarize(None, 1)
+            await summarize("summary", 2)
+        app_db.database.close()
+        return baseline, queries
+
+    baseline, queries = asyncio.run(main())
+
+    assert (queries.reads, queries.writes) == (0, 0)
+    assert app_db.stats().in_use == baseline
+    stored = HistorySummaryModel.get(HistorySummaryModel.session_id == session_id)
+    assert (stored.summary, stored.last_message_id) == ("summary", 2)
+    assert HistorySummaryModel.select().where(HistorySummaryModel.session_id == session_id).count() == 1
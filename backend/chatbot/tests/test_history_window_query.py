@@ -0,0 +1,45 @@
+import uuid
+from langchain_core.messages import AIMessage, HumanMessage
+from peewee import PostgresqlDatabase
+
+import agent.history  # noqa: F401 creates the history tables
+from agent.history.sql import HistoryMessageModel, SQLMessageHistory
+
+
+def _contents(pairs):
+    return [(question.content, answer.content) for question, answer in pairs]
+
+
+def test_latest_pairs_of_odd_length_session():
+    odd, even, short = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+    SQLMessageHistory(odd).add_messages([
+        HumanMessage(content="q1"), AIMessage(content="a1"),
+        HumanMessage(content="q2"), AIMessage(content="a2"),
+        HumanMessage(content="q3"), AIMessage(content="a3"),
+        HumanMessage(content="q4")
+    ])
+    SQLMessageHistory(even).add_messages([
+        HumanMessage(content="q1"), AIMessage(content="a1"),
+        HumanMessage(content="q2"), AIMessage(content="a2"),
+        HumanMessage(content="q3"), AIMessage(content="a3")
+    ])
+    SQLMessageHistory(short).add_messages([HumanMessage(content="q1")])
+
+    histories = SQLMessageHistory.messages_wrapped_by_session([odd, even, short], last_pairs=2)
+    assert _contents(histories[odd][0]) == [("q2", "a2"), ("q3", "a3")]
+    assert histories[odd][1] == 3
+    assert _contents(histories[even][0]) == [("q2", "a2"), ("q3", "a3")]
+    assert histories[even][1] == 3
+    assert histories[short] == ([], 0)
+
+    histories = SQLMessageHistory.messages_wrapped_by_session([odd], last_pairs=None)
+    assert _contents(histories[odd][0]) == [("q1", "a1"), ("q2", "a2"), ("q3", "a3")]
+
+
+def test_latest_pairs_query_compiles_to_arithmetic_on_postgres():
+    with PostgresqlDatabase(None).bind_ctx([HistoryMessageModel]):
+        sql, params = SQLMessageHistory._ranked_query(["session"], last_pairs=2).sql()
+
+    assert " LIKE " not in sql and " GLOB " not in sql
+    assert '("ranked"."position" > ("ranked"."total" - %s))' in sql
+    assert params[-1] == 5
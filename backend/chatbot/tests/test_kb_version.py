@@ -0,0 +1,44 @@
+import asyncio
+from kink import di
+from types import SimpleNamespace
+
+from agent.knowledge_base.version import KnowledgeBaseVersion
+from config.app import Settings
+
+
+def test_version_is_read_without_waiting_for_the_fingerprint(monkeypatch):
+    kb_version = KnowledgeBaseVersion(di[Settings], SimpleNamespace())
+    fingerprints = iter(["2:17", "2:42", "2:42"])
+    scans = []
+
+    async def main():
+        released = asyncio.Event()
+
+        async def compute_fingerprint():
+            scans.append(1)
+            await released.wait()
+            return next(fingerprints)
+
+        monkeypatch.setattr(kb_version, "_compute_fingerprint", compute_fingerprint)
+        pending = await asyncio.gather(*(kb_version.current() for _ in range(5)))
+        await asyncio.sleep(0)
+        released.set()
+        await asyncio.gather(*kb_version._tasks)
+        refreshed = await kb_version.current()
+
+        kb_version._checked_at = 0.0
+        stale = await kb_version.current()
+        await asyncio.gather(*kb_version._tasks)
+        changed = await kb_version.current()
+        kb_version.invalidate()
+        invalidated = await kb_version.current()
+        await asyncio.gather(*kb_version._tasks)
+        return pending, refreshed, stale, changed, invalidated
+
+    pending, refreshed, stale, changed, invalidated = asyncio.run(main())
+
+    assert pending == ["0:None"] * 5
+    assert refreshed == stale == "0:2:17"
+    assert changed == "0:2:42"
+    assert invalidated == "1:2:42"
+    assert len(scans) == 3
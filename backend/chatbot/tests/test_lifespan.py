@@ -0,0 +1,26 @@
+import asyncio
+from fastapi import FastAPI
+from kink import di
+from threading import Thread
+
+from agent.auth.service import GCPAuth
+from config.app import Settings
+from main import lifespan
+
+
+def test_shutdown_stops_the_gcp_credentials_refresh(monkeypatch):
+    gcp_auth = GCPAuth(di[Settings])
+    monkeypatch.setattr(gcp_auth, "_refresh", lambda: 3600)
+    monkeypatch.delitem(di._memoized_services, GCPAuth, raising=False)
+    monkeypatch.setitem(di._services, GCPAuth, gcp_auth)
+    refresher = Thread(target=gcp_auth._refresh_periodically, daemon=True)
+    refresher.start()
+
+    async def main():
+        async with lifespan(FastAPI()):
+            assert refresher.is_alive()
+
+    asyncio.run(main())
+
+    refresher.join(timeout=1)
+    assert not refresher.is_alive()
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from copy import deepcopy
+from kink import di
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import ChatPromptTemplate
+from types import SimpleNamespace
+
+import agent.llm.service
+from agent.chat.service import ChatChain
+from agent.llm.service import ChatVertexLLM, LLMPool
+from config.app import Settings
+
+calls = []
+
+
+class RecordingChatModel(BaseChatModel):
+    def __init__(self, credentials=None, **params):
+        super().__init__()
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        calls.append(id(self))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="answer"))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        calls.append(id(self))
+        for token in ("ans", "wer"):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def test_chat_model_spreads_concurrent_requests_across_the_pooled_clients(monkeypatch):
+    settings = deepcopy(di[Settings])
+    settings.gcp.vertex.model.pool_size = 3
+    pool = LLMPool(settings, SimpleNamespace(has_service_account=lambda: False))
+    monkeypatch.setattr(agent.llm.service, "ChatVertexAI", RecordingChatModel)
+    monkeypatch.delitem(di._memoized_services, LLMPool, raising=False)
+    monkeypatch.setitem(di._services, LLMPool, pool)
+    calls.clear()
+
+    chain = ChatPromptTemplate.from_messages([("human", "{input}")]) | ChatChain._initialize_model() | StrOutputParser()
+
+    async def main():
+        answers = await asyncio.gather(*(chain.ainvoke({"input": str(i)}) for i in range(6)))
+        chunks = [chunk async for chunk in chain.astream({"input": "streamed"})]
+        return answers, chunks
+
+    answers, chunks = asyncio.run(main())
+
+    assert answers == ["answer"] * 6
+    assert chunks == ["ans", "wer"]
+    requests = calls[:6]
+    assert len(set(requests)) == 3
+    assert all(requests.count(client) == 2 for client in requests)
+
+
+def test_session_open_benchmark(monkeypatch, record_property):
+    constructed = []
+
+    class CostlyChatModel(RecordingChatModel):
+        def __init__(self, credentials=None, **params):
+            super().__init__()
+            # simulates loading the credentials and opening the gRPC channel of a Vertex AI client
+            time.sleep(0.005)
+            constructed.append(id(self))
+
+    settings = deepcopy(di[Settings])
+    settings.gcp.vertex.model.pool_size = 3
+    pool = LLMPool(settings, SimpleNamespace(has_service_account=lambda: False))
+    monkeypatch.setattr(agent.llm.service, "ChatVertexAI", CostlyChatModel)
+    sessions = 50
+
+    start = time.perf_counter()
+    for _ in range(sessions):
+        CostlyChatModel()
+    per_session = time.perf_counter() - start
+    constructed.clear()
+
+    start = time.perf_counter()
+    models = [ChatVertexLLM(settings, pool).model for _ in range(sessions)]
+    pooled = time.perf_counter() - start
+
+    record_property("per_session_clients_ms", per_session * 1000)
+    record_property("pooled_clients_ms", pooled * 1000)
+    print(f"\n{sessions} sessions opened: new clients {per_session * 1000:.1f} ms, pooled {pooled * 1000:.1f} ms")
+    assert len(constructed) == 3
+    assert len({id(model) for model in models}) == 3
+    assert pooled < per_session
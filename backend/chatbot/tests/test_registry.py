@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+from typing import Tuple
+
+import common.registry.registry
+from common.registry import Registry
+from config.app import RegistrySettings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def registry(monkeypatch, **settings) -> Tuple[Registry, Clock]:
+    clock = Clock()
+    monkeypatch.setattr(common.registry.registry.time, "monotonic", clock)
+    return Registry(RegistrySettings(**{"max_entries": 3, "idle_ttl": 60, **settings}), "test"), clock
+
+
+def test_least_recently_used_entry_is_evicted_first(monkeypatch):
+    entries, _ = registry(monkeypatch)
+    evicted = []
+    entries.on_evict(lambda key, value: evicted.append((key, value)))
+    for key in "abc":
+        entries.put(key, key.upper())
+
+    assert entries.get("a") == "A"
+    entries.put("d", "D")
+
+    assert evicted == [("b", "B")]
+    assert [key for key in "abcd" if key in entries] == ["a", "c", "d"]
+
+
+def test_idle_entries_expire(monkeypatch):
+    entries, clock = registry(monkeypatch)
+    entries.put("a", "A")
+    entries.put("b", "B")
+    clock.now += 30
+    assert entries.get("b") == "B"
+
+    clock.now += 31
+
+    assert "a" not in entries
+    assert entries.get("b") == "B"
+    assert entries.stats().evictions == 1
+
+
+def test_entries_are_evicted_to_stay_within_the_memory_bound(monkeypatch):
+    entries, _ = registry(monkeypatch, max_entries=10, max_memory=250)
+    for key in "abc":
+        entries.put(key, SimpleNamespace(footprint=100))
+
+    assert "a" not in entries
+    assert entries.stats().memory == 200
+
+    grown = entries.get("b")
+    grown.footprint = 200
+    entries.get("b")
+
+    assert "c" not in entries and "b" in entries
+    assert entries.stats().memory == 200
+
+
+def test_lookups_and_evictions_are_counted(monkeypatch):
+    entries, _ = registry(monkeypatch, max_entries=1)
+    entries.put("a", "A")
+    entries.get("a")
+    entries.get("b")
+    entries.put("b", "B")
+    entries.pop("b")
+
+    stats = entries.stats()
+    assert (stats.size, stats.hits, stats.misses, stats.evictions) == (0, 1, 1, 1)
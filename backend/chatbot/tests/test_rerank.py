@@ -0,0 +1,71 @@
+import asyncio
+import numpy as np
+import pytest
+import time
+from copy import deepcopy
+from kink import di
+from langchain_core.documents import Document
+from types import SimpleNamespace
+
+from agent.knowledge_base.packing import SCORE_KEY
+from agent.knowledge_base.rerank import RerankSearch, maximal_marginal_relevance, normalize
+from config.app import Settings
+
+QUERY = normalize(np.array([1.0, 0.0, 0.0]))
+# the two most relevant candidates are near-duplicates, the third one is less relevant but diverse
+CANDIDATES = normalize(np.array([[0.9, 0.1, 0.0], [0.89, 0.11, 0.0], [0.6, 0.0, 0.8], [0.1, 0.9, 0.4]]))
+
+
+def test_mmr_selects_relevant_and_diverse_candidates():
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, 3, 0.5) == [0, 2, 1]
+
+
+def test_mmr_extremes_trade_relevance_for_diversity():
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, 4, 1.0) == [0, 1, 2, 3]
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, 2, 0.0) == [0, 3]
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, 0, 0.5) == []
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, 10, 0.5) == [0, 2, 1, 3]
+
+
+def rerank_search(score_threshold) -> RerankSearch:
+    settings = deepcopy(di[Settings])
+    settings.db.vector_db.retriever.rerank.score_threshold = score_threshold
+
+    async def aembed_query(query):
+        return QUERY.tolist()
+
+    async def anearest(embedding, k, db_filter, search_params, with_embeddings):
+        return [(Document(id=str(i), page_content=str(i)), vector.tolist()) for i, vector in enumerate(CANDIDATES)]
+
+    vector_db = SimpleNamespace(embedding=SimpleNamespace(aembed_query=aembed_query), anearest=anearest)
+    return RerankSearch(settings, vector_db)
+
+
+def test_candidates_below_the_score_threshold_are_dropped():
+    documents = asyncio.run(rerank_search(0.5).asearch("query", 3))
+
+    assert [document.id for document in documents] == ["0", "2", "1"]
+    assert all(document.metadata[SCORE_KEY] >= 0.5 for document in documents)
+
+
+def test_no_documents_are_returned_if_all_candidates_are_below_the_score_threshold():
+    assert asyncio.run(rerank_search(0.999).asearch("query", 3)) == []
+
+
+@pytest.mark.parametrize("candidates", [50, 500, 5000])
+def test_mmr_benchmark(candidates, record_property):
+    rng = np.random.default_rng(42)
+    query = normalize(rng.standard_normal(768, dtype=np.float32))
+    embeddings = normalize(rng.standard_normal((candidates, 768), dtype=np.float32))
+
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        selected = maximal_marginal_relevance(query, embeddings, 10, 0.5)
+        timings.append(time.perf_counter() - start)
+    median = sorted(timings)[len(timings) // 2]
+    record_property("mmr_median_ms", round(median * 1000, 3))
+    print(f"MMR of 10 out of {candidates} candidates: {median * 1000:.2f}ms")
+
+    assert len(set(selected)) == 10
+    assert median < 0.5
@@ -0,0 +1,80 @@
+import asyncio
+from copy import deepcopy
+from kink import di
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+from types import SimpleNamespace
+
+from agent.chat.service import ChatChain
+from agent.knowledge_base.cache import RetrievalCache
+from config.app import Settings
+
+
+class FakeVersion:
+    def __init__(self):
+        self.version = "1:fingerprint"
+
+    async def current(self):
+        return self.version
+
+
+def retrieval_cache() -> RetrievalCache:
+    settings = deepcopy(di[Settings])
+    settings.db.vector_db.retrieval_cache.enabled = True
+    return RetrievalCache(settings, FakeVersion())
+
+
+def test_key_is_scoped_by_the_permission_filter_and_search():
+    key = RetrievalCache.key
+    search_kwargs = {"k": 5, "filter": {"space": {"$in": ["A", "B"]}, "lang": "en"}}
+
+    assert key("What is Telly?", search_kwargs, "similarity") == key(
+        "  what is   telly? ", {"filter": {"lang": "en", "space": {"$in": ["A", "B"]}}, "k": 5}, "similarity")
+    assert key("What is Telly?", search_kwargs, "similarity") != key(
+        "What is Telly?", {"k": 5, "filter": {"space": {"$in": ["A"]}, "lang": "en"}}, "similarity")
+    assert key("What is Telly?", search_kwargs, "similarity") != key(
+        "What is Telly?", {**search_kwargs, "k": 10}, "similarity")
+    assert key("What is Telly?", search_kwargs, "similarity") != key("What is Telly?", search_kwargs, "hybrid")
+
+
+def test_cached_retriever_serves_documents_only_to_the_same_filter():
+    retrievals = []
+
+    async def aretrieve(question, config):
+        db_filter = config["configurable"]["search_kwargs"]["filter"]
+        retrievals.append(db_filter)
+        return [Document(page_content=f"{question} in {db_filter['space']}")]
+
+    chain = ChatChain.__new__(ChatChain)
+    chain.settings = deepcopy(di[Settings])
+    chain.retrieval_cache = retrieval_cache()
+    retriever = chain._initialize_cached_retriever(RunnableLambda(aretrieve))
+
+    def config(space):
+        return {"configurable": {"search_kwargs": {"k": 5, "filter": {"space": space}}}}
+
+    async def main():
+        return [await retriever.ainvoke(question, config(space))
+                for question, space in [("q", "A"), ("q", "B"), ("Q", "A"), ("q", "B")]]
+
+    results = asyncio.run(main())
+
+    assert retrievals == [{"space": "A"}, {"space": "B"}]
+    assert [[document.page_content for document in documents] for documents in results] == [
+        ["q in A"], ["q in B"], ["q in A"], ["q in B"]]
+
+
+def test_cache_is_cleared_when_the_knowledge_base_changes():
+    cache = retrieval_cache()
+
+    async def main():
+        assert await cache.aget("key") is None
+        cache.put("key", [Document(page_content="content")])
+        cached = await cache.aget("key")
+        cache.kb_version.version = "2:fingerprint"
+        return cached, await cache.aget("key")
+
+    cached, changed = asyncio.run(main())
+
+    assert [document.page_content for document in cached] == ["content"]
+    assert changed is None
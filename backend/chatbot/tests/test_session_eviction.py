@@ -0,0 +1,73 @@
+import asyncio
+import uuid
+from kink import di
+from langchain_core.messages import AIMessage, HumanMessage
+
+import agent.session.service
+from agent.history.sql import HistoryMessageModel, SQLMessageHistory
+from agent.session.service import SessionAgent, SessionModel
+from agent.user.info import LoggedInUserInfo
+from agent.user.service import UserAgent
+from common.db import AppDB
+from common.registry import SessionRegistry, UserRegistry
+from config.app import RegistrySettings, Settings
+
+
+class FakeChatAgent:
+    def __init__(self, kb_agent, history_agent):
+        self.kb_agent = kb_agent
+        self.history_agent = history_agent
+
+
+def session_agent(monkeypatch) -> SessionAgent:
+    monkeypatch.setattr(agent.session.service, "ChatAgent", FakeChatAgent)
+    monkeypatch.setattr(agent.session.service, "load_user_info",
+                        lambda user_id: LoggedInUserInfo(user_id=user_id, filter={"space_key": {"$in": ["A"]}}))
+    registry = SessionRegistry(di[Settings])
+    registry.settings = RegistrySettings(max_entries=1, idle_ttl=3600)
+    users = UserRegistry(di[Settings])
+    users.settings = RegistrySettings(max_entries=1, idle_ttl=3600)
+    return SessionAgent(di[Settings], di[AppDB], registry, users)
+
+
+def test_evicted_session_and_user_rebuild_on_ask(monkeypatch):
+    sessions = session_agent(monkeypatch)
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    sessions.user_registry.put("user", {"user_id": "user", "filter": {}})
+    sessions.user_registry.put("other", {"user_id": "other", "filter": {}})
+    sessions.register_session(user_id="user", session_id=first)
+    sessions.register_session(user_id="other", session_id=second)
+    assert first not in sessions.registry and "user" not in sessions.user_registry
+
+    chatbot = asyncio.run(sessions.chatbot(first, "user"))
+
+    assert chatbot.kb_agent.search_kwargs["filter"] == {"space_key": {"$in": ["A"]}}
+    assert chatbot.history_agent.session_id == first
+    assert sessions.registry.get(first).is_materialized
+
+
+def test_evicted_session_is_removed_with_its_history(monkeypatch):
+    sessions = session_agent(monkeypatch)
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    SessionModel.create(session_id=first, session_name="first", user_id="user")
+    SQLMessageHistory(first).add_messages([HumanMessage(content="q"), AIMessage(content="a")])
+    sessions.register_session(user_id="user", session_id=first)
+    sessions.register_session(user_id="user", session_id=second)
+    assert first not in sessions.registry
+
+    assert asyncio.run(sessions.remove_session(first)) is True
+    assert asyncio.run(sessions.remove_session(first)) is False
+    assert not SessionModel.select().where(SessionModel.session_id == first).exists()
+    assert not HistoryMessageModel.select().where(HistoryMessageModel.session_id == first).exists()
+
+
+def test_logout_of_an_evicted_user_invalidates_the_sessions(monkeypatch):
+    sessions = session_agent(monkeypatch)
+    session_id, user_id = str(uuid.uuid4()), str(uuid.uuid4())
+    SessionModel.create(session_id=session_id, session_name="session", user_id=user_id)
+    sessions.register_session(user_id=user_id, session_id=session_id)
+    users = UserAgent(di[Settings], sessions, di[AppDB], sessions.user_registry)
+
+    asyncio.run(users.logout(user_id))
+
+    assert session_id not in sessions.registry
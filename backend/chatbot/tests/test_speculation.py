@@ -0,0 +1,89 @@
+import asyncio
+from copy import deepcopy
+from kink import di
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from types import SimpleNamespace
+
+from agent.chat.condense import QuestionCondenser
+from agent.chat.service import ChatChain
+from agent.chat.speculation import SpeculativeRetrieval
+from config.app import Settings
+
+HISTORY = [HumanMessage(content="What is Telly?"), AIMessage(content="Telly is a chatbot.")]
+QUESTION = "How do I configure it?"
+
+
+class FakeEmbeddings:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    async def aembed_query(self, text):
+        return self.embeddings[text]
+
+
+def chat_chain(standalone: str, embeddings: dict) -> ChatChain:
+    settings = deepcopy(di[Settings])
+    settings.db.vector_db.retriever.speculation.enabled = True
+    settings.db.vector_db.retriever.speculation.similarity_threshold = 0.9
+    retrievals = []
+
+    async def aretrieve(question, config=None):
+        retrievals.append(question)
+        await asyncio.sleep(0.01)
+        return [Document(page_content=f"documents of {question}")]
+
+    async def acondense(inputs):
+        await asyncio.sleep(0.01)
+        return standalone
+
+    chain = ChatChain.__new__(ChatChain)
+    chain.condenser = QuestionCondenser(settings)
+    chain.speculation = SpeculativeRetrieval(settings, SimpleNamespace(embedding=FakeEmbeddings(embeddings)))
+    chain._condense_chain = RunnableLambda(acondense)
+    chain._retriever = RunnableLambda(aretrieve)
+    chain.retrievals = retrievals
+    return chain
+
+
+def test_speculative_retrieval_is_used_when_the_condensed_question_is_similar():
+    standalone = "How do I configure Telly?"
+    chain = chat_chain(standalone, {QUESTION: [1.0, 0.1], standalone: [1.0, 0.0]})
+
+    result = asyncio.run(chain.retrieve(QUESTION, HISTORY))
+
+    assert result == (standalone, [Document(page_content=f"documents of {QUESTION}")])
+    assert chain.retrievals == [QUESTION]
+    stats = chain.speculation.stats()
+    assert (stats.attempts, stats.accepted, stats.rejected) == (1, 1, 0)
+
+
+def test_speculative_retrieval_is_discarded_when_the_condensed_question_differs():
+    standalone = "Which settings does the Telly chatbot have?"
+    chain = chat_chain(standalone, {QUESTION: [1.0, 0.0], standalone: [0.0, 1.0]})
+
+    async def main():
+        result = await chain.retrieve(QUESTION, HISTORY)
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*pending)
+        return result
+
+    result = asyncio.run(main())
+
+    assert result == (standalone, [Document(page_content=f"documents of {standalone}")])
+    assert chain.retrievals == [QUESTION, standalone]
+    stats = chain.speculation.stats()
+    assert (stats.attempts, stats.accepted, stats.rejected) == (1, 0, 1)
+
+
+def test_self_contained_questions_are_retrieved_without_speculation():
+    chain = chat_chain("unused", {})
+
+    question = "How do I reset my password?"
+
+    result = asyncio.run(chain.retrieve(question, HISTORY))
+
+    assert result == (question, [Document(page_content=f"documents of {question}")])
+    assert chain.retrievals == [question]
+    assert chain.speculation.stats().attempts == 0
@@ -0,0 +1,93 @@
+import logging
+from copy import deepcopy
+from kink import di
+from types import SimpleNamespace
+
+from agent.knowledge_base.index import VectorIndexManager
+from config.app import Settings
+
+
+class RecordingConnection:
+    def __init__(self, indexes, column_type="vector(768)"):
+        self.indexes = indexes
+        self.column_type = column_type
+        self.statements = []
+
+    def execute(self, statement):
+        sql = str(statement)
+        self.statements.append(sql)
+        if sql.startswith("SELECT c.relname"):
+            return SimpleNamespace(all=lambda: self.indexes)
+        if sql.startswith("SELECT format_type"):
+            return SimpleNamespace(scalar_one=lambda: self.column_type)
+        return None
+
+
+def manager(**index) -> VectorIndexManager:
+    settings = deepcopy(di[Settings])
+    settings.db.vector_db.index = settings.db.vector_db.index.model_copy(update={"type": "hnsw", **index})
+    return VectorIndexManager(settings)
+
+
+def test_missing_index_is_created_concurrently():
+    connection = RecordingConnection([])
+
+    manager()._ensure_vector_index(connection, create=True)
+
+    assert connection.statements[-1] == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_langchain_pg_embedding_hnsw ON langchain_pg_embedding "
+        "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)")
+
+
+def test_invalid_index_is_dropped_and_rebuilt():
+    invalid = SimpleNamespace(name="ix_langchain_pg_embedding_hnsw", valid=False,
+                              definition="CREATE INDEX ix_langchain_pg_embedding_hnsw ON langchain_pg_embedding "
+                                         "USING hnsw (embedding vector_cosine_ops)")
+    connection = RecordingConnection([invalid])
+
+    manager()._ensure_vector_index(connection, create=True)
+
+    assert connection.statements[-2] == "DROP INDEX CONCURRENTLY IF EXISTS ix_langchain_pg_embedding_hnsw"
+    assert connection.statements[-1].startswith("CREATE INDEX CONCURRENTLY")
+
+
+def test_missing_index_is_not_created_by_default(caplog):
+    index_manager = manager()
+    connection = RecordingConnection([])
+
+    with caplog.at_level(logging.WARNING):
+        index_manager._ensure_vector_index(connection, create=index_manager.index_settings.create)
+
+    assert not any("CREATE INDEX" in statement for statement in connection.statements)
+    assert "does not exist" in caplog.text
+
+
+def test_failures_are_logged_instead_of_raised(caplog):
+    connection = RecordingConnection([])
+    connection.execute = lambda statement: (_ for _ in ()).throw(RuntimeError("lock timeout"))
+
+    with caplog.at_level(logging.ERROR):
+        manager()._ensure_vector_index(connection, create=True)
+
+    assert "lock timeout" in caplog.text
+
+
+def test_missing_text_search_index_is_created_concurrently():
+    connection = RecordingConnection([])
+
+    manager()._ensure_text_search_index(connection, create=True)
+
+    assert connection.statements[-1] == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_langchain_pg_embedding_tsv_english ON langchain_pg_embedding "
+        "USING gin (to_tsvector('english'::regconfig, document))")
+
+
+def test_existing_text_search_index_is_verified():
+    index = SimpleNamespace(name="ix_langchain_pg_embedding_tsv_english", valid=True,
+                            definition="CREATE INDEX ix_langchain_pg_embedding_tsv_english ON langchain_pg_embedding "
+                                       "USING gin (to_tsvector('english'::regconfig, document))")
+    connection = RecordingConnection([index])
+
+    manager()._ensure_text_search_index(connection, create=True)
+
+    assert not any("CREATE INDEX" in statement for statement in connection.statements)
@@ -0,0 +1,79 @@
+import asyncio
+from copy import deepcopy
+from kink import di
+from types import SimpleNamespace
+
+from agent.chat.service import ChatChain
+from agent.knowledge_base.service import VectorDB
+from config.app import Settings
+
+
+class RecordingSession:
+    def __init__(self, statements):
+        self.statements = statements
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def begin(self):
+        return self
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return SimpleNamespace(all=lambda: [])
+
+
+class FakeEmbeddings:
+    async def aembed_query(self, query):
+        return [0.1, 0.2]
+
+
+def vector_db(**index) -> VectorDB:
+    settings = deepcopy(di[Settings])
+    db = VectorDB.__new__(VectorDB)
+    db.settings = settings.db.vector_db
+    db.index_settings = settings.db.vector_db.index.model_copy(update={"type": "hnsw", **index})
+    db.statements = []
+    db._async_db = SimpleNamespace(session_maker=lambda: RecordingSession(db.statements))
+    db._embedding = FakeEmbeddings()
+    return db
+
+
+def test_filtered_queries_oversample_the_candidate_list():
+    db = vector_db(ef_search=40, filter_oversampling=4)
+
+    assert db.search_params(k=5) == {"hnsw.ef_search": 40}
+    assert db.search_params(k=5, filtered=True) == {"hnsw.ef_search": 160}
+    assert db.search_params({"ef_search": 400}, k=5, filtered=True) == {"hnsw.ef_search": 1000}
+    assert vector_db(type="ivfflat", probes=10, lists=30).search_params(filtered=True) == {"ivfflat.probes": 30}
+
+
+def test_filtered_queries_enable_the_iterative_scan():
+    db = vector_db(ef_search=40, filter_oversampling=1, iterative_scan="relaxed_order")
+
+    asyncio.run(db.anearest([0.1, 0.2], 5, {"space": {"$in": ["A"]}}))
+    asyncio.run(db.anearest([0.1, 0.2], 5))
+
+    assert db.statements[:2] == ["SET LOCAL hnsw.ef_search = 40", "SET LOCAL hnsw.iterative_scan = relaxed_order"]
+    assert db.statements[3] == "SET LOCAL hnsw.ef_search = 40"
+    assert "iterative_scan" not in " ".join(db.statements[3:])
+
+
+def test_similarity_retriever_sets_the_search_params_per_query_on_the_async_engine(monkeypatch):
+    db = vector_db(ef_search=40, filter_oversampling=4)
+    monkeypatch.delitem(di._memoized_services, VectorDB, raising=False)
+    monkeypatch.setitem(di._services, VectorDB, db)
+    chain = ChatChain.__new__(ChatChain)
+    chain.settings = deepcopy(di[Settings])
+    chain.settings.db.vector_db.retriever.type = "similarity"
+    chain.vector_db = db
+    chain.retrieval_cache = SimpleNamespace(enabled=False)
+    chain.post_processing = SimpleNamespace(stages=[])
+
+    retriever = chain._initialize_retriever()
+    asyncio.run(retriever.ainvoke("question", {"configurable": {"search_kwargs": {"k": 5, "filter": {"space": "A"}}}}))
+
+    assert db.statements[0] == "SET LOCAL hnsw.ef_search = 160"